@@ -0,0 +1,20 @@
+from django.contrib import admin
+
+from .models import Job
+
+
+class JobAdmin(admin.ModelAdmin):
+    list_display = (
+        'pk',
+        'task',
+        'status',
+        'attempts',
+        'run_at',
+        'duration',
+    )
+    list_filter = ('status',)
+    search_fields = ('task',)
+    readonly_fields = ('claim', 'locked_at', 'finished', 'duration')
+
+
+admin.site.register(Job, JobAdmin)
@@ -0,0 +1,139 @@
+"""Сжатие ответов brotli или gzip.
+
+Ленты отдают одинаковый HTML всем анонимам, пока жив фрагментный кэш,
+поэтому сжатое тело кладётся в отдельный кэш под хешем исходного:
+повторный ответ стоит одного md5 вместо сжатия. Страницы с CSRF-токеном
+(вход, регистрация) не кэшируются: маска токена своя в каждом ответе,
+одинаковых тел у них не бывает. Картинки, архивы и уже сжатые ответы
+не трогаются, потоковые ответы сжимаются по кускам.
+"""
+import hashlib
+import zlib
+
+from django.conf import settings
+from django.core.cache import caches
+from django.utils.cache import patch_vary_headers
+
+from .static import accepted
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+COMPRESSIBLE_TYPES = (
+    'text/', 'application/json', 'application/javascript',
+    'application/xml', 'application/rss+xml', 'image/svg+xml',
+)
+
+
+def gzip_compressor():
+    # wbits=31: формат gzip с заголовком и контрольной суммой.
+    compressor = zlib.compressobj(settings.COMPRESS_GZIP_LEVEL, wbits=31)
+    return (
+        lambda data: compressor.compress(data)
+        + compressor.flush(zlib.Z_SYNC_FLUSH),
+        compressor.flush,
+    )
+
+
+def brotli_compressor():
+    compressor = brotli.Compressor(quality=settings.COMPRESS_BROTLI_QUALITY)
+    return (
+        lambda data: compressor.process(data) + compressor.flush(),
+        compressor.finish,
+    )
+
+
+def compress(data, encoding):
+    if encoding == 'br':
+        return brotli.compress(
+            data, quality=settings.COMPRESS_BROTLI_QUALITY
+        )
+    process, finish = gzip_compressor()
+    return process(data) + finish()
+
+
+def compress_stream(chunks, encoding):
+    process, finish = (
+        brotli_compressor() if encoding == 'br' else gzip_compressor()
+    )
+    for chunk in chunks:
+        # Каждый кусок сбрасывается сразу, чтобы клиент не ждал конца.
+        data = process(chunk)
+        if data:
+            yield data
+    yield finish()
+
+
+def choose_encoding(request):
+    offered = accepted(request.META.get('HTTP_ACCEPT_ENCODING', ''))
+    if brotli is not None and 'br' in offered:
+        return 'br'
+    if 'gzip' in offered:
+        return 'gzip'
+    return None
+
+
+def cached_compress(content, encoding):
+    """Сжатое тело из кэша по md5 исходного или только что сжатое."""
+    cache = caches['compressed']
+    key = f'{encoding}:{hashlib.md5(content).hexdigest()}'
+    data = cache.get(key)
+    if data is None:
+        data = compress(content, encoding)
+        cache.set(key, data)
+    return data
+
+
+class CompressionMiddleware:
+    """Сжимает текстовые ответы для клиентов, которые это принимают.
+
+    Стоит в MIDDLEWARE выше всего, что меняет тело ответа. Кэшируются
+    только ответы анонимам: у авторизованных в странице есть имя и
+    личные ссылки, одинаковых тел почти не бывает.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        response = self.get_response(request)
+        if (
+            response.has_header('Content-Encoding')
+            or response.status_code not in (200, 404)
+            or not response.get('Content-Type', '').startswith(
+                COMPRESSIBLE_TYPES
+            )
+            or not response.streaming
+            and len(response.content) < settings.COMPRESS_MIN_SIZE
+        ):
+            return response
+        patch_vary_headers(response, ('Accept-Encoding',))
+        encoding = choose_encoding(request)
+        if encoding is None:
+            return response
+        if response.streaming:
+            response.streaming_content = compress_stream(
+                response.streaming_content, encoding
+            )
+            del response['Content-Length']
+        else:
+            user = getattr(request, 'user', None)
+            if (
+                user is not None and not user.is_authenticated
+                and not request.META.get('CSRF_COOKIE_USED')
+            ):
+                data = cached_compress(response.content, encoding)
+            else:
+                data = compress(response.content, encoding)
+            if len(data) >= len(response.content):
+                return response
+            response.content = data
+            response['Content-Length'] = len(data)
+        # Сжатое тело другое, строгий ETag становится слабым (RFC 7232).
+        etag = response.get('ETag')
+        if etag and etag.startswith('"'):
+            response['ETag'] = 'W/' + etag
+        response['Content-Encoding'] = encoding
+        return response
@@ -0,0 +1,43 @@
+import random
+from contextvars import ContextVar
+
+from django.conf import settings
+
+# Состояние текущего запроса: можно ли читать с реплики и была ли запись.
+request_state = ContextVar('replica_request_state', default=None)
+
+
+def replica_reads(view):
+    """Помечает вид, чтение которого можно отдать реплике."""
+    view.reads_from_replica = True
+    return view
+
+
+class ReplicaRouter:
+    """Чтение помеченных видов — с реплик, всё остальное — с основной БД.
+
+    Запись в ходе запроса возвращает чтение на основную базу до конца
+    запроса, а middleware закрепляет пользователя за ней на
+    REPLICA_PIN_SECONDS, чтобы он сразу увидел свои изменения.
+    """
+
+    def db_for_read(self, model, **hints):
+        state = request_state.get()
+        if (
+            state and state['use_replica'] and not state['wrote']
+            and settings.REPLICA_DATABASES
+        ):
+            return random.choice(settings.REPLICA_DATABASES)
+        return 'default'
+
+    def db_for_write(self, model, **hints):
+        state = request_state.get()
+        if state is not None:
+            state['wrote'] = True
+        return 'default'
+
+    def allow_relation(self, obj1, obj2, **hints):
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db == 'default'
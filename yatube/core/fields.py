@@ -0,0 +1,21 @@
+from importlib.util import find_spec
+
+from django.db import models
+
+
+class ImageField(models.ImageField):
+    """ImageField, системная проверка которого не импортирует Pillow.
+
+    Стандартная проверка делает import PIL (около 40 мс) при каждом
+    запуске manage.py; чтобы убедиться, что библиотека установлена,
+    хватает find_spec. В миграциях поле выглядит как обычный ImageField.
+    """
+
+    def _check_image_library_installed(self):
+        if find_spec('PIL') is None:
+            return super()._check_image_library_installed()
+        return []
+
+    def deconstruct(self):
+        name, path, args, kwargs = super().deconstruct()
+        return name, 'django.db.models.ImageField', args, kwargs
@@ -0,0 +1,157 @@
+"""Фоновые задачи в таблице Job.
+
+enqueue() кладёт вызов функции в очередь, команда run_jobs разбирает её
+пулом потоков или процессов. Воркер забирает пачку задач одним
+запросом: на СУБД с SKIP LOCKED (PostgreSQL, MySQL 8) - через
+SELECT ... FOR UPDATE SKIP LOCKED, на SQLite - одним UPDATE с меткой
+воркера, который SQLite выполняет под общей блокировкой записи. Задача,
+упавшая с исключением, повторяется с экспоненциальной задержкой, пока
+не кончатся попытки; зависшая дольше JOB_LOCK_TIMEOUT снова
+становится доступной, и это тоже считается попыткой: задача, которая
+каждый раз роняет воркер, не повторяется бесконечно.
+"""
+import json
+import logging
+import time
+import uuid
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import Avg, Case, Count, F, Min, Q, Value, When
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from .models import Job
+
+logger = logging.getLogger(__name__)
+
+
+def task_path(func):
+    return func if isinstance(func, str) else (
+        f'{func.__module__}.{func.__qualname__}'
+    )
+
+
+def enqueue(func, *args, delay=0, max_attempts=None, **kwargs):
+    """Ставит вызов func(*args, **kwargs) в очередь.
+
+    Аргументы должны сериализоваться в JSON. Задача создаётся в текущей
+    транзакции и не будет видна воркерам, если транзакция откатится.
+    """
+    return Job.objects.create(
+        task=task_path(func),
+        payload=json.dumps({'args': args, 'kwargs': kwargs}),
+        run_at=timezone.now() + timedelta(seconds=delay),
+        max_attempts=max_attempts or settings.JOB_MAX_ATTEMPTS,
+    )
+
+
+def available(now):
+    stale = now - timedelta(seconds=settings.JOB_LOCK_TIMEOUT)
+    return Job.objects.filter(
+        Q(status=Job.QUEUED, run_at__lte=now)
+        | Q(status=Job.RUNNING, locked_at__lt=stale)
+    ).order_by('run_at')
+
+
+def claimed(token, now):
+    """Поля задачи, взятой воркером: брошенная другим тратит попытку."""
+    return {
+        'status': Job.RUNNING,
+        'claim': token,
+        'locked_at': now,
+        'attempts': F('attempts') + Case(
+            When(status=Job.RUNNING, then=Value(1)), default=Value(0)
+        ),
+    }
+
+
+def claim(limit):
+    """Забирает до limit задач и возвращает их id."""
+    now = timezone.now()
+    token = uuid.uuid4().hex
+    if connection.features.has_select_for_update_skip_locked:
+        with transaction.atomic():
+            ids = list(
+                available(now).select_for_update(skip_locked=True)
+                .values_list('pk', flat=True)[:limit]
+            )
+            Job.objects.filter(pk__in=ids).update(**claimed(token, now))
+        return ids
+    candidates = available(now).values('pk')[:limit]
+    Job.objects.filter(pk__in=candidates).update(**claimed(token, now))
+    return list(
+        Job.objects.filter(claim=token).values_list('pk', flat=True)
+    )
+
+
+def execute(job_id):
+    """Выполняет задачу и записывает результат. True, если успешно."""
+    job = Job.objects.get(pk=job_id)
+    if job.attempts >= job.max_attempts:
+        # Попытки кончились на воркерах, которые упали вместе с задачей.
+        Job.objects.filter(pk=job.pk).update(
+            status=Job.FAILED,
+            finished=timezone.now(),
+            last_error='Воркер не завершил задачу',
+        )
+        return False
+    payload = json.loads(job.payload)
+    started = time.perf_counter()
+    try:
+        import_string(job.task)(*payload['args'], **payload['kwargs'])
+    except Exception as error:
+        logger.exception('Задача %s упала', job)
+        fail(job, error)
+        return False
+    Job.objects.filter(pk=job.pk).update(
+        status=Job.DONE,
+        finished=timezone.now(),
+        duration=time.perf_counter() - started,
+        last_error='',
+    )
+    return True
+
+
+def fail(job, error):
+    attempts = job.attempts + 1
+    if attempts >= job.max_attempts:
+        status, run_at = Job.FAILED, job.run_at
+    else:
+        status = Job.QUEUED
+        run_at = timezone.now() + timedelta(
+            seconds=settings.JOB_RETRY_DELAY * 2 ** (attempts - 1)
+        )
+    Job.objects.filter(pk=job.pk).update(
+        status=status,
+        attempts=attempts,
+        run_at=run_at,
+        last_error=repr(error),
+        finished=timezone.now() if status == Job.FAILED else None,
+    )
+
+
+def stats():
+    """Метрики очереди.
+
+    Число задач по статусам, задержка самой старой готовой к запуску
+    задачи в секундах и среднее время выполнения по видам задач.
+    """
+    now = timezone.now()
+    by_status = dict(
+        Job.objects.values_list('status').annotate(Count('pk')).order_by()
+    )
+    oldest = Job.objects.filter(
+        status=Job.QUEUED, run_at__lte=now
+    ).aggregate(oldest=Min('run_at'))['oldest']
+    durations = dict(
+        Job.objects.filter(status=Job.DONE).values_list('task').annotate(
+            Avg('duration')
+        ).order_by()
+    )
+    return {
+        'statuses': by_status,
+        'lag': (now - oldest).total_seconds() if oldest else 0,
+        'durations': durations,
+    }
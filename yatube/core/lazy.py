@@ -0,0 +1,13 @@
+from functools import partial
+from importlib import import_module
+
+from django.utils.functional import SimpleLazyObject
+
+
+def lazy_import(name):
+    """Модуль, который импортируется при первом обращении к атрибуту.
+
+    Для тяжёлых библиотек (numpy), нужных только части запросов и
+    команд: воркер и manage.py не платят за их импорт при старте.
+    """
+    return SimpleLazyObject(partial(import_module, name))
@@ -0,0 +1,19 @@
+from django.template.loaders import filesystem
+
+from .minify import minify_html
+
+
+class MinifyingLoader(filesystem.Loader):
+    """filesystem.Loader, отдающий .html-шаблоны без лишних пробелов.
+
+    Под cached.Loader пробелы вырезаются один раз при компиляции
+    шаблона, а не при каждом рендере. Номера строк в отладочных
+    страницах при этом съезжают, поэтому загрузчик включается только без
+    DEBUG. Шаблоны приложений (письма auth, админка) не трогаются.
+    """
+
+    def get_contents(self, origin):
+        contents = super().get_contents(origin)
+        if origin.template_name.endswith('.html'):
+            return minify_html(contents)
+        return contents
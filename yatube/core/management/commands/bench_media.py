@@ -0,0 +1,87 @@
+import os
+import tempfile
+import time
+
+from django.conf import settings
+from django.core.handlers.wsgi import WSGIHandler
+from django.core.management.base import BaseCommand
+from django.test import RequestFactory, override_settings
+
+MB = 1024 * 1024
+
+
+class SendfileWrapper:
+    """wsgi.file_wrapper, как в gunicorn: os.sendfile вместо read()."""
+
+    def __init__(self, out):
+        self.out = out
+
+    def __call__(self, file, block_size=None):
+        return self, file
+
+    def send(self, file, length):
+        offset = file.tell()
+        while length:
+            sent = os.sendfile(self.out, file.fileno(), offset, length)
+            offset += sent
+            length -= sent
+
+
+class Command(BaseCommand):
+    help = (
+        'Пропускная способность одного воркера при раздаче медиа: '
+        'чтение в Python, os.sendfile и X-Accel-Redirect.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--size', type=int, default=16, help='МБ')
+        parser.add_argument('--requests', type=int, default=50)
+
+    def measure(self, environ, requests, size, out, wrapper=None):
+        handler = WSGIHandler()
+        started = time.perf_counter()
+        for _ in range(requests):
+            env = dict(environ)
+            if wrapper:
+                env['wsgi.file_wrapper'] = wrapper
+            result = handler(env, lambda status, headers: None)
+            if isinstance(result, tuple):
+                wrapper.send(result[1], size)
+                result[1].close()
+            else:
+                for chunk in result:
+                    os.write(out, chunk)
+                result.close()
+        return time.perf_counter() - started
+
+    def handle(self, *args, **options):
+        size = options['size'] * MB
+        requests = options['requests']
+        folder = os.path.join(settings.MEDIA_ROOT, 'posts')
+        os.makedirs(folder, exist_ok=True)
+        with tempfile.NamedTemporaryFile(
+            dir=folder, suffix='.bin'
+        ) as file, open(os.devnull, 'wb') as devnull:
+            file.write(os.urandom(MB) * options['size'])
+            file.flush()
+            url = settings.MEDIA_URL + 'posts/' + os.path.basename(file.name)
+            environ = RequestFactory().get(url).environ
+            out = devnull.fileno()
+            modes = (
+                ('Python', {}, None),
+                ('os.sendfile', {}, SendfileWrapper(out)),
+                (
+                    'X-Accel-Redirect',
+                    {'MEDIA_SENDFILE': 'x-accel-redirect'},
+                    None,
+                ),
+            )
+            for label, overrides, wrapper in modes:
+                with override_settings(**overrides):
+                    elapsed = self.measure(
+                        environ, requests, size, out, wrapper
+                    )
+                self.stdout.write(
+                    f'{label}: {requests * size / MB / elapsed:.0f} МБ/с, '
+                    f'{requests / elapsed:.0f} запросов/с'
+                )
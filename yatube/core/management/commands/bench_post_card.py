@@ -0,0 +1,56 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.template import engines
+from django.template.loader import get_template
+
+from posts.models import Post
+
+# Карточка в прежнем виде: URL разрешаются тегом {% url %} на каждый пост.
+LEGACY_URLS = (
+    ('{{ profile_url }}', "{% url 'posts:profile' post.author %}"),
+    ('{{ group_url }}', "{% url 'posts:group_list' post.group.slug %}"),
+    ('{{ detail_url }}', "{% url 'posts:post_detail' post.pk %}"),
+)
+
+INCLUDE_LOOP = (
+    '{% for post in posts %}{% include card %}{% endfor %}'
+)
+TAG_LOOP = (
+    '{% load post_cards %}{% for post in posts %}{% post_card post %}'
+    '{% endfor %}'
+)
+
+
+def legacy_card():
+    source = get_template('posts/includes/post_card.html').template.source
+    for current, legacy in LEGACY_URLS:
+        source = source.replace(current, legacy)
+    return engines['django'].from_string(source).template
+
+
+class Command(BaseCommand):
+    help = 'Время рендера страницы постов через include и через post_card.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--posts', type=int, default=10)
+        parser.add_argument('--iterations', type=int, default=200)
+
+    def measure(self, source, context, iterations):
+        template = engines['django'].from_string(source)
+        started = time.perf_counter()
+        for _ in range(iterations):
+            template.render(context)
+        return (time.perf_counter() - started) / iterations * 1000
+
+    def handle(self, *args, **options):
+        posts = list(
+            Post.objects.select_related('author', 'group')[:options['posts']]
+        )
+        context = {'posts': posts, 'card': legacy_card()}
+        for label, source in (('include', INCLUDE_LOOP),
+                              ('post_card', TAG_LOOP)):
+            elapsed = self.measure(source, context, options['iterations'])
+            self.stdout.write(
+                f'{label}: {elapsed:.3f} мс на {len(posts)} постов'
+            )
@@ -0,0 +1,62 @@
+import time
+
+from django.conf import settings
+from django.contrib.auth.models import AnonymousUser
+from django.core.cache import cache
+from django.core.cache.utils import make_template_fragment_key
+from django.core.management.base import BaseCommand
+from django.template.backends.django import DjangoTemplates
+from django.test import RequestFactory
+
+from posts.models import Post
+from posts.utils import pagination
+
+PLAIN_LOADERS = [
+    'django.template.loaders.filesystem.Loader',
+    'django.template.loaders.app_directories.Loader',
+]
+CACHED_LOADERS = [('django.template.loaders.cached.Loader', PLAIN_LOADERS)]
+
+
+def make_backend(name, loaders):
+    options = settings.TEMPLATES[0]['OPTIONS'].copy()
+    options['loaders'] = loaders
+    return DjangoTemplates({
+        'NAME': name,
+        'DIRS': [settings.TEMPLATES_DIR],
+        'APP_DIRS': False,
+        'OPTIONS': options,
+    })
+
+
+class Command(BaseCommand):
+    help = 'Время рендера posts/index.html без кэша шаблонов и с ним.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--iterations', type=int, default=200)
+
+    def measure(self, backend, request, iterations):
+        page_obj = pagination(
+            Post.objects.select_related('author', 'group'), request
+        )
+        list(page_obj)
+        fragment_key = make_template_fragment_key('index_page', [page_obj])
+        started = time.perf_counter()
+        for _ in range(iterations):
+            # Фрагментный кэш index.html скрыл бы стоимость цикла по постам.
+            cache.delete(fragment_key)
+            template = backend.get_template('posts/index.html')
+            template.render({'page_obj': page_obj}, request)
+        return (time.perf_counter() - started) / iterations * 1000
+
+    def handle(self, *args, **options):
+        iterations = options['iterations']
+        request = RequestFactory().get('/')
+        request.user = AnonymousUser()
+        results = (
+            ('без кэша', make_backend('plain', PLAIN_LOADERS)),
+            ('cached.Loader', make_backend('cached', CACHED_LOADERS)),
+        )
+        for label, backend in results:
+            elapsed = self.measure(backend, request, iterations)
+            self.stdout.write(f'{label}: {elapsed:.3f} мс на запрос')
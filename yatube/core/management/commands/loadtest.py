@@ -0,0 +1,50 @@
+import statistics
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.error import URLError
+from urllib.request import urlopen
+
+from django.core.management.base import BaseCommand
+
+
+class Command(BaseCommand):
+    help = (
+        'Нагрузочный тест запущенного сервера: например, сравнить '
+        '"gunicorn yatube.wsgi" и "uvicorn yatube.asgi:application" '
+        'на одной машине с одинаковым числом воркеров.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('url')
+        parser.add_argument('--concurrency', type=int, default=32)
+        parser.add_argument('--requests', type=int, default=1000)
+        parser.add_argument('--timeout', type=float, default=30)
+
+    def fetch(self, url, timeout):
+        started = time.perf_counter()
+        try:
+            with urlopen(url, timeout=timeout) as response:
+                response.read()
+        except (URLError, OSError):
+            return None
+        return time.perf_counter() - started
+
+    def handle(self, *args, **options):
+        url = options['url']
+        started = time.perf_counter()
+        with ThreadPoolExecutor(options['concurrency']) as executor:
+            results = list(executor.map(
+                lambda _: self.fetch(url, options['timeout']),
+                range(options['requests']),
+            ))
+        elapsed = time.perf_counter() - started
+        latencies = sorted(result for result in results if result is not None)
+        errors = len(results) - len(latencies)
+        self.stdout.write(f'{len(results) / elapsed:.1f} запросов/с, '
+                          f'ошибок: {errors}')
+        if latencies:
+            p95 = latencies[int(len(latencies) * 0.95) - 1]
+            self.stdout.write(
+                f'задержка: медиана {statistics.median(latencies) * 1000:.1f}'
+                f' мс, p95 {p95 * 1000:.1f} мс'
+            )
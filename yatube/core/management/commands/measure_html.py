@@ -0,0 +1,63 @@
+import gzip
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.management.base import BaseCommand
+from django.test import Client, override_settings
+from django.urls import reverse
+
+from posts.models import Group, Post
+
+PLAIN_LOADERS = [
+    'django.template.loaders.filesystem.Loader',
+    'django.template.loaders.app_directories.Loader',
+]
+MINIFYING_LOADERS = [
+    'core.loaders.MinifyingLoader',
+    'django.template.loaders.app_directories.Loader',
+]
+
+
+def templates_with(loaders):
+    options = dict(settings.TEMPLATES[0]['OPTIONS'], loaders=loaders)
+    return [dict(settings.TEMPLATES[0], APP_DIRS=False, OPTIONS=options)]
+
+
+class Command(BaseCommand):
+    help = 'Размер страниц ленты с исходными и сжатыми шаблонами.'
+
+    def feed_urls(self):
+        urls = [reverse('posts:index')]
+        group = Group.objects.first()
+        if group:
+            urls.append(reverse('posts:group_list', args=(group.slug,)))
+        post = Post.objects.select_related('author').first()
+        if post:
+            urls.append(
+                reverse('posts:profile', args=(post.author.username,))
+            )
+        return urls
+
+    def sizes(self, loaders, urls):
+        with override_settings(TEMPLATES=templates_with(loaders)):
+            cache.clear()
+            client = Client()
+            return {
+                url: client.get(url, HTTP_HOST='localhost').content
+                for url in urls
+            }
+
+    def handle(self, *args, **options):
+        urls = self.feed_urls()
+        plain = self.sizes(PLAIN_LOADERS, urls)
+        minified = self.sizes(MINIFYING_LOADERS, urls)
+        for url in urls:
+            before, after = len(plain[url]), len(minified[url])
+            zipped = [
+                len(gzip.compress(page[url])) for page in (plain, minified)
+            ]
+            self.stdout.write(
+                f'{url}: {before} -> {after} байт '
+                f'(-{100 - after * 100 / before:.0f}%), '
+                f'gzip {zipped[0]} -> {zipped[1]} байт'
+            )
@@ -0,0 +1,81 @@
+import os
+import statistics
+import subprocess
+import sys
+import time
+from collections import Counter
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+# Что делает процесс при холодном старте.
+TARGETS = {
+    'wsgi': 'import yatube.wsgi',
+    'manage': (
+        'from django.core.management import execute_from_command_line; '
+        'execute_from_command_line(["manage.py", "check"])'
+    ),
+}
+
+
+def parse_importtime(output):
+    """Строки python -X importtime -> [(модуль, свое, всего)] в мкс."""
+    modules = []
+    for line in output.splitlines():
+        if not line.startswith('import time:'):
+            continue
+        own, cumulative, name = line[len('import time:'):].split('|')
+        if not own.strip().isdigit():
+            continue
+        modules.append((name.strip(), int(own), int(cumulative)))
+    return modules
+
+
+class Command(BaseCommand):
+    help = (
+        'Профиль холодного старта воркера (yatube.wsgi) или manage.py: '
+        'время запуска и разбивка импорта по пакетам.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--target', choices=TARGETS, default='wsgi')
+        parser.add_argument('--repeat', type=int, default=5)
+        parser.add_argument('--limit', type=int, default=15)
+
+    def run(self, script, *flags):
+        env = dict(os.environ, DJANGO_SETTINGS_MODULE='yatube.settings')
+        started = time.perf_counter()
+        process = subprocess.run(
+            [sys.executable, *flags, '-c', script],
+            cwd=settings.BASE_DIR, env=env,
+            stdout=subprocess.DEVNULL, stderr=subprocess.PIPE,
+            universal_newlines=True, check=True,
+        )
+        return time.perf_counter() - started, process.stderr
+
+    def handle(self, *args, **options):
+        script = TARGETS[options['target']]
+        limit = options['limit']
+        timings = [self.run(script)[0] for _ in range(options['repeat'])]
+        self.stdout.write(
+            f'Старт {options["target"]}: медиана '
+            f'{statistics.median(timings) * 1000:.0f} мс '
+            f'из {len(timings)} запусков'
+        )
+        modules = parse_importtime(self.run(script, '-X', 'importtime')[1])
+        packages = Counter()
+        for name, own, _ in modules:
+            packages[name.split('.')[0]] += own
+        total = sum(packages.values())
+        self.stdout.write(
+            f'Импорт: {total / 1000:.0f} мс, модулей: {len(modules)}'
+        )
+        for package, own in packages.most_common(limit):
+            self.stdout.write(
+                f'  {package:<24} {own / 1000:7.1f} мс '
+                f'{own * 100 / total:5.1f}%'
+            )
+        self.stdout.write('Самые долгие модули (с зависимостями):')
+        heaviest = sorted(modules, key=lambda module: -module[2])
+        for name, _, cumulative in heaviest[:limit]:
+            self.stdout.write(f'  {name:<48} {cumulative / 1000:7.1f} мс')
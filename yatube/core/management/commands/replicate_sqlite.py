@@ -0,0 +1,38 @@
+import sqlite3
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+
+def copy_database(source, target):
+    """Согласованная копия SQLite-базы через backup API."""
+    with sqlite3.connect(source) as src, sqlite3.connect(target) as dst:
+        src.backup(dst)
+
+
+class Command(BaseCommand):
+    help = (
+        'Имитация репликации для локальной разработки: копирует основную '
+        'SQLite-базу в файлы реплик из REPLICA_DATABASES.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--once', action='store_true', help='Скопировать и выйти.'
+        )
+        parser.add_argument('--interval', type=float, default=1.0)
+
+    def handle(self, *args, **options):
+        source = settings.DATABASES['default']['NAME']
+        targets = [
+            settings.DATABASES[alias]['NAME']
+            for alias in settings.REPLICA_DATABASES
+        ]
+        while True:
+            for target in targets:
+                copy_database(source, target)
+            if options['once']:
+                break
+            time.sleep(options['interval'])
+        self.stdout.write(f'Реплик обновлено: {len(targets)}')
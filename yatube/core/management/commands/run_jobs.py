@@ -0,0 +1,76 @@
+import os
+import socket
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import connection, connections
+
+from core.jobs import claim, execute, stats
+
+
+def execute_in_thread(job_id):
+    try:
+        return execute(job_id)
+    finally:
+        # У каждого потока своё соединение, закрываем его за собой.
+        connection.close()
+
+
+class Command(BaseCommand):
+    help = 'Выполняет фоновые задачи из очереди Job.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--workers', type=int, default=settings.JOB_WORKERS
+        )
+        parser.add_argument(
+            '--processes', action='store_true',
+            help='Пул процессов вместо пула потоков (для задач на CPU).'
+        )
+        parser.add_argument(
+            '--batch-size', type=int, default=settings.JOB_BATCH_SIZE
+        )
+        parser.add_argument(
+            '--once', action='store_true',
+            help='Разобрать готовые задачи и выйти.'
+        )
+        parser.add_argument('--interval', type=float, default=1.0)
+
+    def handle(self, *args, **options):
+        workers = options['workers']
+        if options['processes']:
+            # Дочерние процессы не должны делить соединение родителя.
+            connections.close_all()
+            pool = ProcessPoolExecutor(workers)
+        else:
+            pool = ThreadPoolExecutor(workers)
+        self.stdout.write(
+            f'Воркер {socket.gethostname()}:{os.getpid()}, '
+            f'{"процессов" if options["processes"] else "потоков"}: '
+            f'{workers}'
+        )
+        done = failed = 0
+        started = time.monotonic()
+        with pool:
+            while True:
+                ids = claim(options['batch_size'])
+                if not ids:
+                    if options['once']:
+                        break
+                    time.sleep(options['interval'])
+                    continue
+                if options['processes']:
+                    connections.close_all()
+                    results = list(pool.map(execute, ids))
+                else:
+                    results = list(pool.map(execute_in_thread, ids))
+                done += results.count(True)
+                failed += results.count(False)
+        elapsed = time.monotonic() - started
+        self.stdout.write(
+            f'Выполнено: {done}, с ошибкой: {failed}, '
+            f'{done / elapsed if elapsed else 0:.1f} задач/с'
+        )
+        self.stdout.write(f'Очередь: {stats()}')
@@ -0,0 +1,148 @@
+"""Раздача загруженных файлов из MEDIA_ROOT.
+
+Проверка доступа не ходит в базу: путь должен лежать в одном из
+MEDIA_PUBLIC_DIRS и не содержать скрытых частей, всё остальное - 404.
+Если перед приложением стоит nginx или Apache, MEDIA_SENDFILE передаёт
+им отправку файла заголовком X-Accel-Redirect или X-Sendfile, и воркер
+освобождается сразу. Иначе файл отдаёт FileResponse: WSGI-сервер с
+wsgi.file_wrapper (gunicorn) пересылает его через os.sendfile без
+копирования в Python, в том числе для запросов с Range.
+"""
+import mimetypes
+import os
+import re
+import stat
+
+from django.conf import settings
+from django.core.exceptions import SuspiciousFileOperation
+from django.http import (
+    FileResponse, Http404, HttpResponse, HttpResponseNotModified
+)
+from django.utils._os import safe_join
+from django.utils.http import http_date
+from django.views.decorators.http import require_safe
+from django.views.static import was_modified_since
+
+RANGE = re.compile(r'^bytes=(\d*)-(\d*)$')
+
+
+class FileRange:
+    """Окно [start, start + length) открытого файла.
+
+    read() не выходит за окно, а fileno() и tell() отдаются как есть:
+    sendfile в gunicorn берёт смещение из файла, а длину - из
+    Content-Length.
+    """
+
+    def __init__(self, file, start, length):
+        self.file = file
+        self.remaining = length
+        file.seek(start)
+
+    def read(self, size=-1):
+        if size < 0 or size > self.remaining:
+            size = self.remaining
+        data = self.file.read(size)
+        self.remaining -= len(data)
+        return data
+
+    def fileno(self):
+        return self.file.fileno()
+
+    def tell(self):
+        return self.file.tell()
+
+    def close(self):
+        self.file.close()
+
+
+def resolve(path):
+    """Абсолютный путь и stat файла или Http404."""
+    parts = path.split('/')
+    if (
+        not path.startswith(settings.MEDIA_PUBLIC_DIRS)
+        or any(not part or part.startswith('.') for part in parts)
+    ):
+        raise Http404
+    try:
+        fullpath = safe_join(settings.MEDIA_ROOT, *parts)
+        stats = os.stat(fullpath)
+    except (SuspiciousFileOperation, OSError):
+        raise Http404
+    if not stat.S_ISREG(stats.st_mode):
+        raise Http404
+    return fullpath, stats
+
+
+def parse_range(header, size):
+    """(start, end) включительно, None без Range или False, если вне файла.
+
+    Несколько диапазонов в одном заголовке не поддерживаются, такой
+    запрос получает файл целиком, как разрешает RFC 7233.
+    """
+    match = RANGE.match(header.replace(' ', ''))
+    if not match or not any(match.groups()):
+        return None
+    first, last = match.groups()
+    if not first:
+        start, end = max(size - int(last), 0), size - 1
+    else:
+        start = int(first)
+        end = min(int(last), size - 1) if last else size - 1
+    if start >= size or start > end:
+        return False
+    return start, end
+
+
+def offload(response, path, fullpath):
+    if settings.MEDIA_SENDFILE == 'x-accel-redirect':
+        response['X-Accel-Redirect'] = settings.MEDIA_ACCEL_PREFIX + path
+    else:
+        response['X-Sendfile'] = fullpath
+
+
+@require_safe
+def serve_media(request, path):
+    fullpath, stats = resolve(path)
+    if not was_modified_since(
+        request.META.get('HTTP_IF_MODIFIED_SINCE'),
+        stats.st_mtime, stats.st_size
+    ):
+        return HttpResponseNotModified()
+    content_type = (
+        mimetypes.guess_type(fullpath)[0] or 'application/octet-stream'
+    )
+    if settings.MEDIA_SENDFILE:
+        # Range, HEAD и длину веб-сервер посчитает сам.
+        response = HttpResponse(content_type=content_type)
+        offload(response, path, fullpath)
+    else:
+        response = ranged_response(request, fullpath, stats.st_size)
+        response['Content-Type'] = content_type
+    response['Last-Modified'] = http_date(stats.st_mtime)
+    response['Cache-Control'] = f'public, max-age={settings.MEDIA_MAX_AGE}'
+    return response
+
+
+def ranged_response(request, fullpath, size):
+    requested = parse_range(request.META.get('HTTP_RANGE', ''), size)
+    if requested is False:
+        response = HttpResponse(status=416)
+        response['Content-Range'] = f'bytes */{size}'
+        return response
+    start, end = requested or (0, size - 1)
+    length = end - start + 1
+    if request.method == 'HEAD':
+        response = HttpResponse()
+    elif requested:
+        response = FileResponse(
+            FileRange(open(fullpath, 'rb'), start, length)
+        )
+    else:
+        response = FileResponse(open(fullpath, 'rb'))
+    if requested:
+        response.status_code = 206
+        response['Content-Range'] = f'bytes {start}-{end}/{size}'
+    response['Accept-Ranges'] = 'bytes'
+    response['Content-Length'] = length
+    return response
@@ -0,0 +1,64 @@
+"""Удаление лишних пробелов из HTML.
+
+Браузер показывает любую последовательность пробельных символов в тексте
+как один пробел, а пробелы рядом с блочными тегами не показывает вовсе.
+Поэтому minify_html схлопывает такие последовательности и убирает их
+между блочными тегами, не трогая содержимое <pre>, <textarea>, <script>
+и <style>, атрибуты тегов и условные комментарии IE.
+
+Годится и для исходника шаблона: теги {% %} и {{ }} в тексте остаются
+как есть, меняются только пробелы вокруг них.
+"""
+import re
+
+PRESERVED = re.compile(
+    r'(<(pre|textarea|script|style)\b.*?</\2\s*>)', re.S | re.I
+)
+# Комментарии с тегами шаблона остаются: в исходнике шаблона без них
+# нарушилась бы вложенность {% if %} и {% block %}.
+COMMENTS = re.compile(r'<!--(?!\[if)(?:(?!{%).)*?-->', re.S)
+TOKENS = re.compile(r'<[^>]*>|[^<]+|<')
+SPACES = re.compile(r'\s+')
+TAG_NAME = re.compile(r'</?([a-zA-Z][\w-]*)')
+BLOCK_TAGS = frozenset((
+    'address', 'article', 'aside', 'blockquote', 'body', 'br', 'dd',
+    'details', 'div', 'dl', 'dt', 'fieldset', 'figcaption', 'figure',
+    'footer', 'form', 'h1', 'h2', 'h3', 'h4', 'h5', 'h6', 'head', 'header',
+    'hr', 'html', 'li', 'link', 'main', 'meta', 'nav', 'ol', 'option',
+    'p', 'section', 'select', 'summary', 'table', 'tbody', 'td', 'tfoot',
+    'th', 'thead', 'title', 'tr', 'ul',
+))
+
+
+def is_block(token):
+    match = TAG_NAME.match(token)
+    return bool(match) and match.group(1).lower() in BLOCK_TAGS
+
+
+def minify_text(html):
+    tokens = TOKENS.findall(COMMENTS.sub('', html))
+    result = []
+    for position, token in enumerate(tokens):
+        if token.startswith('<') and len(token) > 1:
+            result.append(token)
+            continue
+        if token.strip():
+            result.append(SPACES.sub(' ', token))
+            continue
+        previous = tokens[position - 1] if position else ''
+        following = tokens[position + 1] if position + 1 < len(tokens) else ''
+        if not (is_block(previous) or is_block(following)):
+            result.append(' ')
+    return ''.join(result)
+
+
+def minify_html(html):
+    """HTML без незначащих пробелов и комментариев."""
+    parts = PRESERVED.split(html)
+    # split отдаёт тройки: текст, сохраняемый блок, имя его тега.
+    result = []
+    for position in range(0, len(parts), 3):
+        result.append(minify_text(parts[position]))
+        if position + 1 < len(parts):
+            result.append(parts[position + 1])
+    return ''.join(result).strip()
@@ -0,0 +1,83 @@
+from django.db import models
+from django.utils import timezone
+
+
+class Job(models.Model):
+    QUEUED = 'queued'
+    RUNNING = 'running'
+    DONE = 'done'
+    FAILED = 'failed'
+    STATUSES = (
+        (QUEUED, 'В очереди'),
+        (RUNNING, 'Выполняется'),
+        (DONE, 'Выполнено'),
+        (FAILED, 'Ошибка'),
+    )
+
+    task = models.CharField(
+        'Задача',
+        max_length=255,
+        help_text='Путь к функции, например posts.tasks.make_thumbnails'
+    )
+    payload = models.TextField(
+        'Аргументы',
+        default='{}',
+        help_text='JSON с args и kwargs'
+    )
+    status = models.CharField(
+        'Статус',
+        max_length=16,
+        choices=STATUSES,
+        default=QUEUED
+    )
+    run_at = models.DateTimeField(
+        'Запустить не раньше',
+        default=timezone.now
+    )
+    attempts = models.PositiveSmallIntegerField(
+        'Попыток',
+        default=0
+    )
+    max_attempts = models.PositiveSmallIntegerField(
+        'Максимум попыток'
+    )
+    claim = models.CharField(
+        'Метка воркера',
+        max_length=64,
+        blank=True,
+        db_index=True
+    )
+    locked_at = models.DateTimeField(
+        'Взята в работу',
+        blank=True,
+        null=True
+    )
+    created = models.DateTimeField(
+        'Создана',
+        auto_now_add=True
+    )
+    finished = models.DateTimeField(
+        'Завершена',
+        blank=True,
+        null=True
+    )
+    duration = models.FloatField(
+        'Длительность, с',
+        blank=True,
+        null=True
+    )
+    last_error = models.TextField(
+        'Последняя ошибка',
+        blank=True
+    )
+
+    class Meta:
+        verbose_name = 'Фоновая задача'
+        verbose_name_plural = 'Фоновые задачи'
+        ordering = ('run_at',)
+        indexes = (
+            models.Index(fields=('status', 'run_at')),
+        )
+
+    def __str__(self):
+        return f'{self.task} ({self.get_status_display()})'
@@ -0,0 +1,63 @@
+from django.conf import settings
+from django.core.paginator import Paginator
+from django.db import connections
+from django.utils.functional import cached_property
+
+
+def estimate_count(model, using):
+    """Оценка числа строк таблицы из статистики СУБД без её просмотра.
+
+    None, если оценки нет (например, на SQLite ещё не было ANALYZE и
+    таблица пуста).
+    """
+    connection = connections[using]
+    table = model._meta.db_table
+    with connection.cursor() as cursor:
+        if connection.vendor == 'postgresql':
+            cursor.execute(
+                'SELECT reltuples::bigint FROM pg_class '
+                'WHERE oid = %s::regclass',
+                [table],
+            )
+        elif connection.vendor == 'sqlite':
+            cursor.execute(
+                "SELECT name FROM sqlite_master WHERE name = 'sqlite_stat1'"
+            )
+            if cursor.fetchone():
+                cursor.execute(
+                    'SELECT stat FROM sqlite_stat1 WHERE tbl = %s', [table]
+                )
+                row = cursor.fetchone()
+                if row:
+                    return int(row[0].split()[0])
+            # Без статистики: разброс первичного ключа, оба конца берутся
+            # из индекса. Удалённые строки делают оценку завышенной.
+            pk = connection.ops.quote_name(model._meta.pk.column)
+            cursor.execute(
+                f'SELECT MAX({pk}) - MIN({pk}) + 1 '
+                f'FROM {connection.ops.quote_name(table)}'
+            )
+        else:
+            return None
+        row = cursor.fetchone()
+    return row[0] if row and row[0] and row[0] > 0 else None
+
+
+class EstimatedCountPaginator(Paginator):
+    """Пагинатор, не считающий строки большой нефильтрованной таблицы.
+
+    Для выборки без условий число страниц считается по оценке из
+    статистики СУБД, если она не меньше ESTIMATED_COUNT_THRESHOLD; на
+    меньших таблицах и с фильтрами выполняется обычный COUNT(*).
+    """
+
+    @cached_property
+    def count(self):
+        query = getattr(self.object_list, 'query', None)
+        if query is not None and not query.where:
+            estimate = estimate_count(
+                self.object_list.model, self.object_list.db
+            )
+            if estimate and estimate >= settings.ESTIMATED_COUNT_THRESHOLD:
+                return estimate
+        return super().count
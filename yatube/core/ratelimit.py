@@ -0,0 +1,68 @@
+from functools import wraps
+from time import time
+
+from django.conf import settings
+from django.core.cache import cache
+
+from .views import too_many_requests
+
+UNITS = {'s': 1, 'm': 60, 'h': 60 * 60, 'd': 60 * 60 * 24}
+
+
+def parse_rate(rate):
+    """'10/m' -> (10, 60): число запросов и длина окна в секундах."""
+    count, period = rate.split('/')
+    return int(count), UNITS[period]
+
+
+def client_ip(request):
+    return request.META.get('REMOTE_ADDR', '')
+
+
+def client_key(request, by):
+    if by == 'user' or (by == 'user_or_ip' and request.user.is_authenticated):
+        return f'user:{request.user.pk}'
+    return f'ip:{client_ip(request)}'
+
+
+def hit(key, period):
+    """Атомарно учитывает запрос в окне и возвращает их число.
+
+    Обычно это один incr; add нужен только на первом запросе окна и
+    задаёт его длину period. Если номер окна не входит в ключ, окно
+    отсчитывается от первого запроса.
+    """
+    try:
+        return cache.incr(key)
+    except ValueError:
+        if cache.add(key, 1, period):
+            return 1
+        # Параллельный запрос успел создать ключ.
+        return cache.incr(key)
+
+
+def ratelimit(scope, by='user_or_ip', methods=('POST',)):
+    """Ограничивает частоту запросов к виду.
+
+    Лимит берётся из settings.RATE_LIMITS[scope] (например, '10/m') при
+    каждом запросе и считается отдельно для пользователя или IP (by:
+    'user', 'ip' или 'user_or_ip') в фиксированных окнах. Сверх лимита
+    вид не вызывается, клиент получает 429 с Retry-After.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            rate = settings.RATE_LIMITS.get(scope)
+            if rate is None or request.method not in methods:
+                return view(request, *args, **kwargs)
+            limit, period = parse_rate(rate)
+            now = time()
+            window = int(now // period)
+            key = f'ratelimit:{scope}:{client_key(request, by)}:{window}'
+            if hit(key, period) > limit:
+                return too_many_requests(
+                    request, int((window + 1) * period - now) + 1
+                )
+            return view(request, *args, **kwargs)
+        return wrapper
+    return decorator
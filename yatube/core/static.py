@@ -0,0 +1,124 @@
+"""Раздача статики из STATIC_ROOT самим приложением.
+
+Для установки на одну машину без nginx: файлы индексируются один раз при
+старте процесса, ответ выбирается по словарю без обращений к диску,
+готовые .br/.gz отдаются клиентам, которые их принимают, а файлы с
+хешем в имени (из манифеста collectstatic) кэшируются браузером на год.
+"""
+import json
+import mimetypes
+import os
+import re
+from urllib.parse import unquote
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.http import FileResponse, HttpResponse, HttpResponseNotModified
+from django.utils.http import http_date, quote_etag
+
+ENCODINGS = (('br', '.br'), ('gzip', '.gz'))
+IMMUTABLE = 'public, max-age=31536000, immutable'
+
+
+class StaticFile:
+
+    def __init__(self, path, immutable):
+        stat = os.stat(path)
+        self.path = path
+        self.content_type = (
+            mimetypes.guess_type(path)[0] or 'application/octet-stream'
+        )
+        self.size = stat.st_size
+        self.etag = quote_etag(f'{stat.st_mtime_ns:x}-{stat.st_size:x}')
+        self.last_modified = http_date(stat.st_mtime)
+        self.cache_control = (
+            IMMUTABLE if immutable
+            else f'public, max-age={settings.STATIC_MAX_AGE}'
+        )
+        self.variants = {
+            encoding: (path + suffix, os.path.getsize(path + suffix))
+            for encoding, suffix in ENCODINGS
+            if os.path.exists(path + suffix)
+        }
+
+
+def scan(root):
+    """Индекс файлов STATIC_ROOT: URL-путь -> StaticFile."""
+    manifest = os.path.join(root, 'staticfiles.json')
+    hashed = set()
+    if os.path.exists(manifest):
+        with open(manifest) as file:
+            hashed = set(json.load(file).get('paths', {}).values())
+    index = {}
+    for directory, _, names in os.walk(root):
+        for name in names:
+            if name.endswith(('.gz', '.br')) or name == 'staticfiles.json':
+                continue
+            path = os.path.join(directory, name)
+            relative = os.path.relpath(path, root).replace(os.sep, '/')
+            index[settings.STATIC_URL + relative] = StaticFile(
+                path, relative in hashed
+            )
+    return index
+
+
+def accepted(header):
+    """Кодировки из Accept-Encoding, кроме явно запрещённых (q=0)."""
+    return {
+        match.group(1)
+        for match in re.finditer(r'([\w*-]+)\s*(;\s*q=([\d.]+))?', header)
+        if match.group(3) is None or float(match.group(3)) > 0
+    }
+
+
+class StaticFilesMiddleware:
+    """Отдаёт файлы из STATIC_ROOT, не доходя до URL-маршрутов.
+
+    Включается настройкой STATIC_SERVE; при отключённой раздаче или
+    отсутствии STATIC_ROOT Django убирает middleware из цепочки.
+    """
+
+    def __init__(self, get_response):
+        if not settings.STATIC_SERVE or not (
+            settings.STATIC_ROOT and os.path.isdir(settings.STATIC_ROOT)
+        ):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.files = scan(settings.STATIC_ROOT)
+
+    def __call__(self, request):
+        static = self.files.get(unquote(request.path_info))
+        if static is None or request.method not in ('GET', 'HEAD'):
+            return self.get_response(request)
+        return self.serve(request, static)
+
+    def serve(self, request, static):
+        path, size, encoding = static.path, static.size, None
+        if static.variants:
+            offered = accepted(request.META.get('HTTP_ACCEPT_ENCODING', ''))
+            for name, _ in ENCODINGS:
+                if name in static.variants and name in offered:
+                    (path, size), encoding = static.variants[name], name
+                    break
+        # У каждой кодировки свой ETag: это разные представления.
+        etag = static.etag if encoding is None else (
+            f'{static.etag[:-1]}-{encoding}"'
+        )
+        if request.META.get('HTTP_IF_NONE_MATCH') == etag:
+            response = HttpResponseNotModified()
+        else:
+            if request.method == 'HEAD':
+                response = HttpResponse()
+            else:
+                response = FileResponse(open(path, 'rb'))
+            # FileResponse угадал бы тип по имени .gz, задаём явно.
+            response['Content-Type'] = static.content_type
+            response['Content-Length'] = size
+            response['Last-Modified'] = static.last_modified
+            if encoding:
+                response['Content-Encoding'] = encoding
+        response['ETag'] = etag
+        response['Cache-Control'] = static.cache_control
+        if static.variants:
+            response['Vary'] = 'Accept-Encoding'
+        return response
@@ -0,0 +1,70 @@
+import gzip
+from io import BytesIO
+
+from django.contrib.staticfiles.storage import ManifestStaticFilesStorage
+from django.core.files.base import ContentFile
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# Картинки и шрифты уже сжаты, повторное сжатие ничего не даёт.
+COMPRESSIBLE = ('.css', '.js', '.svg', '.map', '.txt', '.json', '.xml',
+                '.html', '.ico')
+# Сжатая копия пишется, только если она меньше оригинала хотя бы на 5%.
+MIN_RATIO = 0.95
+
+
+def gzip_compress(content):
+    """gzip с нулевым mtime: одинаковый файл при каждом collectstatic.
+
+    gzip.compress принимает mtime только с Python 3.8.
+    """
+    buffer = BytesIO()
+    with gzip.GzipFile(
+        fileobj=buffer, mode='wb', compresslevel=9, mtime=0
+    ) as archive:
+        archive.write(content)
+    return buffer.getvalue()
+
+
+def compressed_variants(content):
+    """Сжатые версии содержимого: пары (расширение, байты)."""
+    variants = [('.gz', gzip_compress(content))]
+    if brotli is not None:
+        variants.append(('.br', brotli.compress(content)))
+    return [
+        (suffix, data) for suffix, data in variants
+        if len(data) < len(content) * MIN_RATIO
+    ]
+
+
+class CompressedManifestStaticFilesStorage(ManifestStaticFilesStorage):
+    """Хешированные имена файлов плюс готовые .gz и .br рядом с ними.
+
+    Сжатие делается один раз в collectstatic, сервер (nginx с gzip_static
+    и brotli_static или core.static.StaticFilesMiddleware) отдаёт готовый
+    файл без сжатия на лету.
+    """
+
+    def post_process(self, paths, dry_run=False, **options):
+        for name, hashed_name, processed in super().post_process(
+            paths, dry_run, **options
+        ):
+            if (
+                not dry_run and hashed_name
+                and not isinstance(processed, Exception)
+                and hashed_name.endswith(COMPRESSIBLE)
+            ):
+                self.compress(name)
+                self.compress(hashed_name)
+            yield name, hashed_name, processed
+
+    def compress(self, name):
+        with self.open(name) as original:
+            content = original.read()
+        for suffix, data in compressed_variants(content):
+            if self.exists(name + suffix):
+                self.delete(name + suffix)
+            self._save(name + suffix, ContentFile(data))
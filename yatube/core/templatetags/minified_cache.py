@@ -0,0 +1,24 @@
+from django import template
+from django.template.base import NodeList
+from django.templatetags.cache import do_cache
+
+from core.minify import minify_html
+
+register = template.Library()
+
+
+class MinifiedNodeList(NodeList):
+    def render(self, context):
+        return minify_html(super().render(context))
+
+
+@register.tag('cache')
+def do_minified_cache(parser, token):
+    """{% cache %}, который убирает лишние пробелы перед записью в кэш.
+
+    Фрагмент сжимается один раз при промахе кэша, попадания отдают уже
+    готовый короткий HTML.
+    """
+    node = do_cache(parser, token)
+    node.nodelist = MinifiedNodeList(node.nodelist)
+    return node
@@ -0,0 +1,44 @@
+from functools import lru_cache
+from urllib.parse import quote
+
+from django import template
+from django.urls import reverse
+from django.utils.http import RFC3986_SUBDELIMS
+
+register = template.Library()
+
+# Подходит под конвертеры int, slug и str, поэтому годится для всех URL.
+PLACEHOLDER = '1234567890'
+
+
+@lru_cache(maxsize=None)
+def url_parts(viewname):
+    """Префикс и суффикс URL вида, вычисленные один раз на процесс."""
+    prefix, suffix = reverse(viewname, args=(PLACEHOLDER,)).split(PLACEHOLDER)
+    return prefix, suffix
+
+
+def build_url(viewname, arg):
+    prefix, suffix = url_parts(viewname)
+    return f'{prefix}{quote(str(arg), safe=RFC3986_SUBDELIMS + "~:@")}{suffix}'
+
+
+@register.inclusion_tag('posts/includes/post_card.html', takes_context=True)
+def post_card(context, post):
+    author = context.get('author')
+    group = context.get('group')
+    # Ссылки строятся только для показанных элементов карточки: так
+    # страница группы не обращается к post.group каждого поста.
+    return {
+        'post': post,
+        'author': author,
+        'group': group,
+        'profile_url': (
+            '' if author else build_url('posts:profile', post.author.username)
+        ),
+        'group_url': (
+            build_url('posts:group_list', post.group.slug)
+            if not group and post.group_id else ''
+        ),
+        'detail_url': build_url('posts:post_detail', post.pk),
+    }
@@ -1,6 +1,52 @@
+import asyncio
+import gzip
+import os
+import shutil
+import sqlite3
+import subprocess
+import sys
+import tempfile
+from datetime import timedelta
 from http import HTTPStatus
+from io import StringIO
+from unittest import mock, skipUnless
 
-from django.test import TestCase
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.staticfiles.storage import staticfiles_storage
+from django.core.cache import cache, caches
+from django.core.cache.utils import make_template_fragment_key
+from django.core.management import call_command
+from django.template import engines
+from django.http import HttpResponse, StreamingHttpResponse
+from django.test import (
+    Client, RequestFactory, SimpleTestCase, TestCase, TransactionTestCase
+)
+from django.test import override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from posts.models import Comment, Group, Post
+
+from . import compression
+from .asgi import WsgiToAsgi
+from .compression import CompressionMiddleware
+from .db_router import ReplicaRouter, replica_reads
+from .jobs import claim, enqueue, execute, stats
+from .management.commands.bench_post_card import (
+    INCLUDE_LOOP, TAG_LOOP, legacy_card
+)
+from .management.commands.bench_templates import CACHED_LOADERS, make_backend
+from .management.commands.profile_startup import parse_importtime
+from .management.commands.replicate_sqlite import copy_database
+from .middleware import ReplicaRoutingMiddleware
+from .minify import minify_html
+from .models import Job
+from .ratelimit import ratelimit
+from .static import StaticFilesMiddleware
+from .warmup import template_names, warm_template_cache
+
+User = get_user_model()
 
 
 class ViewTestClass(TestCase):
@@ -18,3 +64,855 @@ class ViewTestClass(TestCase):
                 self.assertEqual(response.status_code, HTTPStatus.NOT_FOUND)
                 self.assertTemplateUsed(response, template)
 
+
+class TemplateWarmupTest(TestCase):
+
+    def test_warmup_fills_cached_loader(self):
+        """Прогрев компилирует все шаблоны в кэш cached.Loader."""
+        backend = make_backend('warmup', CACHED_LOADERS)
+        compiled = warm_template_cache(backend)
+        names = list(template_names(settings.TEMPLATES_DIR))
+        self.assertEqual(compiled, len(names))
+        loader = backend.engine.template_loaders[0]
+        for name in ('base.html', 'posts/index.html',
+                     'posts/includes/post_card.html'):
+            with self.subTest(name=name):
+                self.assertIn(name, loader.get_template_cache)
+
+    def test_warmup_runs_only_for_web_process(self):
+        """Прогрев запускает загрузка wsgi, а не django.setup()."""
+        script = (
+            'from unittest import mock; import core.warmup; '
+            'hook = mock.patch.object(core.warmup, "warm_up").start(); '
+            'import django; django.setup(); print(hook.called); '
+            'import yatube.wsgi; print(hook.called)'
+        )
+        output = subprocess.run(
+            [sys.executable, '-c', script],
+            cwd=settings.BASE_DIR, stdout=subprocess.PIPE, check=True,
+            env=dict(os.environ, DJANGO_SETTINGS_MODULE='yatube.settings'),
+        ).stdout
+        self.assertEqual(output.split(), [b'False', b'True'])
+
+    def test_bench_templates_command(self):
+        """Бенчмарк рендера index.html выводит оба замера."""
+        out = StringIO()
+        call_command('bench_templates', iterations=2, stdout=out)
+        self.assertIn('cached.Loader', out.getvalue())
+
+
+class StartupTest(SimpleTestCase):
+
+    def test_heavy_modules_are_lazy(self):
+        """Старт воркера и системные проверки не импортируют numpy и PIL."""
+        script = (
+            'import sys, yatube.wsgi; from django.core import checks; '
+            'checks.run_checks(); '
+            'print(" ".join(name for name in ("numpy", "PIL") '
+            'if name in sys.modules))'
+        )
+        output = subprocess.run(
+            [sys.executable, '-c', script],
+            cwd=settings.BASE_DIR, stdout=subprocess.PIPE, check=True,
+            env=dict(os.environ, DJANGO_SETTINGS_MODULE='yatube.settings'),
+        ).stdout
+        self.assertEqual(output.strip(), b'')
+
+    def test_parse_importtime(self):
+        """Разбор вывода python -X importtime."""
+        output = (
+            'import time: self [us] | cumulative | imported package\n'
+            'import time:       120 |        120 |   django.utils\n'
+            'import time:       300 |        420 | django\n'
+            'Посторонняя строка\n'
+        )
+        self.assertEqual(
+            parse_importtime(output),
+            [('django.utils', 120, 120), ('django', 300, 420)],
+        )
+
+    def test_profile_startup_command(self):
+        """profile_startup выводит время старта и разбивку по пакетам."""
+        out = StringIO()
+        call_command('profile_startup', repeat=1, limit=3, stdout=out)
+        self.assertIn('Старт wsgi', out.getvalue())
+        self.assertIn('django', out.getvalue())
+
+
+class MinifyHtmlTest(TestCase):
+
+    def test_insignificant_whitespace_removed(self):
+        """Пробелы схлопываются, у блочных тегов исчезают совсем."""
+        cases = (
+            ('<ul>\n  <li>\n    Пункт\n  </li>\n</ul>',
+             '<ul><li> Пункт </li></ul>'),
+            ('Автор:\n  <a href="#">\n  Имя  </a>\n  <b>x</b>',
+             'Автор: <a href="#"> Имя </a> <b>x</b>'),
+            ('<p>a</p>  <!-- комментарий -->\n<p>b</p>', '<p>a</p><p>b</p>'),
+            ('<!--[if IE]><p>IE</p><![endif]-->',
+             '<!--[if IE]><p>IE</p><![endif]-->'),
+            ('<input value="a   b"   >', '<input value="a   b"   >'),
+        )
+        for html, expected in cases:
+            with self.subTest(html=html):
+                self.assertEqual(minify_html(html), expected)
+
+    def test_preformatted_blocks_kept(self):
+        """<pre>, <textarea>, <script> и <style> не меняются."""
+        blocks = (
+            '<pre>  a\n    b</pre>',
+            '<textarea>\n  текст  </textarea>',
+            '<script>var a = 1\n  var b</script>',
+            '<STYLE>\n  p { margin: 0 }\n</STYLE>',
+        )
+        for block in blocks:
+            with self.subTest(block=block):
+                self.assertEqual(
+                    minify_html(f'<div>\n  {block}\n</div>'),
+                    f'<div>{block}</div>',
+                )
+        self.assertEqual(
+            minify_html('Поле: <textarea>x</textarea> ещё'),
+            'Поле: <textarea>x</textarea> ещё',
+        )
+
+    def test_template_source_stays_valid(self):
+        """Сжатые исходники всех шаблонов компилируются."""
+        backend = make_backend(
+            'minified', [('django.template.loaders.cached.Loader', [
+                'core.loaders.MinifyingLoader',
+            ])]
+        )
+        self.assertEqual(
+            warm_template_cache(backend),
+            len(list(template_names(settings.TEMPLATES_DIR))),
+        )
+        source = backend.engine.get_template(
+            'posts/includes/paginator.html'
+        ).source
+        self.assertNotIn('\n', source)
+        self.assertNotIn('  ', source)
+        self.assertEqual(
+            minify_html('<p>{% if a %}<!-- {% else %} -->{% endif %}</p>'),
+            '<p>{% if a %}<!-- {% else %} -->{% endif %}</p>',
+        )
+
+    def test_fragment_minified_before_caching(self):
+        """{% cache %} из minified_cache кладёт в кэш сжатый фрагмент."""
+        cache.clear()
+        template = engines['django'].from_string(
+            '{% load minified_cache %}{% cache 60 fragment %}'
+            '<ul>\n  <li>{{ text }}</li>\n</ul>{% endcache %}'
+        )
+        self.assertEqual(
+            template.render({'text': 'a'}), '<ul><li>a</li></ul>'
+        )
+        self.assertEqual(
+            cache.get(make_template_fragment_key('fragment')),
+            '<ul><li>a</li></ul>',
+        )
+        self.assertEqual(
+            template.render({'text': 'b'}), '<ul><li>a</li></ul>'
+        )
+
+
+class PostCardTagTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='card.user@test')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test_slug',
+            description='Тестовое описание',
+        )
+        cls.posts = [
+            Post.objects.create(author=cls.author, group=cls.group,
+                                text='Пост с группой'),
+            Post.objects.create(author=cls.author, text='Пост без группы'),
+        ]
+
+    def test_post_card_urls(self):
+        """post_card строит те же URL, что и reverse."""
+        html = engines['django'].from_string(TAG_LOOP).render(
+            {'posts': self.posts}
+        )
+        self.assertIn(
+            reverse('posts:profile', args=(self.author.username,)), html
+        )
+        self.assertIn(
+            reverse('posts:group_list', args=(self.group.slug,)), html
+        )
+
+    def test_post_card_skips_hidden_links(self):
+        """post_card не загружает группу и автора для скрытых ссылок."""
+        posts = list(Post.objects.filter(group=self.group))
+        with self.assertNumQueries(0):
+            engines['django'].from_string(TAG_LOOP).render(
+                {'posts': posts, 'author': self.author, 'group': self.group}
+            )
+
+    def test_post_card_matches_include(self):
+        """post_card рендерит ту же разметку, что и include карточки."""
+        context = {'posts': self.posts, 'card': legacy_card()}
+        self.assertEqual(
+            engines['django'].from_string(TAG_LOOP).render(context),
+            engines['django'].from_string(INCLUDE_LOOP).render(context),
+        )
+
+
+def echo_wsgi(environ, start_response):
+    start_response('201 Created', [('Content-Type', 'text/plain')])
+    return [
+        environ['REQUEST_METHOD'].encode(),
+        b' ',
+        environ['HTTP_X_TEST'].encode(),
+        b' ',
+        environ['wsgi.input'].read(),
+    ]
+
+
+def call_asgi(application, scope, body_chunks):
+    messages = [
+        {'type': 'http.request', 'body': chunk, 'more_body': True}
+        for chunk in body_chunks
+    ]
+    messages.append({'type': 'http.request', 'body': b''})
+    sent = []
+
+    async def receive():
+        return messages.pop(0)
+
+    async def send(message):
+        sent.append(message)
+
+    asyncio.run(application(scope, receive, send))
+    return sent
+
+
+class AsgiAdapterTest(SimpleTestCase):
+
+    def scope(self, path, method='GET', headers=()):
+        return {
+            'type': 'http',
+            'method': method,
+            'path': path,
+            'query_string': b'',
+            'headers': list(headers),
+            'client': ('127.0.0.1', 5000),
+            'server': ('testserver', 80),
+        }
+
+    def test_request_and_response_bridged(self):
+        """Тело, заголовки и статус проходят через адаптер без потерь."""
+        application = WsgiToAsgi(echo_wsgi, max_workers=2)
+        sent = call_asgi(
+            application,
+            self.scope('/', 'POST', [(b'x-test', b'value')]),
+            [b'chunk1-', b'chunk2'],
+        )
+        self.assertEqual(sent[0]['type'], 'http.response.start')
+        self.assertEqual(sent[0]['status'], 201)
+        self.assertIn((b'content-type', b'text/plain'), sent[0]['headers'])
+        body = b''.join(message.get('body', b'') for message in sent[1:])
+        self.assertEqual(body, b'POST value chunk1-chunk2')
+        self.assertFalse(sent[-1].get('more_body', False))
+
+    def test_django_page_served(self):
+        """Через ASGI отдаётся страница проекта."""
+        from yatube.asgi import application
+        sent = call_asgi(application, self.scope('/about/tech/'), [])
+        self.assertEqual(sent[0]['status'], HTTPStatus.OK)
+        body = b''.join(message.get('body', b'') for message in sent[1:])
+        self.assertIn('Технологии'.encode(), body)
+
+
+@override_settings(REPLICA_DATABASES=['replica1'])
+class ReplicaRoutingTest(SimpleTestCase):
+
+    def route(self, view, method='get', cookies=None, write=False):
+        """Выполняет вид через middleware и возвращает базу для чтения."""
+        router = ReplicaRouter()
+        used = {}
+
+        def get_response(request):
+            # Django вызывает process_view внутри цепочки __call__.
+            middleware.process_view(request, view, (), {})
+            if write:
+                router.db_for_write(Post)
+            used['db'] = router.db_for_read(Post)
+            return HttpResponse()
+
+        middleware = ReplicaRoutingMiddleware(get_response)
+        request = getattr(RequestFactory(), method)('/')
+        request.COOKIES.update(cookies or {})
+        response = middleware(request)
+        return used['db'], response
+
+    def test_read_only_view_uses_replica(self):
+        """Помеченный вид читает с реплики."""
+        db, response = self.route(replica_reads(lambda request: None))
+        self.assertEqual(db, 'replica1')
+        self.assertNotIn(settings.REPLICA_PIN_COOKIE, response.cookies)
+
+    def test_unmarked_view_and_post_use_primary(self):
+        """Непомеченные виды и POST читают с основной базы."""
+        self.assertEqual(self.route(lambda request: None)[0], 'default')
+        self.assertEqual(
+            self.route(replica_reads(lambda request: None), 'post')[0],
+            'default'
+        )
+
+    def test_write_pins_user_to_primary(self):
+        """После записи чтение идёт с основной базы, и ставится cookie."""
+        db, response = self.route(
+            replica_reads(lambda request: None), write=True
+        )
+        self.assertEqual(db, 'default')
+        self.assertIn(settings.REPLICA_PIN_COOKIE, response.cookies)
+        db, _ = self.route(
+            replica_reads(lambda request: None),
+            cookies={settings.REPLICA_PIN_COOKIE: '1'},
+        )
+        self.assertEqual(db, 'default')
+
+    def test_copy_database(self):
+        """replicate_sqlite переносит данные в файл реплики."""
+        with tempfile.TemporaryDirectory() as directory:
+            source = os.path.join(directory, 'primary.sqlite3')
+            target = os.path.join(directory, 'replica.sqlite3')
+            with sqlite3.connect(source) as connection:
+                connection.execute('CREATE TABLE t (value TEXT)')
+                connection.execute("INSERT INTO t VALUES ('данные')")
+            copy_database(source, target)
+            with sqlite3.connect(target) as connection:
+                rows = connection.execute('SELECT value FROM t').fetchall()
+        self.assertEqual(rows, [('данные',)])
+
+
+class StaticFilesTest(SimpleTestCase):
+    CSS = 'body { margin: 0; }\n' * 200
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.source = tempfile.mkdtemp(dir=settings.BASE_DIR)
+        cls.root = tempfile.mkdtemp(dir=settings.BASE_DIR)
+        os.makedirs(os.path.join(cls.source, 'css'))
+        with open(os.path.join(cls.source, 'css', 'app.css'), 'w') as file:
+            file.write(cls.CSS)
+        cls.settings = override_settings(
+            STATICFILES_DIRS=(cls.source,),
+            STATIC_ROOT=cls.root,
+            STATICFILES_STORAGE=(
+                'core.storage.CompressedManifestStaticFilesStorage'
+            ),
+            STATIC_SERVE=True,
+        )
+        cls.settings.enable()
+        call_command('collectstatic', interactive=False, verbosity=0)
+        cls.middleware = StaticFilesMiddleware(
+            lambda request: HttpResponse('view')
+        )
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.settings.disable()
+        shutil.rmtree(cls.source, ignore_errors=True)
+        shutil.rmtree(cls.root, ignore_errors=True)
+        super().tearDownClass()
+
+    def get(self, path, method='get', **headers):
+        request = getattr(RequestFactory(), method)(path, **headers)
+        return self.middleware(request)
+
+    def hashed_url(self):
+        return settings.STATIC_URL + staticfiles_storage.stored_name(
+            'css/app.css'
+        )
+
+    def test_collectstatic_writes_compressed_copies(self):
+        """collectstatic кладёт .gz рядом с исходным и хешированным."""
+        hashed = staticfiles_storage.stored_name('css/app.css')
+        self.assertNotEqual(hashed, 'css/app.css')
+        for name in ('css/app.css', hashed):
+            with open(os.path.join(self.root, name + '.gz'), 'rb') as file:
+                self.assertEqual(
+                    gzip.decompress(file.read()).decode(), self.CSS
+                )
+
+    def test_hashed_file_is_immutable(self):
+        """Файл с хешем в имени кэшируется на год, без хеша - нет."""
+        response = self.get(self.hashed_url())
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        self.assertIn('immutable', response['Cache-Control'])
+        self.assertEqual(response['Content-Type'], 'text/css')
+        response = self.get(settings.STATIC_URL + 'css/app.css')
+        self.assertEqual(
+            response['Cache-Control'],
+            f'public, max-age={settings.STATIC_MAX_AGE}',
+        )
+
+    def test_gzip_negotiation(self):
+        """Сжатая копия отдаётся только тем, кто её принимает."""
+        response = self.get(
+            self.hashed_url(), HTTP_ACCEPT_ENCODING='gzip, deflate'
+        )
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertEqual(response['Content-Type'], 'text/css')
+        self.assertEqual(response['Vary'], 'Accept-Encoding')
+        body = b''.join(response.streaming_content)
+        self.assertEqual(int(response['Content-Length']), len(body))
+        self.assertEqual(gzip.decompress(body).decode(), self.CSS)
+        for header in ('', 'gzip;q=0'):
+            response = self.get(
+                self.hashed_url(), HTTP_ACCEPT_ENCODING=header
+            )
+            self.assertFalse(response.has_header('Content-Encoding'))
+            self.assertEqual(
+                b''.join(response.streaming_content).decode(), self.CSS
+            )
+
+    def test_conditional_and_head_requests(self):
+        """If-None-Match даёт 304, HEAD - заголовки без тела."""
+        etag = self.get(self.hashed_url())['ETag']
+        gzip_etag = self.get(
+            self.hashed_url(), HTTP_ACCEPT_ENCODING='gzip'
+        )['ETag']
+        self.assertNotEqual(etag, gzip_etag)
+        response = self.get(self.hashed_url(), HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, HTTPStatus.NOT_MODIFIED)
+        response = self.get(self.hashed_url(), method='head')
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        self.assertEqual(response.content, b'')
+        self.assertEqual(int(response['Content-Length']), len(self.CSS))
+
+    def test_other_paths_reach_views(self):
+        """Неизвестные пути и POST проходят дальше по цепочке."""
+        self.assertEqual(
+            self.get(settings.STATIC_URL + 'missing.css').content, b'view'
+        )
+        self.assertEqual(
+            self.get(self.hashed_url(), method='post').content, b'view'
+        )
+
+
+class MediaServingTest(SimpleTestCase):
+    DATA = bytes(range(256)) * 40
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.root = tempfile.mkdtemp(dir=settings.BASE_DIR)
+        cls.settings = override_settings(MEDIA_ROOT=cls.root)
+        cls.settings.enable()
+        os.makedirs(os.path.join(cls.root, 'posts'))
+        os.makedirs(os.path.join(cls.root, 'private'))
+        for name in ('posts/image.jpg', 'posts/.hidden', 'private/file.jpg'):
+            with open(os.path.join(cls.root, name), 'wb') as file:
+                file.write(cls.DATA)
+        cls.url = settings.MEDIA_URL + 'posts/image.jpg'
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.settings.disable()
+        shutil.rmtree(cls.root, ignore_errors=True)
+        super().tearDownClass()
+
+    def test_whole_file(self):
+        """Файл отдаётся целиком с длиной, типом и Last-Modified."""
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        self.assertEqual(b''.join(response.streaming_content), self.DATA)
+        self.assertEqual(int(response['Content-Length']), len(self.DATA))
+        self.assertEqual(response['Content-Type'], 'image/jpeg')
+        self.assertEqual(response['Accept-Ranges'], 'bytes')
+        self.assertTrue(response.has_header('Last-Modified'))
+        response = self.client.head(self.url)
+        self.assertEqual(response.content, b'')
+        self.assertEqual(int(response['Content-Length']), len(self.DATA))
+
+    def test_range_requests(self):
+        """Range отдаёт нужный кусок, а диапазон вне файла - 416."""
+        size = len(self.DATA)
+        cases = (
+            ('bytes=100-199', 100, 199),
+            ('bytes=10000-', 10000, size - 1),
+            ('bytes=-16', size - 16, size - 1),
+            ('bytes=0-999999', 0, size - 1),
+        )
+        for header, start, end in cases:
+            with self.subTest(header=header):
+                response = self.client.get(self.url, HTTP_RANGE=header)
+                self.assertEqual(
+                    response.status_code, HTTPStatus.PARTIAL_CONTENT
+                )
+                self.assertEqual(
+                    response['Content-Range'], f'bytes {start}-{end}/{size}'
+                )
+                self.assertEqual(
+                    b''.join(response.streaming_content),
+                    self.DATA[start:end + 1],
+                )
+                self.assertEqual(
+                    int(response['Content-Length']), end - start + 1
+                )
+        response = self.client.get(self.url, HTTP_RANGE=f'bytes={size}-')
+        self.assertEqual(
+            response.status_code, HTTPStatus.REQUESTED_RANGE_NOT_SATISFIABLE
+        )
+        self.assertEqual(response['Content-Range'], f'bytes */{size}')
+        response = self.client.get(self.url, HTTP_RANGE='bytes=0-1,5-6')
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+
+    def test_if_modified_since(self):
+        """Неизменившийся файл получает 304."""
+        last_modified = self.client.get(self.url)['Last-Modified']
+        response = self.client.get(
+            self.url, HTTP_IF_MODIFIED_SINCE=last_modified
+        )
+        self.assertEqual(response.status_code, HTTPStatus.NOT_MODIFIED)
+
+    def test_forbidden_paths(self):
+        """Скрытые файлы, каталоги вне MEDIA_PUBLIC_DIRS и выход из
+        MEDIA_ROOT дают 404."""
+        paths = (
+            'posts/.hidden', 'private/file.jpg', 'posts/../private/file.jpg',
+            'posts/', 'posts/missing.jpg',
+        )
+        for path in paths:
+            with self.subTest(path=path):
+                response = self.client.get(settings.MEDIA_URL + path)
+                self.assertEqual(response.status_code, HTTPStatus.NOT_FOUND)
+        response = self.client.post(self.url)
+        self.assertEqual(
+            response.status_code, HTTPStatus.METHOD_NOT_ALLOWED
+        )
+
+    def test_offload_to_web_server(self):
+        """С MEDIA_SENDFILE файл отправляет веб-сервер."""
+        with override_settings(MEDIA_SENDFILE='x-accel-redirect'):
+            response = self.client.get(self.url)
+        self.assertEqual(
+            response['X-Accel-Redirect'],
+            settings.MEDIA_ACCEL_PREFIX + 'posts/image.jpg',
+        )
+        self.assertEqual(response.content, b'')
+        self.assertEqual(response['Content-Type'], 'image/jpeg')
+        with override_settings(MEDIA_SENDFILE='x-sendfile'):
+            response = self.client.get(self.url)
+        self.assertEqual(
+            response['X-Sendfile'],
+            os.path.join(self.root, 'posts', 'image.jpg'),
+        )
+        self.assertEqual(response['Content-Type'], 'image/jpeg')
+
+
+class CompressionMiddlewareTest(TestCase):
+    TEXT = 'Повторяющийся текст поста. ' * 100
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        author = User.objects.create_user(username='compressed')
+        Post.objects.bulk_create(
+            Post(author=author, text=cls.TEXT) for _ in range(5)
+        )
+
+    def setUp(self):
+        cache.clear()
+        caches['compressed'].clear()
+
+    def middleware(self, response):
+        request = RequestFactory().get('/', HTTP_ACCEPT_ENCODING='gzip')
+        return CompressionMiddleware(lambda request: response)(request)
+
+    def test_feed_is_gzipped_once(self):
+        """Лента сжимается, повторный ответ берётся из кэша."""
+        plain = self.client.get(reverse('posts:index'))
+        self.assertFalse(plain.has_header('Content-Encoding'))
+        with mock.patch(
+            'core.compression.compress', wraps=compression.compress
+        ) as compress:
+            for _ in range(3):
+                response = self.client.get(
+                    reverse('posts:index'), HTTP_ACCEPT_ENCODING='gzip'
+                )
+                self.assertEqual(
+                    gzip.decompress(response.content), plain.content
+                )
+        self.assertEqual(compress.call_count, 1)
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertIn('Accept-Encoding', response['Vary'])
+        self.assertEqual(
+            int(response['Content-Length']), len(response.content)
+        )
+        self.assertLess(len(response.content), len(plain.content) / 3)
+
+    def test_pages_with_csrf_token_are_not_cached(self):
+        """Страница с CSRF-токеном сжимается заново и не попадает в кэш."""
+        with mock.patch(
+            'core.compression.cached_compress',
+            wraps=compression.cached_compress,
+        ) as cached_compress:
+            for _ in range(2):
+                response = self.client.get(
+                    reverse('users:login'), HTTP_ACCEPT_ENCODING='gzip'
+                )
+                self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertEqual(cached_compress.call_count, 0)
+
+    def test_skipped_responses(self):
+        """Картинки, короткие и уже сжатые ответы не трогаются."""
+        encoded = HttpResponse(self.TEXT)
+        encoded['Content-Encoding'] = 'identity'
+        responses = (
+            HttpResponse(b'\x89PNG' * 1000, content_type='image/png'),
+            HttpResponse('коротко'),
+            encoded,
+        )
+        for response in responses:
+            with self.subTest(content_type=response['Content-Type']):
+                content = response.content
+                response = self.middleware(response)
+                self.assertEqual(response.content, content)
+                self.assertNotEqual(
+                    response.get('Content-Encoding'), 'gzip'
+                )
+
+    def test_streaming_response(self):
+        """Потоковый ответ сжимается по кускам, без Content-Length."""
+        chunks = [self.TEXT.encode()] * 5
+        response = self.middleware(
+            StreamingHttpResponse(iter(chunks), content_type='text/plain')
+        )
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertFalse(response.has_header('Content-Length'))
+        parts = list(response.streaming_content)
+        self.assertGreater(len(parts), len(chunks))
+        self.assertEqual(gzip.decompress(b''.join(parts)), b''.join(chunks))
+
+    def test_strong_etag_becomes_weak(self):
+        """Строгий ETag сжатого ответа становится слабым."""
+        response = HttpResponse(self.TEXT)
+        response['ETag'] = '"abc"'
+        self.assertEqual(self.middleware(response)['ETag'], 'W/"abc"')
+
+    @skipUnless(compression.brotli, 'brotli не установлен')
+    def test_brotli_preferred(self):
+        """brotli выбирается, если клиент его принимает."""
+        request = RequestFactory().get('/', HTTP_ACCEPT_ENCODING='gzip, br')
+        response = CompressionMiddleware(
+            lambda request: HttpResponse(self.TEXT)
+        )(request)
+        self.assertEqual(response['Content-Encoding'], 'br')
+        self.assertEqual(
+            compression.brotli.decompress(response.content).decode(),
+            self.TEXT,
+        )
+
+
+@override_settings(RATE_LIMITS={
+    'post_create': '3/m', 'add_comment': '3/m', 'profile_follow': '3/m',
+    'signup': '2/h', 'test': '5/m',
+})
+class RateLimitTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='writer')
+        cls.other = User.objects.create_user(username='other')
+        cls.post = Post.objects.create(author=cls.other, text='Тестовый пост')
+
+    def setUp(self):
+        cache.clear()
+        # Всплеск не должен попасть на границу окна.
+        patcher = mock.patch('core.ratelimit.time', return_value=1e9)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.client = Client()
+        self.client.force_login(self.user)
+
+    def burst(self, client, url, amount, method='post', data=None):
+        send = getattr(client, method)
+        return [send(url, data or {}).status_code for _ in range(amount)]
+
+    def test_burst_is_cut_at_limit(self):
+        """Всплеск запросов сверх лимита получает 429."""
+        statuses = self.burst(
+            self.client,
+            reverse('posts:add_comment', args=(self.post.pk,)),
+            6, data={'text': 'Спам'},
+        )
+        self.assertEqual(statuses[:3], [HTTPStatus.FOUND] * 3)
+        self.assertEqual(
+            statuses[3:], [HTTPStatus.TOO_MANY_REQUESTS] * 3
+        )
+        self.assertEqual(Comment.objects.count(), 3)
+
+    def test_limits_are_per_user_and_per_view(self):
+        """Лимит одного пользователя и вида не задевает других."""
+        self.burst(
+            self.client, reverse('posts:post_create'), 4,
+            data={'text': 'Пост'},
+        )
+        other = Client()
+        other.force_login(self.other)
+        self.assertEqual(
+            other.post(
+                reverse('posts:post_create'), {'text': 'Пост'}
+            ).status_code,
+            HTTPStatus.FOUND,
+        )
+        follow = reverse('posts:profile_follow', args=(self.other.username,))
+        self.assertEqual(
+            self.burst(self.client, follow, 3, method='get'),
+            [HTTPStatus.FOUND] * 3,
+        )
+        self.assertEqual(
+            self.client.get(follow).status_code,
+            HTTPStatus.TOO_MANY_REQUESTS,
+        )
+
+    def test_anonymous_signup_limited_by_ip(self):
+        """Регистрация ограничена по IP, GET формы не считается."""
+        url = reverse('users:signup')
+        self.assertEqual(
+            self.burst(Client(), url, 5, method='get'), [HTTPStatus.OK] * 5
+        )
+        statuses = [
+            Client().post(url, {}, REMOTE_ADDR='10.0.0.1').status_code
+            for _ in range(3)
+        ]
+        self.assertEqual(statuses[-1], HTTPStatus.TOO_MANY_REQUESTS)
+        self.assertEqual(
+            Client().post(url, {}, REMOTE_ADDR='10.0.0.2').status_code,
+            HTTPStatus.OK,
+        )
+
+    def test_one_cache_round_trip_per_request(self):
+        """После первого запроса окна - один incr на запрос."""
+        view = ratelimit('test')(lambda request: HttpResponse())
+        request = RequestFactory().post('/')
+        request.user = self.user
+        view(request)
+        with mock.patch.object(cache, 'incr', wraps=cache.incr) as incr, \
+                mock.patch.object(cache, 'add', wraps=cache.add) as add:
+            responses = [view(request) for _ in range(6)]
+        self.assertEqual(incr.call_count, 6)
+        self.assertFalse(add.called)
+        self.assertEqual(
+            responses[-1].status_code, HTTPStatus.TOO_MANY_REQUESTS
+        )
+        self.assertGreater(int(responses[-1]['Retry-After']), 0)
+
+
+RESULTS = []
+
+
+def record(value, scale=1):
+    RESULTS.append(value * scale)
+
+
+def explode():
+    raise ValueError('boom')
+
+
+class JobTest(TestCase):
+    def setUp(self):
+        RESULTS.clear()
+
+    def test_enqueue_claim_execute(self):
+        """Задача выполняется с сохранёнными аргументами."""
+        job = enqueue(record, 2, scale=3)
+        self.assertEqual(job.task, 'core.tests.record')
+        self.assertEqual(claim(10), [job.pk])
+        self.assertTrue(execute(job.pk))
+        job.refresh_from_db()
+        self.assertEqual(job.status, Job.DONE)
+        self.assertIsNotNone(job.duration)
+        self.assertEqual(RESULTS, [6])
+
+    def test_claims_do_not_overlap(self):
+        """Взятая задача не достаётся другому воркеру и ждёт run_at."""
+        jobs = [enqueue(record, num) for num in range(3)]
+        enqueue(record, 99, delay=60)
+        first = claim(2)
+        second = claim(10)
+        self.assertEqual(first, [job.pk for job in jobs[:2]])
+        self.assertEqual(second, [jobs[2].pk])
+        self.assertEqual(claim(10), [])
+
+    def test_abandoned_job_is_reclaimed(self):
+        """Задача зависшего воркера снова доступна после таймаута."""
+        job = enqueue(record, 1)
+        claim(1)
+        Job.objects.filter(pk=job.pk).update(
+            locked_at=timezone.now() - timedelta(
+                seconds=settings.JOB_LOCK_TIMEOUT + 1
+            )
+        )
+        self.assertEqual(claim(1), [job.pk])
+
+    def test_reclaim_counts_as_attempt(self):
+        """Задача, которая роняет воркер, не повторяется бесконечно."""
+        job = enqueue(record, 1, max_attempts=2)
+        claim(1)
+        for attempts in (1, 2):
+            Job.objects.filter(pk=job.pk).update(
+                locked_at=timezone.now() - timedelta(
+                    seconds=settings.JOB_LOCK_TIMEOUT + 1
+                )
+            )
+            self.assertEqual(claim(1), [job.pk])
+            job.refresh_from_db()
+            self.assertEqual(job.attempts, attempts)
+        self.assertFalse(execute(job.pk))
+        job.refresh_from_db()
+        self.assertEqual(job.status, Job.FAILED)
+        self.assertEqual(RESULTS, [])
+
+    def test_failures_back_off_and_give_up(self):
+        """Упавшая задача повторяется с растущей задержкой."""
+        job = enqueue(explode, max_attempts=3)
+        delays = []
+        for _ in range(3):
+            Job.objects.filter(pk=job.pk).update(run_at=timezone.now())
+            self.assertEqual(claim(1), [job.pk])
+            before = timezone.now()
+            self.assertFalse(execute(job.pk))
+            job.refresh_from_db()
+            delays.append(round((job.run_at - before).total_seconds()))
+        self.assertEqual(job.status, Job.FAILED)
+        self.assertEqual(job.attempts, 3)
+        self.assertIn('boom', job.last_error)
+        self.assertEqual(
+            delays[:2],
+            [settings.JOB_RETRY_DELAY, settings.JOB_RETRY_DELAY * 2],
+        )
+
+    def test_stats(self):
+        """Метрики считают задачи по статусам."""
+        enqueue(record, 1)
+        job = enqueue(record, 2)
+        claim(1)
+        execute(Job.objects.get(status=Job.RUNNING).pk)
+        self.assertEqual(
+            stats()['statuses'], {Job.DONE: 1, Job.QUEUED: 1}
+        )
+        self.assertIn('core.tests.record', stats()['durations'])
+        self.assertNotEqual(job.status, Job.DONE)
+
+
+class RunJobsCommandTest(TransactionTestCase):
+    def test_worker_pool_runs_queue(self):
+        """run_jobs --once разбирает очередь пулом потоков."""
+        RESULTS.clear()
+        for num in range(5):
+            enqueue(record, num)
+        enqueue(explode, max_attempts=1)
+        out = StringIO()
+        call_command('run_jobs', once=True, workers=2, stdout=out)
+        self.assertEqual(sorted(RESULTS), list(range(5)))
+        self.assertIn('Выполнено: 5, с ошибкой: 1', out.getvalue())
+        self.assertEqual(Job.objects.filter(status=Job.FAILED).count(), 1)
@@ -0,0 +1,43 @@
+import logging
+import os
+
+from django.conf import settings
+from django.template import TemplateSyntaxError, engines
+from django.utils.module_loading import import_string
+
+logger = logging.getLogger(__name__)
+
+
+def template_names(directory=None):
+    """Имена всех шаблонов проекта относительно TEMPLATES_DIR."""
+    directory = directory or settings.TEMPLATES_DIR
+    for root, _, files in os.walk(directory):
+        for filename in sorted(files):
+            if filename.endswith('.html'):
+                path = os.path.join(root, filename)
+                yield os.path.relpath(path, directory).replace(os.sep, '/')
+
+
+def warm_template_cache(engine=None):
+    """Компилирует все шаблоны, чтобы cached.Loader хранил их в памяти."""
+    engine = engine or engines['django']
+    compiled = 0
+    for name in template_names():
+        try:
+            engine.get_template(name)
+        except TemplateSyntaxError:
+            logger.exception('Не удалось скомпилировать шаблон %s', name)
+            continue
+        compiled += 1
+    return compiled
+
+
+def warm_up():
+    """Вызывает WARMUP_HOOKS.
+
+    Запускается из yatube.wsgi и yatube.asgi (runserver тоже загружает
+    WSGI-приложение), поэтому migrate, shell и другие команды manage.py
+    прогрев не ждут.
+    """
+    for hook in settings.WARMUP_HOOKS:
+        import_string(hook)()
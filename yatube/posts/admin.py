@@ -1,6 +1,22 @@
-from django.contrib import admin
+from django import forms
+from django.contrib import admin, messages
+from django.contrib.admin.helpers import ACTION_CHECKBOX_NAME, ActionForm
+from django.db.models import Count
+from django.template.response import TemplateResponse
 
-from .models import Group, Post
+from core.paginator import EstimatedCountPaginator
+
+from .models import ArchivedPost, Comment, Group, Post, User
+from .moderation import delete_comments, delete_posts, reassign_group
+from .search import search_posts
+
+
+class PostActionForm(ActionForm):
+    group = forms.SlugField(
+        label='Слаг группы',
+        required=False,
+        help_text='Для переноса в группу; пусто - убрать из группы'
+    )
 
 
 class PostAdmin(admin.ModelAdmin):
@@ -11,10 +27,74 @@ class PostAdmin(admin.ModelAdmin):
         'author',
         'group',
     )
-    list_editable = ('group',)
+    list_select_related = ('author', 'group')
+    # Группа меняется в форме поста через поиск, а не <select> со всеми
+    # группами в каждой строке списка (там виджет стоил бы запрос на строку).
+    autocomplete_fields = ('group',)
+    raw_id_fields = ('author',)
     search_fields = ('text',)
+    # Оба фильтруют по диапазону дат и используют индекс по pub_date.
     list_filter = ('pub_date',)
+    date_hierarchy = 'pub_date'
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
     empty_value_display = '-пусто-'
+    action_form = PostActionForm
+    actions = (
+        'move_to_group', 'delete_authors_posts', 'purge_authors_comments'
+    )
+
+    def get_search_results(self, request, queryset, search_term):
+        return search_posts(queryset, search_term), False
+
+    def delete_queryset(self, request, queryset):
+        delete_posts(queryset)
+
+    def move_to_group(self, request, queryset):
+        slug = request.POST.get('group')
+        group = Group.objects.filter(slug=slug).first() if slug else None
+        if slug and group is None:
+            self.message_user(
+                request, f'Группа «{slug}» не найдена', messages.ERROR
+            )
+            return
+        moved = reassign_group(queryset, group)
+        self.message_user(request, f'Перенесено постов: {moved}')
+    move_to_group.short_description = 'Перенести в группу'
+
+    def delete_authors_posts(self, request, queryset):
+        authors = list(queryset.values_list('author', flat=True).distinct())
+        if not request.POST.get('post'):
+            # Удаляются посты не только выбранные, поэтому как и встроенное
+            # удаление, действие сначала показывает, что именно пропадёт.
+            return TemplateResponse(
+                request,
+                'admin/posts/post/delete_authors_posts.html',
+                {
+                    **self.admin_site.each_context(request),
+                    'title': 'Удалить все посты авторов?',
+                    'opts': self.model._meta,
+                    'authors': User.objects.filter(pk__in=authors).annotate(
+                        post_count=Count('posts')
+                    ).order_by('username'),
+                    'queryset': queryset,
+                    'action_checkbox_name': ACTION_CHECKBOX_NAME,
+                },
+            )
+        deleted = delete_posts(Post.objects.filter(author__in=authors))
+        self.message_user(
+            request,
+            f'Удалено постов: {deleted}, авторов: {len(authors)}'
+        )
+    delete_authors_posts.short_description = 'Удалить все посты авторов'
+
+    def purge_authors_comments(self, request, queryset):
+        authors = list(queryset.values_list('author', flat=True).distinct())
+        deleted = delete_comments(Comment.objects.filter(author__in=authors))
+        self.message_user(request, f'Удалено комментариев: {deleted}')
+    purge_authors_comments.short_description = (
+        'Удалить все комментарии авторов'
+    )
 
 
 class GroupAdmin(admin.ModelAdmin):
@@ -28,5 +108,23 @@ class GroupAdmin(admin.ModelAdmin):
     list_filter = ('title',)
 
 
+class ArchivedPostAdmin(admin.ModelAdmin):
+    list_display = (
+        'pk',
+        'text',
+        'pub_date',
+        'author',
+        'group',
+    )
+    list_select_related = ('author', 'group')
+    raw_id_fields = ('author', 'group')
+    search_fields = ('text',)
+    date_hierarchy = 'pub_date'
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+    empty_value_display = '-пусто-'
+
+
 admin.site.register(Post, PostAdmin)
+admin.site.register(ArchivedPost, ArchivedPostAdmin)
 admin.site.register(Group, GroupAdmin)
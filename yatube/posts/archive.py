@@ -0,0 +1,143 @@
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection, transaction
+from django.db.models import Max
+from django.http import Http404
+from django.utils.functional import cached_property
+
+from .group_cache import batched_invalidation
+from .models import (
+    ArchivedComment, ArchivedPost, ArchivedPostRevision, Comment, Post,
+    PostRevision,
+)
+
+VERSION_KEY = 'archive-version'
+
+POST_FIELDS = (
+    'id', 'text', 'pub_date', 'author_id', 'group_id', 'image', 'version',
+    'updated_at',
+)
+COMMENT_FIELDS = ('post_id', 'author_id', 'text', 'created')
+REVISION_FIELDS = ('post_id', 'version', 'diff', 'created')
+
+
+class TieredPosts:
+    """Лента из горячей таблицы, продолженная архивом.
+
+    Все архивные посты старше горячих, поэтому лента - это просто
+    горячая выборка, за которой идёт архивная. Paginator берёт срезы:
+    пока срез внутри горячей части, архив не читается. Число архивных
+    постов нужно пагинатору на каждой странице, оно берётся из кэша
+    по ключу key (None - не кэшировать).
+    """
+
+    def __init__(self, hot, archived, key=None):
+        self.hot = hot
+        self.archived = archived
+        self.key = key
+
+    @cached_property
+    def hot_count(self):
+        return self.hot.count()
+
+    @cached_property
+    def archived_count(self):
+        if self.key is None:
+            return self.archived.count()
+        key = f'archive-count:{cache.get(VERSION_KEY, 0)}:{self.key}'
+        count = cache.get(key)
+        if count is None:
+            count = self.archived.count()
+            cache.set(key, count, settings.ARCHIVE_COUNT_TIMEOUT)
+        return count
+
+    def count(self):
+        return self.hot_count + self.archived_count
+
+    def __len__(self):
+        return self.count()
+
+    def __getitem__(self, index):
+        if not isinstance(index, slice):
+            return self[index:index + 1][0]
+        start, stop = index.start or 0, index.stop
+        posts = list(self.hot[start:stop]) if start < self.hot_count else []
+        if stop is None or stop > self.hot_count:
+            offset = max(start - self.hot_count, 0)
+            posts += self.archived[
+                offset:None if stop is None else stop - self.hot_count
+            ]
+        return posts
+
+
+def get_post_or_404(post_id):
+    """Пост из горячей таблицы или, если его там нет, из архива."""
+    post = Post.objects.select_related('author', 'group').filter(
+        pk=post_id
+    ).first()
+    if post is None:
+        post = ArchivedPost.objects.select_related(
+            'author', 'group'
+        ).filter(pk=post_id).first()
+    if post is None:
+        raise Http404('Пост не найден')
+    return post
+
+
+def reserve_post_id(post):
+    """Не даёт новому посту занять id архивного.
+
+    Счётчик AUTOINCREMENT в SQLite сбрасывается до max(id), когда миграция
+    пересоздаёт таблицу, а в MySQL до 8.0 - при перезапуске сервера. Если
+    самый новый пост уже в архиве, его id достался бы новому посту, и
+    get_post_or_404 отдавал бы новый пост вместо архивного. В PostgreSQL
+    последовательность не откатывается, а явный id её бы не сдвинул.
+    """
+    if post.pk is not None or connection.vendor not in ('sqlite', 'mysql'):
+        return
+    archived = ArchivedPost.objects.aggregate(top=Max('pk'))['top']
+    if archived is None:
+        return
+    hot = Post.objects.aggregate(top=Max('pk'))['top'] or 0
+    if archived >= hot:
+        post.pk = archived + 1
+
+
+def archive_posts(before, batch_size):
+    """Переносит посты старше before в архив с комментариями и историей.
+
+    Каждая пачка переносится в своей транзакции. Рейтинг архивных постов
+    удаляется вместе с исходными постами, кэш их групп сбрасывается один
+    раз на пачку.
+    """
+    moved = 0
+    while True:
+        with transaction.atomic(), batched_invalidation():
+            posts = list(
+                Post.objects.filter(pub_date__lt=before).order_by(
+                    'pub_date'
+                ).values(*POST_FIELDS)[:batch_size]
+            )
+            if not posts:
+                break
+            ids = [post['id'] for post in posts]
+            ArchivedPost.objects.bulk_create(
+                ArchivedPost(**post) for post in posts
+            )
+            ArchivedComment.objects.bulk_create(
+                ArchivedComment(**comment)
+                for comment in Comment.objects.filter(
+                    post_id__in=ids
+                ).values(*COMMENT_FIELDS)
+            )
+            ArchivedPostRevision.objects.bulk_create(
+                ArchivedPostRevision(**revision)
+                for revision in PostRevision.objects.filter(
+                    post_id__in=ids
+                ).values(*REVISION_FIELDS)
+            )
+            Post.objects.filter(pk__in=ids).delete()
+        moved += len(ids)
+    if moved:
+        cache.set(VERSION_KEY, cache.get(VERSION_KEY, 0) + 1, None)
+    return moved
@@ -0,0 +1,170 @@
+import atexit
+import logging
+import queue
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import close_old_connections, transaction
+from django.utils import timezone
+
+from .models import Comment, Post
+from .ranking import register_comments
+
+logger = logging.getLogger(__name__)
+
+
+def pending_key(post_id, author_id):
+    return f'pending-comments:{post_id}:{author_id}'
+
+
+@contextmanager
+def locked(key):
+    """Блокировка на cache.add: список ожидающих комментариев меняют и
+    запросы, и поток записи, в том числе в разных процессах."""
+    lock_key = f'{key}:lock'
+    while not cache.add(lock_key, 1, 5):
+        time.sleep(0.005)
+    try:
+        yield
+    finally:
+        cache.delete(lock_key)
+
+
+class CommentBuffer:
+    """Буфер отложенной записи комментариев.
+
+    Комментарии копятся в очереди и сохраняются пачками в одной
+    транзакции фоновым потоком. Пока комментарий не записан, автор видит
+    его через кэш (см. pending_comments). Пачка, которую не удалось
+    записать, возвращается в очередь, а при выходе процесса дописывается
+    всё, включая пачку, которую поток ещё собирает.
+    """
+
+    def __init__(self):
+        self.queue = queue.Queue()
+        self.lock = threading.Lock()
+        self.batch_lock = threading.Lock()
+        self.in_flight = []
+        self.thread = None
+
+    def put(self, comment):
+        comment.created = timezone.now()
+        comment.buffer_token = uuid.uuid4().hex
+        key = pending_key(comment.post_id, comment.author_id)
+        with locked(key):
+            pending = cache.get(key, [])
+            pending.append(comment)
+            cache.set(key, pending, settings.COMMENTS_PENDING_TIMEOUT)
+        self.queue.put(comment)
+        self.start()
+
+    def start(self):
+        with self.lock:
+            if self.thread is None or not self.thread.is_alive():
+                self.thread = threading.Thread(
+                    target=self.run, name='comment-buffer', daemon=True
+                )
+                self.thread.start()
+
+    def run(self):
+        while True:
+            comment = self.queue.get()
+            with self.batch_lock:
+                self.in_flight.append(comment)
+            # Даём очереди накопить пачку, прежде чем брать блокировку записи.
+            time.sleep(settings.COMMENTS_FLUSH_INTERVAL)
+            close_old_connections()
+            try:
+                self.flush()
+            except Exception:
+                logger.exception('Не удалось записать пачку комментариев')
+
+    def drain(self):
+        batch = []
+        while len(batch) < settings.COMMENTS_FLUSH_BATCH:
+            try:
+                batch.append(self.queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def take(self):
+        with self.batch_lock:
+            batch, self.in_flight = self.in_flight, []
+        return batch + self.drain()
+
+    def flush(self):
+        """Записывает накопившуюся пачку комментариев.
+
+        При ошибке пачка возвращается в очередь, а автор по-прежнему
+        видит её комментарии как ожидающие записи.
+        """
+        batch = self.take()
+        try:
+            return self.write(batch)
+        except Exception:
+            for comment in batch:
+                self.queue.put(comment)
+            raise
+
+    def write(self, batch):
+        if not batch:
+            return 0
+        # Пост могли удалить, пока комментарий ждал в очереди.
+        existing = set(Post.objects.filter(
+            pk__in={comment.post_id for comment in batch}
+        ).values_list('pk', flat=True))
+        saved = [comment for comment in batch if comment.post_id in existing]
+        with transaction.atomic():
+            Comment.objects.bulk_create(saved)
+            register_comments(saved)
+            # bulk_create не шлёт сигналов: updated_at для ETag обновляем
+            # сами.
+            Post.objects.filter(
+                pk__in={comment.post_id for comment in saved}
+            ).update(updated_at=timezone.now())
+        self.forget(batch)
+        return len(batch)
+
+    def flush_all(self):
+        try:
+            while self.flush():
+                pass
+        except Exception:
+            logger.exception(
+                'При выходе не записаны комментарии: %d', self.queue.qsize()
+            )
+
+    def forget(self, batch):
+        tokens = {comment.buffer_token for comment in batch}
+        keys = {
+            pending_key(comment.post_id, comment.author_id)
+            for comment in batch
+        }
+        for key in keys:
+            with locked(key):
+                pending = [
+                    comment for comment in cache.get(key, [])
+                    if comment.buffer_token not in tokens
+                ]
+                if pending:
+                    cache.set(
+                        key, pending, settings.COMMENTS_PENDING_TIMEOUT
+                    )
+                else:
+                    cache.delete(key)
+
+
+def pending_comments(post, user):
+    """Ещё не записанные в БД комментарии пользователя к посту."""
+    if not settings.COMMENTS_WRITE_BEHIND or not user.is_authenticated:
+        return []
+    return cache.get(pending_key(post.pk, user.pk), [])[::-1]
+
+
+comment_buffer = CommentBuffer()
+atexit.register(comment_buffer.flush_all)
@@ -0,0 +1,172 @@
+"""Поиск почти одинаковых постов через MinHash и LSH.
+
+Текст нормализуется (регистр, пунктуация, пробелы) и режется на
+символьные шинглы длины SHINGLE. Подпись поста - NUM_PERM минимумов
+хешей шинглов при разных хеш-функциях; доля совпавших позиций двух
+подписей оценивает коэффициент Жаккара их шинглов. Подпись делится на
+BANDS полос, каждая полоса даёт ключ корзины в PostBucket: посты с
+похожими текстами почти наверняка попадают в общую корзину хотя бы
+по одной полосе, поэтому проверка нового поста - один индексный запрос
+по BANDS ключам и сравнение подписей немногих кандидатов. Сравниваются
+посты одного автора: бот, рассылающий один текст по группам, ловится,
+а цитата чужого поста - нет.
+
+Хеширование векторизовано на NumPy и одинаково работает для одного
+текста и для пачки (команда fingerprint_posts).
+"""
+import re
+from functools import lru_cache
+
+from django.conf import settings
+from django.db import transaction
+
+from core.lazy import lazy_import
+
+from .models import PostBucket, PostFingerprint
+
+# numpy загружается при первой проверке поста, а не при старте воркера.
+np = lazy_import('numpy')
+
+SHINGLE = 5
+NUM_PERM = 64
+BANDS = 16
+ROWS = NUM_PERM // BANDS
+MIX = 0x9E3779B97F4A7C15
+# Сколько шинглов хешируется за раз: матрица NUM_PERM x CHUNK uint64
+# занимает 8 МБ, сколько бы ни было текстов и какой бы они ни были длины.
+CHUNK = 2 ** 14
+
+
+@lru_cache(maxsize=None)
+def hash_parameters():
+    """Параметры хеш-функций h(x) = (a * x + b) mod 2**64 >> 32.
+
+    Multiply-shift; фиксированное зерно делает подписи одинаковыми во
+    всех процессах. Возвращает массивы a и b, степени основания для
+    хеша шингла и MIX как np.uint64.
+    """
+    random = np.random.RandomState(20220511)
+    perm_a = random.randint(1, 2 ** 62, NUM_PERM, dtype=np.uint64)
+    perm_b = random.randint(0, 2 ** 62, NUM_PERM, dtype=np.uint64)
+    powers = np.uint64(1000003) ** np.arange(
+        SHINGLE - 1, -1, -1, dtype=np.uint64
+    )
+    return perm_a | np.uint64(1), perm_b, powers, np.uint64(MIX)
+
+
+def normalize(text):
+    return re.sub(r'\W+', ' ', text.lower()).strip()
+
+
+def is_checked(text):
+    """Короткие тексты дают слишком мало шинглов для надёжной оценки."""
+    return len(normalize(text)) >= settings.DUPLICATE_MIN_LENGTH
+
+
+def shingle_hashes(text):
+    """32-битные хеши всех символьных шинглов текста."""
+    codes = np.frombuffer(
+        normalize(text).encode('utf-32-le'), dtype=np.uint32
+    ).astype(np.uint64)
+    if len(codes) < SHINGLE:
+        return np.zeros(0, dtype=np.uint64)
+    _, _, powers, mix = hash_parameters()
+    windows = np.lib.stride_tricks.sliding_window_view(codes, SHINGLE)
+    hashes = (windows * powers).sum(axis=1, dtype=np.uint64) * mix
+    return hashes >> np.uint64(32)
+
+
+def signatures(texts):
+    """Подписи текстов: массив uint32 формы (len(texts), NUM_PERM).
+
+    Шинглы всех текстов идут подряд и хешируются кусками по CHUNK; минимум
+    каждого текста копится по кускам, которые он задевает.
+    """
+    shingles = [shingle_hashes(text) for text in texts]
+    sizes = np.array([len(hashes) for hashes in shingles], dtype=np.int64)
+    result = np.full((len(texts), NUM_PERM), 2 ** 32 - 1, dtype=np.uint32)
+    nonempty = sizes > 0
+    if not nonempty.any():
+        return result
+    values = np.concatenate(shingles)
+    ends = np.cumsum(sizes[nonempty])
+    starts = ends - sizes[nonempty]
+    minimums = result[nonempty]
+    perm_a, perm_b, _, _ = hash_parameters()
+    for low in range(0, len(values), CHUNK):
+        high = low + CHUNK
+        inside = np.flatnonzero((starts < high) & (ends > low))
+        permuted = (
+            (values[None, low:high] * perm_a[:, None] + perm_b[:, None])
+            >> np.uint64(32)
+        ).astype(np.uint32)
+        chunk = np.minimum.reduceat(
+            permuted, np.maximum(starts[inside], low) - low, axis=1
+        ).T
+        minimums[inside] = np.minimum(minimums[inside], chunk)
+    result[nonempty] = minimums
+    return result
+
+
+def band_keys(signatures):
+    """Ключи корзин: для каждой подписи BANDS чисел int64."""
+    bands = signatures.reshape(len(signatures), BANDS, ROWS).astype(np.uint64)
+    keys = np.arange(BANDS, dtype=np.uint64)[None, :].repeat(
+        len(signatures), axis=0
+    )
+    mix = hash_parameters()[3]
+    for row in range(ROWS):
+        keys = (keys ^ bands[:, :, row]) * mix
+    return keys.view(np.int64)
+
+
+def similarity(first, second):
+    """Оценка коэффициента Жаккара по двум подписям."""
+    return float(np.mean(first == second))
+
+
+def find_duplicates(text, author=None, exclude=None):
+    """id постов author, почти совпадающих с text (без поста exclude).
+
+    Без author ищет среди постов всех авторов.
+    """
+    if not is_checked(text):
+        return []
+    signature = signatures([text])
+    candidates = PostFingerprint.objects.filter(
+        post__buckets__key__in=band_keys(signature)[0].tolist()
+    )
+    if author is not None:
+        candidates = candidates.filter(post__author=author)
+    candidates = candidates.exclude(post_id=exclude).distinct().values_list(
+        'post_id', 'signature'
+    )
+    return [
+        post_id for post_id, stored in candidates
+        if similarity(
+            signature[0], np.frombuffer(stored, dtype=np.uint32)
+        ) >= settings.DUPLICATE_THRESHOLD
+    ]
+
+
+def store_fingerprints(posts):
+    """Сохраняет подписи и корзины постов, заменяя прежние."""
+    stale = [post.pk for post in posts]
+    posts = [post for post in posts if is_checked(post.text)]
+    ids = [post.pk for post in posts]
+    with transaction.atomic():
+        PostFingerprint.objects.filter(post_id__in=stale).delete()
+        PostBucket.objects.filter(post_id__in=stale).delete()
+        if not posts:
+            return 0
+        computed = signatures([post.text for post in posts])
+        PostFingerprint.objects.bulk_create(
+            PostFingerprint(post_id=post_id, signature=signature.tobytes())
+            for post_id, signature in zip(ids, computed)
+        )
+        PostBucket.objects.bulk_create(
+            PostBucket(post_id=post_id, key=key)
+            for post_id, keys in zip(ids, band_keys(computed).tolist())
+            for key in keys
+        )
+    return len(posts)
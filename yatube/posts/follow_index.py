@@ -0,0 +1,207 @@
+"""Индекс подписок в памяти процесса.
+
+Для каждого пользователя хранится отсортированный массив id авторов, на
+которых он подписан, и обратный массив подписчиков автора: проверка
+«A подписан на B» — двоичный поиск без обращения к БД. Индекс строится
+одним проходом по таблице подписок в фоновом потоке: при старте
+веб-процесса (WARMUP_HOOKS) и раз в FOLLOW_INDEX_TIMEOUT, чтобы догнать
+записи в обход сигналов (bulk_create, update). Пока индекс не построен,
+ответы берутся из БД.
+
+Сигналы после коммита записи кладут изменение в журнал в общем кэше
+(CACHE_LOCATION) под очередным номером версии, и каждый процесс применяет
+чужие изменения по одному. Полная перестройка нужна, только если процесс
+отстал больше чем на FOLLOW_INDEX_MAX_REPLAY изменений или запись журнала
+пропала из кэша.
+"""
+import logging
+import threading
+import time
+from array import array
+from bisect import bisect_left
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connections
+
+from .models import Follow
+
+logger = logging.getLogger(__name__)
+
+VERSION_KEY = 'follow-index-version'
+
+
+def change_key(version):
+    return f'follow-index-change:{version}'
+
+
+def publish(action, user_id, author_id):
+    """Записывает изменение в журнал и возвращает его версию."""
+    if cache.add(VERSION_KEY, 1, None):
+        version = 1
+    else:
+        version = cache.incr(VERSION_KEY)
+    cache.set(
+        change_key(version), (action, user_id, author_id),
+        settings.FOLLOW_INDEX_TIMEOUT,
+    )
+    return version
+
+
+def contains(values, value):
+    position = bisect_left(values, value)
+    return position < len(values) and values[position] == value
+
+
+def insert(index, key, value):
+    values = index.setdefault(key, array('q'))
+    position = bisect_left(values, value)
+    if position == len(values) or values[position] != value:
+        values.insert(position, value)
+
+
+def remove(index, key, value):
+    values = index.get(key)
+    if values is not None and contains(values, value):
+        values.pop(bisect_left(values, value))
+
+
+class FollowIndex:
+
+    def __init__(self):
+        self.lock = threading.RLock()
+        self.followees = {}
+        self.followers = {}
+        self.version = None
+        self.ready = False
+        self.built_at = 0
+        self.thread = None
+
+    def build(self):
+        """Строит индекс заново; на пути запроса не вызывается."""
+        # Версия читается до прохода: изменения, сделанные во время него,
+        # применятся из журнала ещё раз, а вставка и удаление идемпотентны.
+        version = cache.get(VERSION_KEY)
+        followees, followers = {}, {}
+        rows = Follow.objects.order_by('user_id', 'author_id').values_list(
+            'user_id', 'author_id'
+        )
+        for user_id, author_id in rows.iterator():
+            followees.setdefault(user_id, array('q')).append(author_id)
+        for user_id, authors in followees.items():
+            for author_id in authors:
+                followers.setdefault(author_id, array('q')).append(user_id)
+        # Подписчики добавлялись по возрастанию user_id — уже отсортированы.
+        with self.lock:
+            self.followees, self.followers = followees, followers
+            self.version = version
+            self.ready = True
+            self.built_at = time.monotonic()
+
+    def rebuild(self):
+        """Запускает перестройку в фоновом потоке, если она ещё не идёт."""
+        with self.lock:
+            if self.thread is None or not self.thread.is_alive():
+                self.thread = threading.Thread(
+                    target=self.run, name='follow-index', daemon=True
+                )
+                self.thread.start()
+
+    def run(self):
+        try:
+            self.build()
+        except Exception:
+            logger.exception('Не удалось построить индекс подписок')
+        finally:
+            connections.close_all()
+
+    def reset(self):
+        """Забывает индекс: до перестройки ответы берутся из БД."""
+        with self.lock:
+            self.ready = False
+
+    def sync(self):
+        """Догоняет журнал; False, если индекс ещё не построен."""
+        if not self.ready:
+            self.rebuild()
+            return False
+        version = cache.get(VERSION_KEY)
+        expired = (
+            time.monotonic() - self.built_at > settings.FOLLOW_INDEX_TIMEOUT
+        )
+        if version != self.version and not self.replay(version):
+            self.rebuild()
+        elif expired:
+            self.rebuild()
+        return True
+
+    def replay(self, version):
+        """Применяет изменения из журнала; False, если нужна перестройка."""
+        start = (self.version or 0) + 1
+        if (
+            version is None or version < start
+            or version - start >= settings.FOLLOW_INDEX_MAX_REPLAY
+        ):
+            return False
+        changes = cache.get_many(
+            [change_key(number) for number in range(start, version + 1)]
+        )
+        for number in range(start, version + 1):
+            change = changes.get(change_key(number))
+            if change is None:
+                # Последняя запись может быть ещё не записана, а пропуск в
+                # середине журнала значит, что кэш её уже вытеснил.
+                return number == version
+            self.apply(*change)
+            self.version = number
+        return True
+
+    def apply(self, action, user_id, author_id):
+        if action == 'add':
+            insert(self.followees, user_id, author_id)
+            insert(self.followers, author_id, user_id)
+        else:
+            remove(self.followees, user_id, author_id)
+            remove(self.followers, author_id, user_id)
+
+    def is_following(self, user_id, author_id):
+        with self.lock:
+            if self.sync():
+                return contains(self.followees.get(user_id, ()), author_id)
+        return Follow.objects.filter(
+            user_id=user_id, author_id=author_id
+        ).exists()
+
+    def followees_of(self, user_id):
+        with self.lock:
+            if self.sync():
+                return list(self.followees.get(user_id, ()))
+        return list(Follow.objects.filter(user_id=user_id).order_by(
+            'author_id'
+        ).values_list('author_id', flat=True))
+
+    def followers_of(self, author_id):
+        with self.lock:
+            if self.sync():
+                return list(self.followers.get(author_id, ()))
+        return list(Follow.objects.filter(author_id=author_id).order_by(
+            'user_id'
+        ).values_list('user_id', flat=True))
+
+    def add(self, user_id, author_id):
+        publish('add', user_id, author_id)
+        with self.lock:
+            self.sync()
+
+    def remove(self, user_id, author_id):
+        publish('remove', user_id, author_id)
+        with self.lock:
+            self.sync()
+
+
+follow_graph = FollowIndex()
+
+
+def warm_follow_index():
+    """Хук WARMUP_HOOKS: строит индекс при старте веб-процесса."""
+    follow_graph.rebuild()
@@ -1,5 +1,6 @@
 from django import forms
 
+from .duplicates import find_duplicates
 from .models import Comment, Post
 
 
@@ -18,6 +19,20 @@ class PostForm(forms.ModelForm):
         }
         fields = ('text', 'group', 'image')
 
+    def __init__(self, *args, author=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.author = author or self.instance.author_id
+
+    def clean_text(self):
+        text = self.cleaned_data['text']
+        if self.author is not None and find_duplicates(
+            text, author=self.author, exclude=self.instance.pk
+        ):
+            raise forms.ValidationError(
+                'Почти такой же пост уже опубликован', code='duplicate'
+            )
+        return text
+
 
 class CommentForm(forms.ModelForm):
     class Meta:
@@ -0,0 +1,100 @@
+import threading
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Count, IntegerField, Max, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+from .models import ArchivedPost, Group
+
+DIRECTORY_KEY = 'group-directory'
+
+batch = threading.local()
+
+
+def group_key(slug):
+    return f'group:{slug}'
+
+
+def load_groups(**filters):
+    """Группы с числом постов и временем последнего поста.
+
+    Архивные посты тоже учитываются, чтобы число совпадало со страницей
+    группы.
+    """
+    archived = ArchivedPost.objects.filter(group=OuterRef('pk')).order_by()
+    archived_count = archived.values('group').annotate(
+        count=Count('pk')
+    ).values('count')
+    archived_last = archived.order_by('-pub_date').values('pub_date')[:1]
+    return Group.objects.filter(**filters).annotate(
+        post_count=Count('posts') + Coalesce(
+            Subquery(archived_count, output_field=IntegerField()), 0
+        ),
+        last_activity=Coalesce(
+            Max('posts__pub_date'), Subquery(archived_last)
+        ),
+    )
+
+
+def get_group(slug):
+    """Группа по слагу из кэша или None, если такой группы нет."""
+    group = cache.get(group_key(slug))
+    if group is None:
+        group = load_groups(slug=slug).first()
+        if group is not None:
+            cache.set(group_key(slug), group, settings.GROUP_CACHE_TIMEOUT)
+    return group
+
+
+def group_directory():
+    """Все группы, отсортированные по названию."""
+    slugs = cache.get(DIRECTORY_KEY)
+    if slugs is None:
+        slugs = list(
+            Group.objects.order_by('title').values_list('slug', flat=True)
+        )
+        cache.set(DIRECTORY_KEY, slugs, settings.GROUP_CACHE_TIMEOUT)
+    cached = cache.get_many([group_key(slug) for slug in slugs])
+    groups = {group.slug: group for group in cached.values()}
+    missing = [slug for slug in slugs if slug not in groups]
+    if missing:
+        loaded = {group.slug: group for group in load_groups(slug__in=missing)}
+        cache.set_many(
+            {group_key(slug): group for slug, group in loaded.items()},
+            settings.GROUP_CACHE_TIMEOUT,
+        )
+        groups.update(loaded)
+    return [groups[slug] for slug in slugs if slug in groups]
+
+
+def register_post(post):
+    """Сбрасывает метаданные группы нового поста.
+
+    Счётчик не увеличивается на месте: чтение и запись закэшированной группы
+    из двух запросов теряют инкремент, а пересчёт стоит один запрос.
+    """
+    cache.delete(group_key(post.group.slug))
+
+
+@contextmanager
+def batched_invalidation():
+    """Копит группы для сброса и сбрасывает их одним запросом в конце."""
+    batch.group_ids = set()
+    try:
+        yield
+    finally:
+        group_ids, batch.group_ids = batch.group_ids, None
+        if group_ids:
+            invalidate_groups(*group_ids)
+
+
+def invalidate_groups(*group_ids):
+    if getattr(batch, 'group_ids', None) is not None:
+        batch.group_ids.update(group_ids)
+        return
+    slugs = Group.objects.filter(pk__in=group_ids).values_list(
+        'slug', flat=True
+    )
+    cache.delete_many([group_key(slug) for slug in slugs])
@@ -0,0 +1,27 @@
+from django.core.management.base import BaseCommand
+
+from posts.duplicates import store_fingerprints
+from posts.models import Post
+
+
+class Command(BaseCommand):
+    help = 'Считает MinHash-подписи всех постов для поиска дубликатов.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500)
+
+    def handle(self, *args, **options):
+        size = options['batch_size']
+        stored = 0
+        last = 0
+        while True:
+            posts = list(
+                Post.objects.filter(pk__gt=last).order_by('pk').only(
+                    'pk', 'text'
+                )[:size]
+            )
+            if not posts:
+                break
+            stored += store_fingerprints(posts)
+            last = posts[-1].pk
+        self.stdout.write(f'Подписей сохранено: {stored}')
@@ -0,0 +1,40 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from posts.models import Comment, Post, User
+from posts.moderation import delete_comments, delete_posts
+
+
+class Command(BaseCommand):
+    help = 'Удаляет посты и комментарии автора пачками, с прогрессом.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('username')
+        parser.add_argument('--batch-size', type=int)
+        parser.add_argument(
+            '--comments-only', action='store_true',
+            help='Удалить только комментарии'
+        )
+
+    def handle(self, *args, **options):
+        author = User.objects.filter(username=options['username']).first()
+        if author is None:
+            raise CommandError('Пользователь не найден')
+
+        def progress(done):
+            self.stdout.write(f'  обработано: {done}')
+
+        self.stdout.write('Комментарии:')
+        comments = delete_comments(
+            Comment.objects.filter(author=author),
+            options['batch_size'], progress,
+        )
+        posts = 0
+        if not options['comments_only']:
+            self.stdout.write('Посты:')
+            posts = delete_posts(
+                Post.objects.filter(author=author),
+                options['batch_size'], progress,
+            )
+        self.stdout.write(
+            f'Удалено комментариев: {comments}, постов: {posts}'
+        )
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from posts.ranking import recompute_ranks
+
+
+class Command(BaseCommand):
+    help = 'Пересчитывает рейтинг популярных постов целиком.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        ranked = recompute_ranks(options['batch_size'])
+        self.stdout.write(f'Пересчитано постов: {ranked}')
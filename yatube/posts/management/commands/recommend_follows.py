@@ -0,0 +1,29 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from posts.recommendations import rebuild_suggestions
+
+
+class Command(BaseCommand):
+    help = 'Пересчитывает рекомендации подписок по графу подписок.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--top-k', type=int, default=settings.FOLLOW_SUGGESTIONS
+        )
+        parser.add_argument(
+            '--cofollow-weight', type=float,
+            default=settings.FOLLOW_SUGGESTIONS_COFOLLOW_WEIGHT,
+        )
+        parser.add_argument(
+            '--max-fanout', type=int, default=1000,
+            help='Сколько соседей узла учитывать: ограничивает работу '
+                 'на популярных авторах.'
+        )
+
+    def handle(self, *args, **options):
+        created = rebuild_suggestions(
+            options['top_k'], options['cofollow_weight'],
+            options['max_fanout'],
+        )
+        self.stdout.write(f'Сохранено рекомендаций: {created}')
@@ -0,0 +1,33 @@
+# Generated by Django 2.2.16 on 2026-10-19 23:16
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0022_postbucket_postfingerprint'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ArchivedPostRevision',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('version', models.PositiveIntegerField(verbose_name='Версия')),
+                ('diff', models.TextField(verbose_name='Обратная разница')),
+                ('created', models.DateTimeField(verbose_name='Дата изменения')),
+                ('post', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='revisions', to='posts.ArchivedPost', verbose_name='Запись')),
+            ],
+            options={
+                'verbose_name': 'Версия архивной записи',
+                'verbose_name_plural': 'Версии архивных записей',
+                'ordering': ('-version',),
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='archivedpostrevision',
+            constraint=models.UniqueConstraint(fields=('post', 'version'), name='unique_archived_post_version'),
+        ),
+    ]
@@ -2,6 +2,8 @@ from django.contrib.auth import get_user_model
 from django.db import models
 from django.db.models import UniqueConstraint
 
+from core.fields import ImageField
+
 User = get_user_model()
 
 
@@ -36,6 +38,7 @@ class Post(models.Model):
     pub_date = models.DateTimeField(
         'Дата публикации',
         auto_now_add=True,
+        db_index=True
     )
     author = models.ForeignKey(
         User,
@@ -52,11 +55,20 @@ class Post(models.Model):
         verbose_name='Группа',
         help_text='Группа, к которой относится запись'
     )
-    image = models.ImageField(
+    image = ImageField(
         'Картинка',
         upload_to='posts/',
         blank=True
     )
+    version = models.PositiveIntegerField(
+        'Версия',
+        default=1,
+        editable=False
+    )
+    updated_at = models.DateTimeField(
+        'Дата изменения',
+        auto_now=True
+    )
 
     class Meta:
         verbose_name = 'Запись'
@@ -92,6 +104,105 @@ class Comment(models.Model):
         ordering = ('-created',)
 
 
+class PostFingerprint(models.Model):
+    """MinHash-подпись текста поста (см. posts.duplicates)."""
+    post = models.OneToOneField(
+        Post,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='fingerprint'
+    )
+    signature = models.BinaryField()
+
+
+class PostBucket(models.Model):
+    """Корзина LSH: одна строка на полосу подписи поста."""
+    post = models.ForeignKey(
+        Post,
+        on_delete=models.CASCADE,
+        related_name='buckets'
+    )
+    key = models.BigIntegerField(
+        db_index=True
+    )
+
+
+class ArchivedPost(models.Model):
+    """Пост, перенесённый из горячей таблицы командой archive_posts.
+
+    id совпадает с id исходного поста, поэтому ссылки на него не меняются.
+    Архив только для чтения: редактировать и комментировать его нельзя.
+    """
+    archived = True
+
+    id = models.IntegerField(
+        primary_key=True
+    )
+    text = models.TextField(
+        'Текст'
+    )
+    pub_date = models.DateTimeField(
+        'Дата публикации',
+        db_index=True
+    )
+    author = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='archived_posts',
+        verbose_name='Автор'
+    )
+    group = models.ForeignKey(
+        Group,
+        blank=True,
+        null=True,
+        on_delete=models.SET_NULL,
+        related_name='archived_posts',
+        verbose_name='Группа'
+    )
+    image = ImageField(
+        'Картинка',
+        upload_to='posts/',
+        blank=True
+    )
+    version = models.PositiveIntegerField(
+        'Версия',
+        default=1
+    )
+    updated_at = models.DateTimeField(
+        'Дата изменения'
+    )
+
+    class Meta:
+        verbose_name = 'Архивная запись'
+        verbose_name_plural = 'Архивные записи'
+        ordering = ('-pub_date',)
+
+    def __str__(self):
+        return f'{self.text[:30]}'
+
+
+class ArchivedComment(models.Model):
+    post = models.ForeignKey(
+        ArchivedPost,
+        on_delete=models.CASCADE,
+        related_name='comments'
+    )
+    author = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='archived_comments'
+    )
+    text = models.TextField(
+        'Текст комментария'
+    )
+    created = models.DateTimeField(
+        'date_created'
+    )
+
+    class Meta:
+        ordering = ('-created',)
+
+
 class Follow(models.Model):
     user = models.ForeignKey(
         User,
@@ -105,4 +216,109 @@ class Follow(models.Model):
     )
 
     class Meta:
-        UniqueConstraint(fields=['user', 'author'], name='unique_follower')
+        constraints = (
+            UniqueConstraint(
+                fields=('user', 'author'), name='unique_follower'
+            ),
+        )
+
+
+class PostRank(models.Model):
+    post = models.OneToOneField(
+        Post,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='rank',
+        verbose_name='Запись'
+    )
+    score = models.FloatField(
+        'Рейтинг',
+        db_index=True
+    )
+
+    class Meta:
+        verbose_name = 'Рейтинг записи'
+        verbose_name_plural = 'Рейтинги записей'
+
+
+class FollowSuggestion(models.Model):
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='follow_suggestions',
+        verbose_name='Пользователь'
+    )
+    author = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='+',
+        verbose_name='Рекомендуемый автор'
+    )
+    score = models.FloatField(
+        'Вес рекомендации'
+    )
+
+    class Meta:
+        verbose_name = 'Рекомендация подписки'
+        verbose_name_plural = 'Рекомендации подписок'
+        ordering = ('-score',)
+        indexes = (models.Index(fields=('user', '-score')),)
+
+
+class PostRevision(models.Model):
+    post = models.ForeignKey(
+        Post,
+        on_delete=models.CASCADE,
+        related_name='revisions',
+        verbose_name='Запись'
+    )
+    version = models.PositiveIntegerField(
+        'Версия'
+    )
+    diff = models.TextField(
+        'Обратная разница',
+        help_text='Как получить текст этой версии из следующей'
+    )
+    created = models.DateTimeField(
+        'Дата изменения',
+        auto_now_add=True
+    )
+
+    class Meta:
+        verbose_name = 'Версия записи'
+        verbose_name_plural = 'Версии записей'
+        ordering = ('-version',)
+        constraints = (
+            UniqueConstraint(
+                fields=('post', 'version'), name='unique_post_version'
+            ),
+        )
+
+
+class ArchivedPostRevision(models.Model):
+    post = models.ForeignKey(
+        ArchivedPost,
+        on_delete=models.CASCADE,
+        related_name='revisions',
+        verbose_name='Запись'
+    )
+    version = models.PositiveIntegerField(
+        'Версия'
+    )
+    diff = models.TextField(
+        'Обратная разница'
+    )
+    created = models.DateTimeField(
+        'Дата изменения'
+    )
+
+    class Meta:
+        verbose_name = 'Версия архивной записи'
+        verbose_name_plural = 'Версии архивных записей'
+        ordering = ('-version',)
+        constraints = (
+            UniqueConstraint(
+                fields=('post', 'version'),
+                name='unique_archived_post_version'
+            ),
+        )
@@ -0,0 +1,95 @@
+import logging
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .group_cache import batched_invalidation, invalidate_groups
+from .models import Comment, Post
+from .ranking import rerank_posts
+
+logger = logging.getLogger(__name__)
+
+
+def batches(queryset, batch_size=None):
+    """id строк queryset пачками по batch_size, по возрастанию id.
+
+    Каждая пачка выбирается заново после id предыдущей, поэтому
+    изменение или удаление уже обработанных строк обходу не мешает.
+    """
+    batch_size = batch_size or settings.MODERATION_BATCH_SIZE
+    last = 0
+    while True:
+        ids = list(
+            queryset.filter(pk__gt=last).order_by('pk').values_list(
+                'pk', flat=True
+            )[:batch_size]
+        )
+        if not ids:
+            return
+        yield ids
+        last = ids[-1]
+
+
+def report(progress, action, done):
+    logger.info('%s: обработано %s', action, done)
+    if progress is not None:
+        progress(done)
+
+
+def reassign_group(queryset, group, batch_size=None, progress=None):
+    """Переносит посты в группу одним UPDATE на пачку.
+
+    Версия поста растёт, как и при обычной правке; метаданные старых
+    групп и новой сбрасываются один раз на пачку.
+    """
+    done = 0
+    group_id = group.pk if group else None
+    for ids in batches(queryset, batch_size):
+        with transaction.atomic():
+            posts = Post.objects.filter(pk__in=ids)
+            previous = set(posts.values_list('group_id', flat=True))
+            posts.exclude(group_id=group_id).update(
+                group_id=group_id,
+                version=F('version') + 1,
+                updated_at=timezone.now(),
+            )
+        invalidate_groups(group_id, *previous)
+        done += len(ids)
+        report(progress, 'Перенос в группу', done)
+    return done
+
+
+def delete_posts(queryset, batch_size=None, progress=None):
+    """Удаляет посты пачками.
+
+    Каждая пачка удаляется обычным QuerySet.delete(): связи удаляются,
+    обнуляются или защищают пост так, как объявлены в моделях, а сигналы
+    удаления отправляются. Метаданные групп сбрасываются один раз на
+    пачку.
+    """
+    done = 0
+    for ids in batches(queryset, batch_size):
+        with transaction.atomic(), batched_invalidation():
+            Post.objects.filter(pk__in=ids).delete()
+        done += len(ids)
+        report(progress, 'Удаление постов', done)
+    return done
+
+
+def delete_comments(queryset, batch_size=None, progress=None):
+    """Удаляет комментарии пачками и пересчитывает рейтинг их постов."""
+    done = 0
+    for ids in batches(queryset, batch_size):
+        with transaction.atomic():
+            comments = Comment.objects.filter(pk__in=ids)
+            post_ids = set(comments.values_list('post_id', flat=True))
+            comments.delete()
+            rerank_posts(post_ids)
+            Post.objects.filter(pk__in=post_ids).update(
+                updated_at=timezone.now()
+            )
+        done += len(ids)
+        report(progress, 'Удаление комментариев', done)
+    return done
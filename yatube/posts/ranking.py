@@ -0,0 +1,154 @@
+"""Рейтинг «популярного» с затуханием по времени.
+
+Рейтинг хранится в логарифмической шкале относительно фиксированной эпохи:
+вклад события в момент t равен exp((t - EPOCH) / RANKING_DECAY_SECONDS).
+Поэтому более свежие посты и комментарии весят экспоненциально больше,
+а уже посчитанные рейтинги не нужно пересчитывать с течением времени —
+порядок сохраняется, и новый комментарий просто добавляется к сумме.
+"""
+import math
+from datetime import datetime
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count
+
+from core.lazy import lazy_import
+
+from .models import Comment, Post, PostRank
+
+# Нужен только пересчёту рейтинга (rank_posts), а не запросам.
+np = lazy_import('numpy')
+EPOCH = datetime(2022, 1, 1)
+
+
+def time_score(moment):
+    return (moment - EPOCH).total_seconds() / settings.RANKING_DECAY_SECONDS
+
+
+def base_score(pub_date, followers):
+    """Вклад самого поста: время публикации и аудитория автора."""
+    return time_score(pub_date) + math.log1p(
+        settings.RANKING_FOLLOWER_WEIGHT * math.log1p(followers)
+    )
+
+
+def comment_weight():
+    """Логарифм веса комментария; при нулевом весе они не влияют."""
+    weight = settings.RANKING_COMMENT_WEIGHT
+    return math.log(weight) if weight > 0 else -math.inf
+
+
+def comment_score(created):
+    return time_score(created) + comment_weight()
+
+
+def logaddexp(first, second):
+    high, low = max(first, second), min(first, second)
+    return high + math.log1p(math.exp(low - high))
+
+
+def rank_new_post(post):
+    PostRank.objects.update_or_create(
+        post=post,
+        defaults={'score': base_score(
+            post.pub_date, post.author.following.count()
+        )},
+    )
+
+
+def register_comments(comments):
+    """Инкрементально учитывает новые комментарии в рейтинге постов."""
+    by_post = {}
+    for comment in comments:
+        by_post.setdefault(comment.post_id, []).append(comment)
+    with transaction.atomic():
+        ranks = PostRank.objects.select_for_update().in_bulk(list(by_post))
+        for post_id, rank in ranks.items():
+            for comment in by_post[post_id]:
+                rank.score = logaddexp(
+                    rank.score, comment_score(comment.created)
+                )
+        PostRank.objects.bulk_update(ranks.values(), ('score',))
+
+
+def to_seconds(dates):
+    values = np.array(dates, dtype='datetime64[us]')
+    return (values - np.datetime64(EPOCH)) / np.timedelta64(1, 's')
+
+
+def compute_scores(posts, comments):
+    """Векторно пересчитывает рейтинг постов posts по комментариям comments.
+
+    Возвращает пару массивов (id постов, рейтинги).
+    """
+    posts = list(posts.annotate(
+        followers=Count('author__following')
+    ).order_by('pk').values_list('pk', 'pub_date', 'followers'))
+    if not posts:
+        return np.array([], dtype=np.int64), np.array([])
+    post_ids, pub_dates, followers = zip(*posts)
+    post_ids = np.array(post_ids, dtype=np.int64)
+    decay = settings.RANKING_DECAY_SECONDS
+    scores = to_seconds(pub_dates) / decay + np.log1p(
+        settings.RANKING_FOLLOWER_WEIGHT * np.log1p(np.array(followers))
+    )
+    comments = list(comments.values_list('post_id', 'created'))
+    if comments and settings.RANKING_COMMENT_WEIGHT > 0:
+        comment_posts, created = zip(*comments)
+        index = np.searchsorted(post_ids, np.array(comment_posts))
+        terms = to_seconds(created) / decay + comment_weight()
+        # log-sum-exp по группам: вычитаем максимум для устойчивости.
+        peak = scores.copy()
+        np.maximum.at(peak, index, terms)
+        total = np.exp(scores - peak)
+        np.add.at(total, index, np.exp(terms - peak[index]))
+        scores = peak + np.log(total)
+    return post_ids, scores
+
+
+def save_scores(post_ids, scores):
+    ranks = dict(zip(post_ids.tolist(), scores.tolist()))
+    with transaction.atomic():
+        existing = PostRank.objects.in_bulk(list(ranks))
+        for post_id, rank in existing.items():
+            rank.score = ranks[post_id]
+        PostRank.objects.bulk_update(existing.values(), ('score',))
+        PostRank.objects.bulk_create(
+            PostRank(post_id=post_id, score=score)
+            for post_id, score in ranks.items()
+            if post_id not in existing
+        )
+
+
+def recompute_ranks(batch_size=1000):
+    """Пересчитывает рейтинг всех постов пачками по id.
+
+    Каждая пачка пишется в своей короткой транзакции, так что блокировка
+    записи не держится на весь пересчёт.
+    """
+    ranked, last_id = 0, 0
+    while True:
+        ids = list(Post.objects.filter(pk__gt=last_id).order_by(
+            'pk'
+        ).values_list('pk', flat=True)[:batch_size])
+        if not ids:
+            return ranked
+        save_scores(*compute_scores(
+            Post.objects.filter(pk__gte=ids[0], pk__lte=ids[-1]),
+            Comment.objects.filter(post__gte=ids[0], post__lte=ids[-1]),
+        ))
+        ranked += len(ids)
+        last_id = ids[-1]
+
+
+def rerank_posts(post_ids):
+    """Пересчитывает рейтинг отдельных постов.
+
+    Нужен после удаления комментариев: вычесть слагаемое из log-sum-exp
+    без потери точности нельзя.
+    """
+    save_scores(*compute_scores(
+        Post.objects.filter(pk__in=post_ids),
+        Comment.objects.filter(post__in=post_ids),
+    ))
@@ -0,0 +1,55 @@
+import json
+from difflib import SequenceMatcher
+
+# Ссылка на кусок новой версии дешевле самого куска только начиная
+# с такой длины: короткие совпадения выгоднее хранить литералом.
+MIN_COPY = 8
+# SequenceMatcher квадратичен по длине текста: для длинных постов вместо
+# разницы хранится старый текст целиком.
+MAX_DIFF_LENGTH = 20000
+
+
+def make_delta(new, old):
+    """Обратная разница: как получить old из new.
+
+    Хранится список операций в JSON: пара [начало, конец] копирует
+    срез new, строка вставляется как есть. Хранить обратную разницу
+    удобно: текущий текст лежит в Post целиком, а старые версии
+    восстанавливаются от него шаг за шагом.
+    """
+    if len(new) + len(old) > MAX_DIFF_LENGTH:
+        return json.dumps([old], ensure_ascii=False, separators=(',', ':'))
+    ops = []
+    matcher = SequenceMatcher(None, new, old, autojunk=False)
+    for tag, i1, i2, j1, j2 in matcher.get_opcodes():
+        if tag == 'equal' and i2 - i1 >= MIN_COPY:
+            ops.append([i1, i2])
+            continue
+        chunk = old[j1:j2]
+        if not chunk:
+            continue
+        if ops and isinstance(ops[-1], str):
+            ops[-1] += chunk
+        else:
+            ops.append(chunk)
+    return json.dumps(ops, ensure_ascii=False, separators=(',', ':'))
+
+
+def apply_delta(new, delta):
+    return ''.join(
+        op if isinstance(op, str) else new[op[0]:op[1]]
+        for op in json.loads(delta)
+    )
+
+
+def text_at(post, version):
+    """Текст поста в указанной версии."""
+    if not 1 <= version <= post.version:
+        raise ValueError(f'У поста нет версии {version}')
+    text = post.text
+    revisions = post.revisions.filter(version__gte=version).values_list(
+        'diff', flat=True
+    ).order_by('-version')
+    for delta in revisions:
+        text = apply_delta(text, delta)
+    return text
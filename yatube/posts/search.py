@@ -0,0 +1,97 @@
+from django.db import connections
+
+# Полнотекстовый индекс по Post.text: на SQLite это внешняя таблица FTS5
+# с триггерами, на PostgreSQL - GIN-индекс по tsvector.
+FTS_TABLE = 'posts_post_fts'
+TS_CONFIG = 'russian'
+
+SQLITE_TRIGGERS = {
+    'posts_post_fts_insert': (
+        'AFTER INSERT ON posts_post BEGIN '
+        'INSERT INTO {fts}(rowid, text) VALUES (new.id, new.text); END'
+    ),
+    'posts_post_fts_delete': (
+        'AFTER DELETE ON posts_post BEGIN '
+        "INSERT INTO {fts}({fts}, rowid, text) "
+        "VALUES ('delete', old.id, old.text); END"
+    ),
+    'posts_post_fts_update': (
+        'AFTER UPDATE OF text ON posts_post BEGIN '
+        "INSERT INTO {fts}({fts}, rowid, text) "
+        "VALUES ('delete', old.id, old.text); "
+        'INSERT INTO {fts}(rowid, text) VALUES (new.id, new.text); END'
+    ),
+}
+
+
+def ensure_search_index(using='default', **kwargs):
+    """Создаёт полнотекстовый индекс, если его нет.
+
+    Вызывается после каждой миграции, а не из неё: SQLite пересоздаёт
+    таблицу при изменении её полей и теряет триггеры. Если триггеров не
+    было, индекс перестраивается по текущим постам.
+    """
+    connection = connections[using]
+    if 'posts_post' not in connection.introspection.table_names():
+        return
+    with connection.cursor() as cursor:
+        if connection.vendor == 'postgresql':
+            cursor.execute(
+                'CREATE INDEX IF NOT EXISTS posts_post_text_fts '
+                f"ON posts_post USING gin (to_tsvector('{TS_CONFIG}', text))"
+            )
+        if connection.vendor != 'sqlite':
+            return
+        cursor.execute(
+            "SELECT name FROM sqlite_master WHERE type = 'trigger' "
+            "AND tbl_name = 'posts_post'"
+        )
+        missing = set(SQLITE_TRIGGERS) - {row[0] for row in cursor.fetchall()}
+        if not missing:
+            return
+        cursor.execute(
+            f'CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5('
+            "text, content='posts_post', content_rowid='id')"
+        )
+        for name in missing:
+            cursor.execute(
+                f'CREATE TRIGGER {name} '
+                + SQLITE_TRIGGERS[name].format(fts=FTS_TABLE)
+            )
+        cursor.execute(
+            f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')"
+        )
+
+
+def fts_query(term):
+    """Запрос FTS5: все слова как префиксы, спецсимволы экранированы."""
+    words = ('"{}"*'.format(word.replace('"', '""')) for word in term.split())
+    return ' '.join(words)
+
+
+def search_posts(queryset, term):
+    """Посты, в тексте которых есть все слова term, по индексу."""
+    if not term.split():
+        return queryset
+    vendor = connections[queryset.db].vendor
+    if vendor == 'sqlite':
+        # Не pk__in=RawSQL(...): SQLite читает IN ((SELECT ...)) как
+        # список из одного скалярного подзапроса.
+        return queryset.extra(
+            where=[
+                f'posts_post.id IN (SELECT rowid FROM {FTS_TABLE} '
+                f'WHERE {FTS_TABLE} MATCH %s)'
+            ],
+            params=[fts_query(term)],
+        )
+    if vendor == 'postgresql':
+        return queryset.extra(
+            where=[
+                f"to_tsvector('{TS_CONFIG}', posts_post.text) @@ "
+                f"plainto_tsquery('{TS_CONFIG}', %s)"
+            ],
+            params=[term],
+        )
+    for word in term.split():
+        queryset = queryset.filter(text__icontains=word)
+    return queryset
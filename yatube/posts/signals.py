@@ -0,0 +1,125 @@
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+from django.utils import timezone
+
+from core.jobs import enqueue
+
+from .archive import reserve_post_id
+from .duplicates import store_fingerprints
+from .follow_index import follow_graph
+from .group_cache import (
+    DIRECTORY_KEY, group_key, invalidate_groups, register_post
+)
+from .models import Comment, Follow, Group, Post, PostRevision
+from .ranking import rank_new_post, register_comments
+from .revisions import make_delta
+from .tasks import make_thumbnails
+
+
+@receiver(pre_save, sender=Post)
+def remember_post_state(sender, instance, **kwargs):
+    previous = Post.objects.filter(pk=instance.pk).values_list(
+        'group_id', 'text', 'image', 'version'
+    ).first() if instance.pk else None
+    instance._previous_group_id = previous and previous[0]
+    instance._previous_text = None
+    instance._text_changed = previous is None or previous[1] != instance.text
+    instance._image_changed = (
+        previous is None or previous[2] != (instance.image.name or '')
+    )
+    if previous is None:
+        return
+    group_id, text, image, version = previous
+    if (group_id, text, image) != (
+        instance.group_id, instance.text, instance.image.name or ''
+    ):
+        instance.version = version + 1
+        if text != instance.text:
+            instance._previous_text = text
+
+
+@receiver(pre_save, sender=Post)
+def reserve_id(sender, instance, **kwargs):
+    reserve_post_id(instance)
+
+
+@receiver(post_save, sender=Post)
+def update_group_on_post_save(sender, instance, created, **kwargs):
+    if created:
+        rank_new_post(instance)
+        if instance.group_id:
+            register_post(instance)
+        return
+    if getattr(instance, '_previous_text', None) is not None:
+        PostRevision.objects.create(
+            post=instance,
+            version=instance.version - 1,
+            diff=make_delta(instance.text, instance._previous_text),
+        )
+        instance._previous_text = None
+    previous = getattr(instance, '_previous_group_id', None)
+    if previous != instance.group_id:
+        invalidate_groups(previous, instance.group_id)
+
+
+@receiver(post_save, sender=Post)
+def fingerprint_post(sender, instance, **kwargs):
+    if getattr(instance, '_text_changed', True):
+        store_fingerprints([instance])
+
+
+@receiver(post_save, sender=Post)
+def schedule_thumbnails(sender, instance, **kwargs):
+    if instance.image and getattr(instance, '_image_changed', True):
+        enqueue(make_thumbnails, instance.pk)
+
+
+@receiver(post_delete, sender=Post)
+def update_group_on_post_delete(sender, instance, **kwargs):
+    if instance.group_id:
+        invalidate_groups(instance.group_id)
+
+
+@receiver(pre_save, sender=Group)
+def remember_group_slug(sender, instance, **kwargs):
+    instance._previous_slug = Group.objects.filter(
+        pk=instance.pk
+    ).values_list('slug', flat=True).first() if instance.pk else None
+
+
+@receiver(post_save, sender=Group)
+@receiver(post_delete, sender=Group)
+def invalidate_group(sender, instance, **kwargs):
+    slugs = {instance.slug, getattr(instance, '_previous_slug', None)}
+    cache.delete_many(
+        [group_key(slug) for slug in slugs if slug] + [DIRECTORY_KEY]
+    )
+
+
+@receiver(post_save, sender=Comment)
+def rank_comment(sender, instance, created, **kwargs):
+    if created:
+        register_comments([instance])
+
+
+@receiver(post_save, sender=Comment)
+def touch_commented_post(sender, instance, **kwargs):
+    # updated_at поста входит в ETag его страницы.
+    Post.objects.filter(pk=instance.post_id).update(updated_at=timezone.now())
+
+
+@receiver(post_save, sender=Follow)
+def index_follow(sender, instance, created, **kwargs):
+    if created:
+        transaction.on_commit(
+            lambda: follow_graph.add(instance.user_id, instance.author_id)
+        )
+
+
+@receiver(post_delete, sender=Follow)
+def unindex_follow(sender, instance, **kwargs):
+    transaction.on_commit(
+        lambda: follow_graph.remove(instance.user_id, instance.author_id)
+    )
@@ -0,0 +1,17 @@
+from sorl.thumbnail import get_thumbnail
+
+from .models import Post
+
+# Те же параметры, что у {% thumbnail %} в карточке и на странице поста.
+THUMBNAILS = (
+    ('960x339', {'crop': 'center', 'upscale': True}),
+)
+
+
+def make_thumbnails(post_id):
+    """Готовит миниатюры картинки поста заранее, а не при первом показе."""
+    post = Post.objects.filter(pk=post_id).only('image').first()
+    if post is None or not post.image:
+        return
+    for geometry, options in THUMBNAILS:
+        get_thumbnail(post.image, geometry, **options)
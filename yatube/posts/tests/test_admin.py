@@ -0,0 +1,230 @@
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.test import Client, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from core.paginator import EstimatedCountPaginator
+
+from ..group_cache import get_group
+from ..models import Comment, Group, Post, PostRank, PostRevision
+from ..moderation import delete_posts
+from ..ranking import recompute_ranks
+from ..search import search_posts
+
+User = get_user_model()
+
+
+class PostAdminTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.admin = User.objects.create_superuser(
+            username='admin', email='admin@test.ru', password='pass'
+        )
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test_slug',
+            description='Тестовое описание',
+        )
+
+    def setUp(self):
+        self.client = Client()
+        self.client.force_login(self.admin)
+        self.url = reverse('admin:posts_post_changelist')
+
+    def create_posts(self, amount, prefix='user'):
+        for num in range(amount):
+            author = User.objects.create_user(username=f'{prefix}{num}')
+            Post.objects.create(
+                text=f'Тестовый пост {num}', author=author, group=self.group
+            )
+
+    def changelist_queries(self):
+        self.client.get(self.url)
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        return len(queries)
+
+    def test_changelist_queries_do_not_grow_with_rows(self):
+        """Число запросов списка постов не зависит от числа строк."""
+        self.create_posts(2)
+        few = self.changelist_queries()
+        self.create_posts(20, prefix='more')
+        self.assertEqual(self.changelist_queries(), few)
+
+    def test_group_is_not_rendered_as_select(self):
+        """Группа поста выбирается через автодополнение."""
+        Group.objects.create(
+            title='Другая группа', slug='other', description='Описание'
+        )
+        self.create_posts(1)
+        self.assertNotContains(self.client.get(self.url), 'Другая группа')
+        response = self.client.get(reverse(
+            'admin:posts_post_change', args=(Post.objects.get().pk,)
+        ))
+        self.assertContains(response, 'admin-autocomplete')
+        self.assertNotContains(response, 'Другая группа')
+
+    def test_search_uses_full_text_index(self):
+        """Поиск находит слова по префиксу и видит правки и удаления."""
+        post = Post.objects.create(
+            text='Длинное сообщение про котиков', author=self.admin
+        )
+        Post.objects.create(text='Про собак', author=self.admin)
+        found = search_posts(Post.objects.all(), 'кот СООБЩ')
+        self.assertEqual(list(found), [post])
+        post.text = 'Теперь про собак'
+        post.save()
+        self.assertFalse(search_posts(Post.objects.all(), 'котиков'))
+        self.assertEqual(search_posts(Post.objects.all(), 'собак').count(), 2)
+        post.delete()
+        self.assertEqual(search_posts(Post.objects.all(), 'собак').count(), 1)
+        response = self.client.get(self.url, {'q': 'собак'})
+        self.assertEqual(response.context['cl'].result_count, 1)
+
+    @override_settings(ESTIMATED_COUNT_THRESHOLD=1)
+    def test_estimated_count_skips_count_query(self):
+        """Нефильтрованная выборка считается по оценке, без COUNT(*)."""
+        self.create_posts(3)
+        Post.objects.order_by('pk')[1].delete()
+        with CaptureQueriesContext(connection) as queries:
+            count = EstimatedCountPaginator(Post.objects.all(), 10).count
+        self.assertFalse([q for q in queries if 'COUNT' in q['sql']])
+        # Оценка по разбросу ключа не видит удалённую строку.
+        self.assertEqual(count, 3)
+        self.assertEqual(
+            EstimatedCountPaginator(
+                Post.objects.filter(group=self.group), 10
+            ).count,
+            2,
+        )
+
+
+class ModerationActionsTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.admin = User.objects.create_superuser(
+            username='admin', email='admin@test.ru', password='pass'
+        )
+        cls.spammer = User.objects.create_user(username='spammer')
+        cls.reader = User.objects.create_user(username='reader')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test_slug',
+            description='Тестовое описание',
+        )
+        cls.target = Group.objects.create(
+            title='Другая группа',
+            slug='target',
+            description='Тестовое описание',
+        )
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+        self.client.force_login(self.admin)
+        self.url = reverse('admin:posts_post_changelist')
+        self.spam = [
+            Post.objects.create(
+                text=f'Спам {num}', author=self.spammer, group=self.group
+            )
+            for num in range(5)
+        ]
+        self.post = Post.objects.create(
+            text='Нормальный пост', author=self.reader, group=self.group
+        )
+        for post in self.spam[:2] + [self.post]:
+            Comment.objects.create(post=post, author=self.spammer, text='Спам')
+            Comment.objects.create(post=post, author=self.reader, text='Ок')
+
+    def run_action(self, action, posts, **data):
+        return self.client.post(self.url, {
+            'action': action,
+            '_selected_action': [post.pk for post in posts],
+            **data,
+        }, follow=True)
+
+    def test_move_to_group(self):
+        """Перенос в группу обновляет посты, версии и кэш групп."""
+        self.assertEqual(get_group('target').post_count, 0)
+        with self.settings(MODERATION_BATCH_SIZE=2):
+            with CaptureQueriesContext(connection) as queries:
+                self.run_action('move_to_group', self.spam, group='target')
+        updates = [q for q in queries if q['sql'].startswith('UPDATE')]
+        self.assertEqual(len(updates), 3)
+        self.assertEqual(self.target.posts.count(), len(self.spam))
+        self.assertEqual(
+            set(Post.objects.filter(author=self.spammer).values_list(
+                'version', flat=True
+            )),
+            {2},
+        )
+        self.assertEqual(get_group('target').post_count, len(self.spam))
+        self.assertEqual(get_group('test_slug').post_count, 1)
+
+    def test_unknown_group_is_reported(self):
+        """Несуществующая группа не трогает посты."""
+        response = self.run_action('move_to_group', self.spam, group='nope')
+        self.assertContains(response, 'не найдена')
+        self.assertEqual(self.group.posts.count(), len(self.spam) + 1)
+
+    def test_delete_authors_posts(self):
+        """Все посты автора удаляются вместе с зависимыми строками."""
+        self.spam[0].text = 'Правка'
+        self.spam[0].save()
+        response = self.run_action('delete_authors_posts', self.spam[:1])
+        self.assertContains(response, 'spammer: постов 5')
+        self.assertEqual(Post.objects.filter(author=self.spammer).count(), 5)
+        with self.settings(MODERATION_BATCH_SIZE=2):
+            with CaptureQueriesContext(connection) as queries:
+                self.run_action(
+                    'delete_authors_posts', self.spam[:1], post='yes'
+                )
+        self.assertFalse(Post.objects.filter(author=self.spammer).exists())
+        self.assertEqual(list(Post.objects.all()), [self.post])
+        self.assertEqual(Comment.objects.count(), 2)
+        self.assertFalse(PostRank.objects.exclude(post=self.post).exists())
+        self.assertFalse(PostRevision.objects.exists())
+        post_deletes = [
+            q for q in queries
+            if q['sql'].startswith('DELETE FROM "posts_post" ')
+        ]
+        self.assertEqual(len(post_deletes), 3)
+
+    def test_purge_authors_comments(self):
+        """Удаляются только комментарии авторов выбранных постов."""
+        self.run_action('purge_authors_comments', self.spam[:1])
+        self.assertFalse(Comment.objects.filter(author=self.spammer).exists())
+        self.assertEqual(Comment.objects.filter(author=self.reader).count(), 3)
+
+    def test_purge_comments_updates_rank(self):
+        """Рейтинг постов пересчитывается без удалённых комментариев."""
+        self.run_action('purge_authors_comments', self.spam[:1])
+        purged = dict(PostRank.objects.values_list('post_id', 'score'))
+        recompute_ranks()
+        recomputed = dict(PostRank.objects.values_list('post_id', 'score'))
+        for post_id, score in recomputed.items():
+            self.assertAlmostEqual(purged[post_id], score)
+
+    def test_deleted_posts_update_group_cache(self):
+        """После удаления постов кэш группы показывает новый счётчик."""
+        self.assertEqual(get_group('test_slug').post_count, 6)
+        delete_posts(Post.objects.filter(author=self.spammer), batch_size=2)
+        self.assertEqual(get_group('test_slug').post_count, 1)
+
+    def test_purge_author_command_reports_progress(self):
+        """Команда purge_author печатает прогресс по пачкам."""
+        out = StringIO()
+        call_command(
+            'purge_author', self.spammer.username, batch_size=2, stdout=out
+        )
+        self.assertIn('обработано: 4', out.getvalue())
+        self.assertIn('постов: 5', out.getvalue())
+        self.assertEqual(list(Post.objects.all()), [self.post])
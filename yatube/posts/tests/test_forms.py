@@ -1,15 +1,22 @@
 import shutil
 import tempfile
 from http import HTTPStatus
+from io import StringIO
+from unittest import mock
 
 from django.conf import settings
 from django.contrib.auth import get_user_model
+from django.core.cache import cache
 from django.core.files.uploadedfile import SimpleUploadedFile
-from django.test import Client, TestCase
+from django.core.management import call_command
+from django.db import DatabaseError
+from django.test import Client, TestCase, override_settings
 from django.urls import reverse
 
+from ..comment_buffer import CommentBuffer, comment_buffer
 from ..forms import PostForm
-from ..models import Group, Post
+from ..duplicates import find_duplicates, signatures
+from ..models import Comment, Group, Post, PostBucket, PostFingerprint
 
 User = get_user_model()
 
@@ -177,3 +184,189 @@ class PostFormTests(TestCase):
         self.assertEqual(post.author, self.author)
         self.assertEqual(post.group, self.group2)
         self.assertEqual(post.image, 'posts/test_new.gif')
+
+
+@override_settings(COMMENTS_WRITE_BEHIND=True)
+@mock.patch.object(CommentBuffer, 'start')
+class CommentWriteBehindTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(username='test_author')
+        cls.reader = User.objects.create_user(username='test_reader')
+        cls.post = Post.objects.create(author=cls.author, text='Тестовый пост')
+
+    def setUp(self):
+        cache.clear()
+        self.addCleanup(comment_buffer.take)
+        self.author_client = Client()
+        self.author_client.force_login(self.author)
+        self.reader_client = Client()
+        self.reader_client.force_login(self.reader)
+
+    def add_comment(self, text):
+        return self.author_client.post(
+            reverse('posts:add_comment', args=(self.post.id,)),
+            {'text': text},
+        )
+
+    def detail_comments(self, client):
+        response = client.get(
+            reverse('posts:post_detail', args=(self.post.id,))
+        )
+        return [comment.text for comment in response.context['comments']]
+
+    def test_comment_buffered_until_flush(self, start):
+        """Комментарий попадает в очередь, а не сразу в БД."""
+        self.add_comment('Первый')
+        self.add_comment('Второй')
+        self.assertFalse(Comment.objects.exists())
+        self.assertEqual(comment_buffer.flush(), 2)
+        self.assertEqual(
+            set(Comment.objects.values_list('text', flat=True)),
+            {'Первый', 'Второй'},
+        )
+
+    def test_author_reads_own_pending_comments(self, start):
+        """Автор видит свои незаписанные комментарии, другие — нет."""
+        self.add_comment('Ожидает записи')
+        self.assertEqual(
+            self.detail_comments(self.author_client), ['Ожидает записи']
+        )
+        self.assertEqual(self.detail_comments(self.reader_client), [])
+        comment_buffer.flush()
+        self.assertEqual(
+            self.detail_comments(self.author_client), ['Ожидает записи']
+        )
+        self.assertEqual(
+            self.detail_comments(self.reader_client), ['Ожидает записи']
+        )
+
+    def test_comments_of_deleted_post_are_dropped(self, start):
+        """Комментарии к удалённому посту не ломают запись пачки."""
+        self.add_comment('К удалённому посту')
+        Post.objects.filter(pk=self.post.pk).delete()
+        self.assertEqual(comment_buffer.flush(), 1)
+        self.assertFalse(Comment.objects.exists())
+
+    def test_failed_batch_is_requeued(self, start):
+        """Незаписанная пачка остаётся в очереди и видна автору."""
+        self.add_comment('Повторим')
+        with mock.patch.object(
+            CommentBuffer, 'write', side_effect=DatabaseError
+        ):
+            with self.assertRaises(DatabaseError):
+                comment_buffer.flush()
+        self.assertEqual(
+            self.detail_comments(self.author_client), ['Повторим']
+        )
+        self.assertEqual(comment_buffer.flush(), 1)
+        self.assertTrue(Comment.objects.filter(text='Повторим').exists())
+
+    def test_flush_all_writes_batch_in_flight(self, start):
+        """При выходе пишется и пачка, которую поток уже взял из очереди."""
+        self.add_comment('В работе')
+        comment_buffer.in_flight.append(comment_buffer.queue.get())
+        comment_buffer.flush_all()
+        self.assertEqual(comment_buffer.in_flight, [])
+        self.assertTrue(Comment.objects.filter(text='В работе').exists())
+
+
+class DuplicatePostTests(TestCase):
+    SPAM = (
+        'Купите наши чудесные пластиковые окна по самой низкой цене в '
+        'городе, звоните прямо сейчас и получите скидку!'
+    )
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.spammer = User.objects.create_user(username='spammer')
+        cls.bot = User.objects.create_user(username='bot')
+        cls.post = Post.objects.create(author=cls.spammer, text=cls.SPAM)
+
+    def setUp(self):
+        self.client = Client()
+        self.client.force_login(self.spammer)
+
+    def test_near_duplicate_is_rejected(self):
+        """Автор не может повторить почти такой же пост."""
+        variant = self.SPAM.upper().replace('сейчас', 'сегодня') + '!!!'
+        response = self.client.post(
+            reverse('posts:post_create'), {'text': variant}
+        )
+        self.assertFormError(
+            response, 'form', 'text', 'Почти такой же пост уже опубликован'
+        )
+        self.assertEqual(Post.objects.count(), 1)
+
+    def test_other_author_may_post_similar_text(self):
+        """Похожий текст другого автора не считается дубликатом."""
+        self.client.force_login(self.bot)
+        self.client.post(reverse('posts:post_create'), {'text': self.SPAM})
+        self.assertEqual(Post.objects.filter(author=self.bot).count(), 1)
+
+    def test_long_texts_are_hashed_in_chunks(self):
+        """Подписи не зависят от того, как шинглы разбиты на куски."""
+        texts = [self.SPAM * 40, 'Короткий', self.SPAM[::-1] * 15]
+        whole = signatures(texts)
+        with mock.patch('posts.duplicates.CHUNK', 100):
+            chunked = signatures(texts)
+        self.assertTrue((whole == chunked).all())
+        self.assertTrue((whole[0] == signatures(texts[:1])[0]).all())
+
+    def test_different_and_short_texts_pass(self):
+        """Непохожие и короткие тексты публикуются."""
+        texts = (
+            'Сегодня гулял в парке и видел удивительно красивый закат над '
+            'рекой, было очень здорово.',
+            'Короткий пост',
+            'Короткий пост',
+        )
+        for text in texts:
+            self.client.post(reverse('posts:post_create'), {'text': text})
+        self.assertEqual(Post.objects.count(), 1 + len(texts))
+
+    def test_duplicate_edit_shows_error(self):
+        """Правка в почти копию другого своего поста не сохраняется."""
+        post = Post.objects.create(
+            author=self.spammer,
+            text='Совсем другой текст про путешествия по горам и долинам '
+                 'далёкой северной страны.',
+        )
+        response = self.client.post(
+            reverse('posts:post_edit', args=(post.pk,)),
+            {'text': self.SPAM + '!'},
+        )
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        self.assertFormError(
+            response, 'form', 'text', 'Почти такой же пост уже опубликован'
+        )
+        post.refresh_from_db()
+        self.assertNotEqual(post.text, self.SPAM + '!')
+
+    def test_editing_own_post_is_not_a_duplicate(self):
+        """Правка поста не считается дубликатом самого себя."""
+        form = PostForm(
+            {'text': self.SPAM + ' Обновлено.'}, instance=self.post
+        )
+        self.assertTrue(form.is_valid())
+
+    def test_fingerprint_follows_text_changes(self):
+        """Подпись пересчитывается при правке и удаляется с постом."""
+        self.post.text = (
+            'Совсем другой текст про путешествия по горам и долинам '
+            'далёкой северной страны.'
+        )
+        self.post.save()
+        self.assertEqual(find_duplicates(self.SPAM), [])
+        self.assertEqual(find_duplicates(self.post.text), [self.post.pk])
+        self.post.delete()
+        self.assertFalse(PostFingerprint.objects.exists())
+        self.assertFalse(PostBucket.objects.exists())
+
+    def test_fingerprint_command(self):
+        """Команда fingerprint_posts подписывает уже существующие посты."""
+        PostFingerprint.objects.all().delete()
+        PostBucket.objects.all().delete()
+        call_command('fingerprint_posts', batch_size=1, stdout=StringIO())
+        self.assertEqual(find_duplicates(self.SPAM), [self.post.pk])
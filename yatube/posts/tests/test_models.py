@@ -1,7 +1,10 @@
+import json
+
 from django.contrib.auth import get_user_model
 from django.test import TestCase
 
-from ..models import Group, Post
+from ..models import Group, Post, PostRevision
+from ..revisions import text_at
 
 User = get_user_model()
 
@@ -58,3 +61,61 @@ class PostModelTest(TestCase):
             with self.subTest(value=value):
                 self.assertEqual(
                     post._meta.get_field(value).help_text, expected)
+
+
+class PostRevisionTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='auth')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test_slug',
+            description='Тестовое описание',
+        )
+
+    def test_edits_are_restorable(self):
+        """Каждую прошлую версию текста можно восстановить."""
+        texts = [
+            'Первая версия довольно длинного тестового поста.',
+            'Первая версия довольно длинного тестового поста. Дополнение.',
+            'Вторая редакция довольно длинного поста. Дополнение.',
+            'Совсем другой текст',
+        ]
+        post = Post.objects.create(author=self.user, text=texts[0])
+        for text in texts[1:]:
+            post.text = text
+            post.save()
+        post.refresh_from_db()
+        self.assertEqual(post.version, len(texts))
+        self.assertEqual(post.revisions.count(), len(texts) - 1)
+        for version, text in enumerate(texts, start=1):
+            with self.subTest(version=version):
+                self.assertEqual(text_at(post, version), text)
+
+    def test_delta_is_smaller_than_text(self):
+        """Мелкая правка длинного текста хранится короче самого текста."""
+        text = 'Длинный абзац текста. ' * 50
+        post = Post.objects.create(author=self.user, text=text)
+        post.text = text + 'Правка.'
+        post.save()
+        self.assertLess(len(post.revisions.get().diff), len(text) // 10)
+
+    def test_long_text_stored_whole(self):
+        """Для длинного текста хранится старая версия целиком."""
+        text = 'Очень длинный пост. ' * 1000
+        post = Post.objects.create(author=self.user, text=text)
+        post.text = text + 'Правка.'
+        post.save()
+        self.assertIn(text, json.loads(post.revisions.get().diff))
+        self.assertEqual(text_at(post, 1), text)
+
+    def test_version_bumps_only_on_change(self):
+        """Версия растёт только при изменении поста."""
+        post = Post.objects.create(author=self.user, text='Тестовый пост')
+        post.save()
+        self.assertEqual(post.version, 1)
+        post.group = self.group
+        post.save()
+        self.assertEqual(post.version, 2)
+        self.assertFalse(PostRevision.objects.filter(post=post).exists())
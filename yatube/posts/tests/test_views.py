@@ -1,16 +1,34 @@
+from array import array
 import shutil
 import tempfile
+from datetime import timedelta
 from http import HTTPStatus
+from io import StringIO
 
 from django.conf import settings
 from django.contrib.auth import get_user_model
 from django.core.cache import cache
 from django.core.files.uploadedfile import SimpleUploadedFile
-from django.test import Client, TestCase
+from django.core.management import call_command
+from django.db import connection
+from django.test import (
+    Client, TestCase, TransactionTestCase, override_settings
+)
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
+from django.utils import timezone
 
+from ..follow_index import VERSION_KEY, follow_graph, publish
 from ..forms import PostForm
-from ..models import Post, Group, Comment, Follow
+from ..group_cache import get_group
+from ..moderation import delete_comments
+from ..models import (
+    ArchivedComment, ArchivedPost, Comment, Follow, FollowSuggestion, Group,
+    Post, PostRank
+)
+from ..ranking import recompute_ranks
+from ..revisions import text_at
+from ..recommendations import rebuild_suggestions
 
 User = get_user_model()
 
@@ -348,3 +366,524 @@ class FollowViewsTest(TestCase):
             len(response_new.context.get('page_obj').object_list), 0
         )
         self.assertNotIn(new_post, new_posts)
+
+
+class GroupCacheTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='test_user')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test_slug',
+            description='Тестовое описание',
+        )
+        Post.objects.create(author=cls.author, group=cls.group, text='Пост')
+
+    def setUp(self):
+        cache.clear()
+
+    def test_group_directory_served_from_cache(self):
+        """Список групп после прогрева не обращается к БД."""
+        url = reverse('posts:group_index')
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        self.assertEqual(response.context['groups'][0].post_count, 1)
+        with self.assertNumQueries(0):
+            self.client.get(url)
+
+    def test_post_create_updates_cached_metadata(self):
+        """Новый пост увеличивает закэшированное число постов группы."""
+        self.client.get(reverse('posts:group_index'))
+        post = Post.objects.create(
+            author=self.author, group=self.group, text='Новый пост'
+        )
+        response = self.client.get(reverse('posts:group_index'))
+        group = response.context['groups'][0]
+        self.assertEqual(group.post_count, 2)
+        self.assertEqual(group.last_activity, post.pub_date)
+
+    def test_post_move_and_group_edit_invalidate_cache(self):
+        """Перенос поста и правка группы сбрасывают кэш."""
+        url = reverse('posts:group_list', args=(self.group.slug,))
+        self.client.get(url)
+        Post.objects.filter(group=self.group).first().delete()
+        response = self.client.get(url)
+        self.assertEqual(response.context['group'].post_count, 0)
+        self.group.title = 'Новое название'
+        self.group.save()
+        response = self.client.get(url)
+        self.assertEqual(response.context['group'].title, 'Новое название')
+
+    def test_group_page_queries(self):
+        """Страница группы не запрашивает группу для каждого поста."""
+        Post.objects.bulk_create(
+            Post(author=self.author, group=self.group, text=f'Пост {num}')
+            for num in range(5)
+        )
+        # Группа, число горячих и архивных постов, страница постов.
+        with self.assertNumQueries(4):
+            self.client.get(
+                reverse('posts:group_list', args=(self.group.slug,))
+            )
+
+    def test_unknown_group_returns_404(self):
+        """Несуществующая группа отдаёт 404."""
+        response = self.client.get(
+            reverse('posts:group_list', args=('unknown',))
+        )
+        self.assertEqual(response.status_code, HTTPStatus.NOT_FOUND)
+
+
+class TopPostsTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='test_author')
+        cls.reader = User.objects.create_user(username='test_reader')
+        cls.old_post = Post.objects.create(author=cls.author, text='Старый')
+        cls.new_post = Post.objects.create(author=cls.author, text='Новый')
+
+    def top_posts(self):
+        response = self.client.get(reverse('posts:top_posts'))
+        return list(response.context['page_obj'])
+
+    def test_new_post_ranked_on_create(self):
+        """Новый пост сразу попадает в популярное."""
+        self.assertEqual(PostRank.objects.count(), 2)
+        self.assertEqual(self.top_posts(), [self.new_post, self.old_post])
+
+    def test_comments_raise_post(self):
+        """Комментарии поднимают пост в популярном."""
+        for num in range(5):
+            Comment.objects.create(
+                post=self.old_post, author=self.reader, text=f'К{num}'
+            )
+        self.assertEqual(self.top_posts()[0], self.old_post)
+
+    def test_batch_recompute_matches_incremental(self):
+        """Пакетный пересчёт совпадает с инкрементальным обновлением."""
+        Follow.objects.create(user=self.reader, author=self.author)
+        post = Post.objects.create(author=self.author, text='Третий')
+        Comment.objects.create(post=post, author=self.reader, text='К')
+        incremental = dict(PostRank.objects.values_list('post_id', 'score'))
+        self.assertEqual(recompute_ranks(), 3)
+        batch = dict(PostRank.objects.values_list('post_id', 'score'))
+        self.assertAlmostEqual(incremental[post.pk], batch[post.pk])
+
+    def test_batch_recompute_in_batches(self):
+        """Пересчёт пачками даёт тот же рейтинг, что и одной пачкой."""
+        Comment.objects.create(
+            post=self.old_post, author=self.reader, text='К'
+        )
+        PostRank.objects.filter(post=self.new_post).delete()
+        self.assertEqual(recompute_ranks(), 2)
+        whole = dict(PostRank.objects.values_list('post_id', 'score'))
+        self.assertEqual(recompute_ranks(batch_size=1), 2)
+        batched = dict(PostRank.objects.values_list('post_id', 'score'))
+        self.assertEqual(whole.keys(), batched.keys())
+        for post_id, score in whole.items():
+            self.assertAlmostEqual(score, batched[post_id])
+
+    @override_settings(RANKING_COMMENT_WEIGHT=0)
+    def test_zero_comment_weight(self):
+        """Нулевой вес комментариев не ломает рейтинг."""
+        Comment.objects.create(
+            post=self.old_post, author=self.reader, text='К'
+        )
+        self.assertEqual(recompute_ranks(), 2)
+        self.assertEqual(self.top_posts(), [self.new_post, self.old_post])
+
+
+class FollowSuggestionsTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.users = {
+            name: User.objects.create_user(username=name)
+            for name in ('anna', 'boris', 'clara', 'denis', 'elena')
+        }
+        for user, author in (
+            ('anna', 'boris'),
+            ('boris', 'clara'),
+            ('denis', 'boris'),
+            ('denis', 'elena'),
+            ('denis', 'clara'),
+        ):
+            Follow.objects.create(
+                user=cls.users[user], author=cls.users[author]
+            )
+
+    def suggestions(self, name):
+        return list(
+            self.users[name].follow_suggestions.values_list(
+                'author__username', 'score'
+            )
+        )
+
+    def test_friends_of_friends_and_cofollows(self):
+        """Друзья друзей весят больше соподписок, подписки исключены."""
+        rebuild_suggestions(top_k=5, cofollow_weight=0.5)
+        self.assertEqual(
+            self.suggestions('anna'), [('clara', 1.5), ('elena', 0.5)]
+        )
+        self.assertNotIn(
+            'boris', [name for name, _ in self.suggestions('anna')]
+        )
+
+    def test_top_k_limit(self):
+        """На пользователя хранится не больше top_k рекомендаций."""
+        rebuild_suggestions(top_k=1, cofollow_weight=0.5)
+        self.assertEqual(self.suggestions('anna'), [('clara', 1.5)])
+
+    def test_followed_authors_beyond_fanout_excluded(self):
+        """Подписки за пределами max_fanout тоже не рекомендуются."""
+        rebuild_suggestions(top_k=5, cofollow_weight=0.5, max_fanout=1)
+        self.assertNotIn(
+            'clara', [name for name, _ in self.suggestions('denis')]
+        )
+
+    def test_rebuild_in_batches_replaces_suggestions(self):
+        """Пересчёт пачками заменяет старые рекомендации всех пользователей."""
+        FollowSuggestion.objects.create(
+            user=self.users['elena'], author=self.users['anna'], score=9
+        )
+        rebuild_suggestions(top_k=5, cofollow_weight=0.5, batch_size=1)
+        self.assertEqual(self.suggestions('elena'), [])
+        self.assertEqual(
+            self.suggestions('anna'), [('clara', 1.5), ('elena', 0.5)]
+        )
+
+    def test_profile_shows_suggestions(self):
+        """Профиль показывает рекомендации текущему пользователю."""
+        rebuild_suggestions(top_k=5, cofollow_weight=0.5)
+        self.client.force_login(self.users['anna'])
+        response = self.client.get(
+            reverse('posts:profile', args=('boris',))
+        )
+        self.assertEqual(
+            [item.author for item in response.context['suggestions']],
+            [self.users['clara'], self.users['elena']],
+        )
+
+
+class FollowIndexTest(TransactionTestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.wait_for_rebuild()
+        self.addCleanup(follow_graph.reset)
+        self.author = User.objects.create_user(username='test_author')
+        self.reader = User.objects.create_user(username='test_reader')
+        self.client.force_login(self.reader)
+        follow_graph.build()
+
+    def wait_for_rebuild(self):
+        if follow_graph.thread is not None:
+            follow_graph.thread.join()
+
+    def test_follow_and_unfollow_update_index(self):
+        """Подписка и отписка сразу отражаются в индексе."""
+        self.assertFalse(
+            follow_graph.is_following(self.reader.pk, self.author.pk)
+        )
+        self.client.get(
+            reverse('posts:profile_follow', args=(self.author.username,))
+        )
+        self.assertTrue(
+            follow_graph.is_following(self.reader.pk, self.author.pk)
+        )
+        self.assertEqual(
+            follow_graph.followers_of(self.author.pk), [self.reader.pk]
+        )
+        self.assertEqual(
+            follow_graph.followees_of(self.reader.pk), [self.author.pk]
+        )
+        self.client.get(
+            reverse('posts:profile_unfollow', args=(self.author.username,))
+        )
+        self.assertFalse(
+            follow_graph.is_following(self.reader.pk, self.author.pk)
+        )
+
+    def test_profile_checks_follow_without_db(self):
+        """Профиль узнаёт о подписке из индекса, а не из БД."""
+        Follow.objects.create(user=self.reader, author=self.author)
+        url = reverse('posts:profile', args=(self.author.username,))
+        self.client.get(url)
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        self.assertTrue(response.context['following'])
+        # Остаются только подсчёты подписок для шапки профиля.
+        self.assertFalse([
+            q for q in queries
+            if 'FROM "posts_follow"' in q['sql'] and 'COUNT' not in q['sql']
+        ])
+
+    def test_write_in_other_process_is_replayed(self):
+        """Чужая запись применяется из журнала без прохода по таблице."""
+        follow_graph.is_following(self.reader.pk, self.author.pk)
+        Follow.objects.bulk_create(
+            [Follow(user=self.reader, author=self.author)]
+        )
+        publish('add', self.reader.pk, self.author.pk)
+        thread = follow_graph.thread
+        with self.assertNumQueries(0):
+            self.assertTrue(
+                follow_graph.is_following(self.reader.pk, self.author.pk)
+            )
+        self.assertIs(follow_graph.thread, thread)
+
+    def test_lost_change_rebuilds_in_background(self):
+        """Пропуск в журнале перестраивает индекс в фоне."""
+        follow_graph.is_following(self.reader.pk, self.author.pk)
+        Follow.objects.bulk_create(
+            [Follow(user=self.reader, author=self.author)]
+        )
+        cache.set(VERSION_KEY, (cache.get(VERSION_KEY) or 0) + 1, None)
+        publish('add', self.author.pk, self.reader.pk)
+        follow_graph.is_following(self.reader.pk, self.author.pk)
+        self.wait_for_rebuild()
+        self.assertTrue(
+            follow_graph.is_following(self.reader.pk, self.author.pk)
+        )
+
+    def test_unbuilt_index_answers_from_db(self):
+        """Пока индекс строится, ответ берётся из БД."""
+        Follow.objects.bulk_create(
+            [Follow(user=self.reader, author=self.author)]
+        )
+        follow_graph.reset()
+        self.assertTrue(
+            follow_graph.is_following(self.reader.pk, self.author.pk)
+        )
+        self.assertEqual(
+            follow_graph.followees_of(self.reader.pk), [self.author.pk]
+        )
+        self.wait_for_rebuild()
+        self.assertTrue(follow_graph.ready)
+
+    def test_repeated_follow_keeps_index(self):
+        """Повторная подписка не меняет версию индекса."""
+        url = reverse('posts:profile_follow', args=(self.author.username,))
+        self.client.get(url)
+        version = cache.get(VERSION_KEY)
+        self.client.get(url)
+        self.assertEqual(cache.get(VERSION_KEY), version)
+        self.assertTrue(follow_graph.ready)
+
+    def test_index_expires_without_version_change(self):
+        """Запись мимо сигналов видна после FOLLOW_INDEX_TIMEOUT."""
+        follow_graph.is_following(self.reader.pk, self.author.pk)
+        Follow.objects.bulk_create(
+            [Follow(user=self.reader, author=self.author)]
+        )
+        self.assertFalse(
+            follow_graph.is_following(self.reader.pk, self.author.pk)
+        )
+        with override_settings(FOLLOW_INDEX_TIMEOUT=0):
+            follow_graph.is_following(self.reader.pk, self.author.pk)
+            self.wait_for_rebuild()
+        self.assertTrue(
+            follow_graph.is_following(self.reader.pk, self.author.pk)
+        )
+
+    def test_follow_ignores_stale_index(self):
+        """Устаревший индекс не мешает подписаться."""
+        follow_graph.is_following(self.reader.pk, self.author.pk)
+        follow_graph.followees[self.reader.pk] = array('q', [self.author.pk])
+        self.client.get(
+            reverse('posts:profile_follow', args=(self.author.username,))
+        )
+        self.assertTrue(
+            Follow.objects.filter(user=self.reader, author=self.author)
+            .exists()
+        )
+
+
+class PostDetailETagTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+        cls.post = Post.objects.create(author=cls.author, text='Тестовый пост')
+
+    def setUp(self):
+        self.client = Client()
+        self.client.force_login(self.author)
+        self.url = reverse('posts:post_detail', args=(self.post.pk,))
+
+    def test_not_modified_until_edit(self):
+        """Страница поста отдаёт 304, пока пост и комментарии не менялись."""
+        etag = self.client.get(self.url)['ETag']
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, HTTPStatus.NOT_MODIFIED)
+        self.client.post(
+            reverse('posts:post_edit', args=(self.post.pk,)),
+            {'text': 'Исправленный пост'},
+        )
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        self.assertNotEqual(response['ETag'], etag)
+        etag = response['ETag']
+        Comment.objects.create(post=self.post, author=self.author, text='Ок')
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+
+    def test_related_changes_change_etag(self):
+        """Имя автора, его новые посты и удаление комментариев меняют ETag."""
+        reader = User.objects.create_user(username='reader')
+        Comment.objects.create(post=self.post, author=reader, text='Ок')
+        changes = (
+            lambda: User.objects.filter(pk=self.author.pk).update(
+                first_name='Лев'
+            ),
+            lambda: Post.objects.create(author=self.author, text='Ещё'),
+            lambda: delete_comments(Comment.objects.filter(author=reader)),
+        )
+        for change in changes:
+            etag = self.client.get(self.url)['ETag']
+            change()
+            response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+            self.assertEqual(response.status_code, HTTPStatus.OK)
+
+    def test_not_modified_costs_one_query(self):
+        """Ответ 304 читает из БД только строку поста."""
+        client = Client()
+        etag = client.get(self.url)['ETag']
+        with self.assertNumQueries(1):
+            response = client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, HTTPStatus.NOT_MODIFIED)
+
+    def test_etag_ignores_csrf_cookie(self):
+        """CSRF-кука не попадает в ETag."""
+        etag = self.client.get(self.url)['ETag']
+        self.client.cookies[settings.CSRF_COOKIE_NAME] = 'x' * 64
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, HTTPStatus.NOT_MODIFIED)
+
+
+class ArchiveTest(TestCase):
+    HOT_POSTS: int = 12
+    OLD_POSTS: int = 5
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test_slug',
+            description='Тестовое описание',
+        )
+        Post.objects.bulk_create(
+            Post(text=f'Пост {num}', author=cls.author, group=cls.group)
+            for num in range(cls.HOT_POSTS + cls.OLD_POSTS)
+        )
+        cls.old_ids = list(Post.objects.order_by('pk').values_list(
+            'pk', flat=True
+        )[:cls.OLD_POSTS])
+        Post.objects.filter(pk__in=cls.old_ids).update(
+            pub_date=timezone.now() - timedelta(
+                days=settings.ARCHIVE_AFTER_DAYS + 1
+            )
+        )
+        Comment.objects.create(
+            post_id=cls.old_ids[0], author=cls.author, text='Архивный'
+        )
+
+    def setUp(self):
+        cache.clear()
+        call_command('archive_posts', batch_size=2, stdout=StringIO())
+        self.client = Client()
+
+    def test_posts_moved_to_archive(self):
+        """Старые посты и их комментарии переносятся в архив."""
+        self.assertFalse(Post.objects.filter(pk__in=self.old_ids).exists())
+        self.assertEqual(
+            set(ArchivedPost.objects.values_list('pk', flat=True)),
+            set(self.old_ids),
+        )
+        self.assertEqual(
+            ArchivedComment.objects.get().post_id, self.old_ids[0]
+        )
+
+    def test_first_page_skips_archive(self):
+        """Первая страница ленты не читает архив."""
+        urls = (
+            reverse('posts:index'),
+            reverse('posts:group_list', args=(self.group.slug,)),
+            reverse('posts:profile', args=(self.author.username,)),
+        )
+        for url in urls:
+            with self.subTest(url=url):
+                self.client.get(url)
+                with CaptureQueriesContext(connection) as queries:
+                    response = self.client.get(url)
+                self.assertEqual(
+                    response.context['page_obj'].paginator.count,
+                    self.HOT_POSTS + self.OLD_POSTS,
+                )
+                self.assertFalse([
+                    q for q in queries if 'posts_archivedpost' in q['sql']
+                ])
+
+    def test_group_count_includes_archive(self):
+        """Число постов группы учитывает архивные посты."""
+        self.assertEqual(
+            get_group(self.group.slug).post_count,
+            self.HOT_POSTS + self.OLD_POSTS,
+        )
+
+    def test_last_page_continues_into_archive(self):
+        """Последняя страница ленты дочитывает архив."""
+        response = self.client.get(reverse('posts:index') + '?page=2')
+        page = response.context['page_obj']
+        self.assertEqual(
+            [post.pk for post in page],
+            list(Post.objects.values_list('pk', flat=True)[
+                settings.POSTS_PER_PAGE:
+            ]) + list(ArchivedPost.objects.values_list('pk', flat=True)),
+        )
+
+    def test_archived_post_detail(self):
+        """Страница архивного поста открывается по прежнему адресу."""
+        response = self.client.get(
+            reverse('posts:post_detail', args=(self.old_ids[0],))
+        )
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        self.assertContains(response, 'Архивный')
+
+    def archive(self, post):
+        Post.objects.filter(pk=post.pk).update(
+            pub_date=timezone.now() - timedelta(
+                days=settings.ARCHIVE_AFTER_DAYS + 1
+            )
+        )
+        call_command('archive_posts', stdout=StringIO())
+
+    def test_new_post_does_not_reuse_archived_id(self):
+        """Новый пост не получает id самого нового архивного."""
+        newest = Post.objects.latest('pk')
+        self.archive(newest)
+        # Так счётчик id сбрасывает миграция, пересоздающая таблицу.
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "UPDATE sqlite_sequence SET seq = "
+                "(SELECT MAX(id) FROM posts_post) WHERE name = 'posts_post'"
+            )
+        post = Post.objects.create(author=self.author, text='Новый')
+        self.assertGreater(post.pk, newest.pk)
+        response = self.client.get(
+            reverse('posts:post_detail', args=(newest.pk,))
+        )
+        self.assertContains(response, newest.text)
+
+    def test_revisions_moved_to_archive(self):
+        """История правок переезжает в архив вместе с постом."""
+        post = Post.objects.create(author=self.author, text='Первая версия')
+        post.text = 'Вторая версия'
+        post.save()
+        self.archive(post)
+        archived = ArchivedPost.objects.get(pk=post.pk)
+        self.assertEqual(text_at(archived, 1), 'Первая версия')
+        self.assertEqual(text_at(archived, 2), 'Вторая версия')
@@ -1,20 +1,60 @@
+import hashlib
+from zlib import crc32
+
+from django.conf import settings
 from django.contrib.auth.decorators import login_required
+from django.core.cache import cache
+from django.db.models import Count, IntegerField, OuterRef, Subquery
+from django.http import Http404
 from django.shortcuts import get_object_or_404, redirect, render
+from django.views.decorators.http import condition
+
+from core.db_router import replica_reads
+from core.ratelimit import ratelimit
 
+from .archive import TieredPosts, get_post_or_404
+from .comment_buffer import comment_buffer, pending_comments, pending_key
+from .follow_index import follow_graph
 from .forms import PostForm, CommentForm
-from .models import Group, Post, User, Follow
+from .group_cache import get_group, group_directory
+from .models import ArchivedPost, Post, User, Follow
 from .utils import pagination
 
 
+@replica_reads
 def index(request):
-    posts = Post.objects.select_related('author', 'group').all()
+    posts = TieredPosts(
+        Post.objects.select_related('author', 'group'),
+        ArchivedPost.objects.select_related('author', 'group'),
+        'all',
+    )
     context = {'page_obj': pagination(posts, request)}
     return render(request, 'posts/index.html', context)
 
 
+@replica_reads
+def top_posts(request):
+    posts = Post.objects.filter(rank__isnull=False).select_related(
+        'author', 'group'
+    ).order_by('-rank__score')
+    context = {'page_obj': pagination(posts, request), 'top': True}
+    return render(request, 'posts/top.html', context)
+
+
+@replica_reads
 def group_posts(request, slug):
-    group = get_object_or_404(Group, slug=slug)
-    posts = group.posts.select_related('author').all()
+    group = get_group(slug)
+    if group is None:
+        raise Http404('Группа не найдена')
+    posts = TieredPosts(
+        Post.objects.filter(group_id=group.pk).select_related(
+            'author', 'group'
+        ),
+        ArchivedPost.objects.filter(group_id=group.pk).select_related(
+            'author', 'group'
+        ),
+        f'group:{group.pk}',
+    )
 
     context = {
         'group': group,
@@ -23,27 +63,76 @@ def group_posts(request, slug):
     return render(request, 'posts/group_list.html', context)
 
 
+@replica_reads
+def group_index(request):
+    context = {'groups': group_directory()}
+    return render(request, 'posts/groups.html', context)
+
+
+@replica_reads
 def profile(request, username):
     author = get_object_or_404(User, username=username)
-    posts = author.posts.select_related('group').all()
+    posts = TieredPosts(
+        author.posts.select_related('group'),
+        author.archived_posts.select_related('group'),
+        f'author:{author.pk}',
+    )
     follow_count = author.follower.all().count()
-    following = request.user.is_authenticated and Follow.objects.filter(
-        user=request.user,
-        author=author
-    ).exists()
+    following = request.user.is_authenticated and follow_graph.is_following(
+        request.user.pk, author.pk
+    )
+    suggestions = (
+        request.user.follow_suggestions.select_related('author')[
+            :settings.FOLLOW_SUGGESTIONS
+        ] if request.user.is_authenticated else ()
+    )
     context = {
         'author': author,
         'page_obj': pagination(posts, request),
         'following': following,
-        'follow_count': follow_count
+        'follow_count': follow_count,
+        'suggestions': suggestions,
     }
     return render(request, 'posts/profile.html', context)
 
 
+def post_detail_etag(request, post_id):
+    """ETag страницы поста: время изменения поста, автор и зритель.
+
+    updated_at меняется при правке поста и при записи или удалении его
+    комментариев, поэтому всё нужное читается одним запросом вместе с
+    постом. Переименование комментатора ETag не меняет.
+
+    CSRF-токен в валидатор не входит: маска у него своя на каждый ответ,
+    а секрет при входе меняется вместе с пользователем.
+    """
+    author_posts = Post.objects.filter(
+        author_id=OuterRef('author_id')
+    ).order_by().values('author_id').annotate(count=Count('pk'))
+    state = Post.objects.filter(pk=post_id).values_list(
+        'updated_at', 'author__username', 'author__first_name',
+        'author__last_name',
+    ).annotate(
+        author_posts=Subquery(
+            author_posts.values('count'), output_field=IntegerField()
+        )
+    ).first()
+    if state is None:
+        return None
+    pending = len(cache.get(pending_key(post_id, request.user.pk), ()))
+    return hashlib.md5(
+        repr((state, pending, request.user.pk)).encode()
+    ).hexdigest()
+
+
+@replica_reads
+@condition(etag_func=post_detail_etag)
 def post_detail(request, post_id):
-    post = get_object_or_404(Post, pk=post_id)
+    post = get_post_or_404(post_id)
     form = CommentForm()
-    comments = post.comments.all()
+    comments = pending_comments(post, request.user) + list(
+        post.comments.select_related('author')
+    )
     context = {
         'post': post,
         'comments': comments,
@@ -53,8 +142,13 @@ def post_detail(request, post_id):
 
 
 @login_required
+@ratelimit('post_create')
 def post_create(request):
-    form = PostForm(request.POST or None, files=request.FILES or None)
+    form = PostForm(
+        request.POST or None,
+        files=request.FILES or None,
+        author=request.user,
+    )
     if not form.is_valid() or request.method == 'GET':
         return render(request, 'posts/create_post.html', {'form': form})
     post = form.save(commit=False)
@@ -73,13 +167,14 @@ def post_edit(request, post_id):
         files=request.FILES or None,
         instance=post
     )
-    if form.is_valid() or request.method == "POST":
+    if form.is_valid():
         form.save()
         return redirect('posts:post_detail', post_id)
     return render(request, 'posts/create_post.html', {'form': form})
 
 
 @login_required
+@ratelimit('add_comment')
 def add_comment(request, post_id):
     post = get_object_or_404(Post, pk=post_id)
     form = CommentForm(request.POST or None)
@@ -87,13 +182,27 @@ def add_comment(request, post_id):
         comment = form.save(commit=False)
         comment.author = request.user
         comment.post = post
-        comment.save()
+        if settings.COMMENTS_WRITE_BEHIND:
+            comment_buffer.put(comment)
+        else:
+            comment.save()
     return redirect('posts:post_detail', post_id=post_id)
 
 
+@replica_reads
 @login_required
 def follow_index(request):
-    posts = Post.objects.filter(author__following__user=request.user)
+    # Набор подписок входит в ключ: после подписки счётчик архива иной.
+    followees = sorted(follow_graph.followees_of(request.user.pk))
+    posts = TieredPosts(
+        Post.objects.filter(
+            author__following__user=request.user
+        ).select_related('author', 'group'),
+        ArchivedPost.objects.filter(
+            author__following__user=request.user
+        ).select_related('author', 'group'),
+        f'follow:{request.user.pk}:{crc32(str(followees).encode())}',
+    )
     context = {
         'page_obj': pagination(posts, request)
     }
@@ -101,14 +210,15 @@ def follow_index(request):
 
 
 @login_required
+# Подписка выполняется по ссылке, то есть GET-запросом.
+@ratelimit('profile_follow', methods=('GET', 'POST'))
 def profile_follow(request, username):
     author = get_object_or_404(User, username=username)
     if author == request.user:
         return redirect('posts:profile', username=username)
-    follower = Follow.objects.filter(user=request.user, author=author).exists()
-    if follower is True:
-        return redirect('posts:profile', username=username)
-    Follow.objects.create(user=request.user, author=author)
+    # Запись решается по БД: индекс другого процесса мог отстать. Индекс
+    # обновляет сигнал, и только если строка действительно добавлена.
+    Follow.objects.get_or_create(user=request.user, author=author)
     return redirect('posts:profile', username=username)
 
 
@@ -1,6 +1,9 @@
-from django.contrib.auth.forms import UserCreationForm
+from django import forms
+from django.contrib.auth.forms import AuthenticationForm, UserCreationForm
 from django.contrib.auth import get_user_model
 
+from . import throttle
+
 User = get_user_model()
 
 
@@ -8,3 +11,29 @@ class CreationForm(UserCreationForm):
     class Meta(UserCreationForm.Meta):
         model = User
         fields = ('first_name', 'last_name', 'username', 'email')
+
+
+class LoginForm(AuthenticationForm):
+    error_messages = {
+        **AuthenticationForm.error_messages,
+        'throttled': 'Слишком много попыток входа. Попробуйте позже.',
+    }
+
+    def clean(self):
+        username = self.cleaned_data.get('username')
+        # Проверяем лимит до authenticate(), чтобы не тратить CPU на хеш.
+        if throttle.is_blocked(self.request, username):
+            raise forms.ValidationError(
+                self.error_messages['throttled'],
+                code='throttled',
+            )
+        throttle.register_attempt(self.request)
+        try:
+            cleaned_data = super().clean()
+        except forms.ValidationError:
+            if username:
+                throttle.register_failure(self.request, username)
+            raise
+        if username:
+            throttle.reset(self.request, username)
+        return cleaned_data
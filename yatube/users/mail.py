@@ -0,0 +1,183 @@
+import base64
+import json
+import uuid
+from datetime import timedelta
+from email.mime.base import MIMEBase
+
+from django.conf import settings
+from django.core.mail import EmailMultiAlternatives, get_connection
+from django.core.mail.backends.base import BaseEmailBackend
+from django.db import connection as db_connection, transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from core.jobs import enqueue
+
+from .models import OutboxMessage
+
+
+class OutboxEmailBackend(BaseEmailBackend):
+    """Кладёт письма в очередь, отправкой занимается send_outbox."""
+
+    def send_messages(self, email_messages):
+        now = timezone.now()
+        OutboxMessage.objects.bulk_create(
+            to_outbox(message, now) for message in email_messages
+        )
+        # Доставка уходит в фоновую задачу; send_outbox по-прежнему
+        # подбирает письма, отложенные после ошибок.
+        enqueue(send_batch)
+        return len(email_messages)
+
+
+def html_alternative(message):
+    for content, mimetype in getattr(message, 'alternatives', ()):
+        if mimetype == 'text/html':
+            return content
+    return ''
+
+
+def dump_attachment(attachment):
+    if isinstance(attachment, MIMEBase):
+        attachment = (
+            attachment.get_filename(),
+            attachment.get_payload(decode=True),
+            attachment.get_content_type(),
+        )
+    filename, content, mimetype = attachment
+    if isinstance(content, str):
+        content = content.encode()
+    return [filename, base64.b64encode(content).decode(), mimetype]
+
+
+def to_outbox(message, now):
+    """OutboxMessage со всеми частями письма: адресами, заголовками и
+    вложениями, чтобы build_message собрал его без потерь."""
+    return OutboxMessage(
+        subject=message.subject,
+        body=message.body,
+        html_body=html_alternative(message),
+        from_email=message.from_email,
+        recipients='\n'.join(message.recipients()),
+        to='\n'.join(message.to),
+        cc='\n'.join(message.cc),
+        bcc='\n'.join(message.bcc),
+        reply_to='\n'.join(message.reply_to),
+        headers=json.dumps(message.extra_headers),
+        attachments=json.dumps(
+            [dump_attachment(item) for item in message.attachments]
+        ),
+        next_attempt=now,
+    )
+
+
+def build_message(outbox_message, connection):
+    # В письмах, поставленных до появления поля to, адреса только в
+    # recipients.
+    to = outbox_message.to or (
+        '' if outbox_message.cc or outbox_message.bcc
+        else outbox_message.recipients
+    )
+    message = EmailMultiAlternatives(
+        subject=outbox_message.subject,
+        body=outbox_message.body,
+        from_email=outbox_message.from_email,
+        to=to.splitlines(),
+        cc=outbox_message.cc.splitlines(),
+        bcc=outbox_message.bcc.splitlines(),
+        reply_to=outbox_message.reply_to.splitlines(),
+        headers=json.loads(outbox_message.headers),
+        connection=connection,
+    )
+    if outbox_message.html_body:
+        message.attach_alternative(outbox_message.html_body, 'text/html')
+    for filename, content, mimetype in json.loads(
+        outbox_message.attachments
+    ):
+        message.attach(filename, base64.b64decode(content), mimetype)
+    return message
+
+
+def postpone(outbox_message, error, now):
+    outbox_message.attempts += 1
+    outbox_message.last_error = repr(error)
+    outbox_message.next_attempt = now + timedelta(
+        seconds=settings.OUTBOX_RETRY_DELAY
+        * 2 ** (outbox_message.attempts - 1)
+    )
+
+
+def ready(now):
+    stale = now - timedelta(seconds=settings.OUTBOX_CLAIM_TIMEOUT)
+    return OutboxMessage.objects.filter(
+        Q(claimed_at__isnull=True) | Q(claimed_at__lt=stale),
+        sent__isnull=True,
+        attempts__lt=settings.OUTBOX_MAX_ATTEMPTS,
+        next_attempt__lte=now,
+    )
+
+
+def claim(limit, now):
+    """Забирает до limit писем в отправку, как core.jobs.claim задачи.
+
+    Параллельные send_batch (задачи run_jobs и send_outbox) получают
+    разные письма, и ни одно не уходит дважды.
+    """
+    token = uuid.uuid4().hex
+    if db_connection.features.has_select_for_update_skip_locked:
+        with transaction.atomic():
+            ids = list(
+                ready(now).select_for_update(skip_locked=True)
+                .values_list('pk', flat=True)[:limit]
+            )
+            OutboxMessage.objects.filter(pk__in=ids).update(
+                claim=token, claimed_at=now
+            )
+    else:
+        # Условия повторяются во внешнем UPDATE: письмо, которое успел
+        # забрать другой отправитель, под них уже не подходит.
+        ready(now).filter(
+            pk__in=ready(now).order_by('pk').values('pk')[:limit]
+        ).update(claim=token, claimed_at=now)
+    return list(OutboxMessage.objects.filter(claim=token))
+
+
+def send_batch(batch_size=None):
+    """Отправляет одну пачку писем через одно соединение.
+
+    Возвращает пару (отправлено, отложено до следующей попытки).
+    """
+    now = timezone.now()
+    batch = claim(batch_size or settings.OUTBOX_BATCH_SIZE, now)
+    if not batch:
+        return 0, 0
+    sent_ids = []
+    failed = []
+    connection = get_connection(settings.OUTBOX_DELIVERY_BACKEND)
+    try:
+        connection.open()
+    except Exception as error:
+        # Сервер недоступен: вся пачка ждёт следующей попытки.
+        for outbox_message in batch:
+            postpone(outbox_message, error, now)
+        failed = batch
+    else:
+        try:
+            for outbox_message in batch:
+                try:
+                    build_message(outbox_message, connection).send()
+                except Exception as error:
+                    postpone(outbox_message, error, now)
+                    failed.append(outbox_message)
+                else:
+                    sent_ids.append(outbox_message.pk)
+        finally:
+            connection.close()
+    OutboxMessage.objects.filter(pk__in=sent_ids).update(sent=now)
+    for outbox_message in failed:
+        outbox_message.claim, outbox_message.claimed_at = '', None
+    OutboxMessage.objects.bulk_update(
+        failed,
+        ('attempts', 'last_error', 'next_attempt', 'claim', 'claimed_at'),
+    )
+    return len(sent_ids), len(failed)
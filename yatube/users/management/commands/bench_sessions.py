@@ -0,0 +1,46 @@
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.test import Client, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+User = get_user_model()
+
+ENGINES = (
+    'django.contrib.sessions.backends.db',
+    'django.contrib.sessions.backends.cached_db',
+    'django.contrib.sessions.backends.signed_cookies',
+)
+PAGES = ('posts:follow_index', 'posts:post_create')
+
+
+class Command(BaseCommand):
+    help = 'Число запросов к БД на просмотр страницы для движков сессий.'
+
+    def count_queries(self, client, url):
+        with CaptureQueriesContext(connection) as queries:
+            client.get(url)
+        session_queries = [
+            query for query in queries
+            if 'django_session' in query['sql']
+        ]
+        return len(queries), len(session_queries)
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            user = User.objects.create_user(username='bench_sessions')
+            for engine in ENGINES:
+                with override_settings(SESSION_ENGINE=engine):
+                    client = Client()
+                    client.force_login(user)
+                    for name in PAGES:
+                        url = reverse(name)
+                        # Первый запрос прогревает кэш сессий.
+                        client.get(url)
+                        total, session = self.count_queries(client, url)
+                        self.stdout.write(
+                            f'{engine.rsplit(".", 1)[-1]} {name}: '
+                            f'{total} запросов, из них к сессиям {session}'
+                        )
+            transaction.set_rollback(True)
@@ -0,0 +1,24 @@
+from django.contrib.sessions.models import Session
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+
+class Command(BaseCommand):
+    help = 'Удаляет истёкшие сессии из БД пачками.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        expired = Session.objects.filter(expire_date__lt=timezone.now())
+        deleted = 0
+        while True:
+            # Короткие транзакции не держат блокировку записи SQLite.
+            keys = list(
+                expired.values_list('pk', flat=True)[:options['batch_size']]
+            )
+            if not keys:
+                break
+            Session.objects.filter(pk__in=keys).delete()
+            deleted += len(keys)
+        self.stdout.write(f'Удалено сессий: {deleted}')
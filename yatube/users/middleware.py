@@ -0,0 +1,41 @@
+from django.conf import settings
+from django.contrib import auth
+from django.contrib.auth.middleware import AuthenticationMiddleware
+from django.core.cache import cache
+from django.utils.crypto import constant_time_compare
+from django.utils.functional import SimpleLazyObject
+
+
+def user_cache_key(user_id):
+    return f'auth-user:{user_id}'
+
+
+def get_user(request):
+    """request.user из кэша, при промахе — из БД через auth.get_user."""
+    session = request.session
+    user_id = session.get(auth.SESSION_KEY)
+    session_hash = session.get(auth.HASH_SESSION_KEY)
+    backend_path = session.get(auth.BACKEND_SESSION_KEY)
+    if (
+        user_id and session_hash
+        and backend_path in settings.AUTHENTICATION_BACKENDS
+    ):
+        user = cache.get(user_cache_key(user_id))
+        # Хеш сессии зависит от пароля: сессии, открытые до его смены,
+        # не совпадут с закэшированным пользователем.
+        if user is not None and constant_time_compare(
+            session_hash, user.get_session_auth_hash()
+        ):
+            return user
+    user = auth.get_user(request)
+    if user.is_authenticated:
+        cache.set(
+            user_cache_key(user.pk), user, settings.USER_CACHE_TIMEOUT
+        )
+    return user
+
+
+class CachedAuthenticationMiddleware(AuthenticationMiddleware):
+    def process_request(self, request):
+        super().process_request(request)
+        request.user = SimpleLazyObject(lambda: get_user(request))
@@ -0,0 +1,48 @@
+# Generated by Django 2.2.16 on 2026-10-19 23:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='outboxmessage',
+            name='attachments',
+            field=models.TextField(default='[]', help_text='JSON: имя файла, содержимое в base64, тип', verbose_name='Вложения'),
+        ),
+        migrations.AddField(
+            model_name='outboxmessage',
+            name='bcc',
+            field=models.TextField(blank=True, verbose_name='Скрытая копия'),
+        ),
+        migrations.AddField(
+            model_name='outboxmessage',
+            name='cc',
+            field=models.TextField(blank=True, verbose_name='Копия'),
+        ),
+        migrations.AddField(
+            model_name='outboxmessage',
+            name='headers',
+            field=models.TextField(default='{}', help_text='JSON с дополнительными заголовками', verbose_name='Заголовки'),
+        ),
+        migrations.AddField(
+            model_name='outboxmessage',
+            name='reply_to',
+            field=models.TextField(blank=True, verbose_name='Ответить'),
+        ),
+        migrations.AddField(
+            model_name='outboxmessage',
+            name='to',
+            field=models.TextField(blank=True, help_text='По одному адресу на строку', verbose_name='Кому'),
+        ),
+        migrations.AlterField(
+            model_name='outboxmessage',
+            name='recipients',
+            field=models.TextField(help_text='Все адреса конверта (to, cc и bcc), по одному на строку', verbose_name='Получатели'),
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 2.2.16 on 2026-10-19 23:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0002_outbox_full_message'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='outboxmessage',
+            name='claim',
+            field=models.CharField(blank=True, db_index=True, max_length=32, verbose_name='Метка отправителя'),
+        ),
+        migrations.AddField(
+            model_name='outboxmessage',
+            name='claimed_at',
+            field=models.DateTimeField(blank=True, null=True, verbose_name='Взято в отправку'),
+        ),
+    ]
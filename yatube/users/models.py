@@ -0,0 +1,90 @@
+from django.db import models
+
+
+class OutboxMessage(models.Model):
+    subject = models.CharField(
+        'Тема',
+        max_length=255
+    )
+    body = models.TextField(
+        'Текст'
+    )
+    html_body = models.TextField(
+        'HTML-версия',
+        blank=True
+    )
+    from_email = models.CharField(
+        'Отправитель',
+        max_length=254
+    )
+    recipients = models.TextField(
+        'Получатели',
+        help_text='Все адреса конверта (to, cc и bcc), по одному на строку'
+    )
+    to = models.TextField(
+        'Кому',
+        blank=True,
+        help_text='По одному адресу на строку'
+    )
+    cc = models.TextField(
+        'Копия',
+        blank=True
+    )
+    bcc = models.TextField(
+        'Скрытая копия',
+        blank=True
+    )
+    reply_to = models.TextField(
+        'Ответить',
+        blank=True
+    )
+    headers = models.TextField(
+        'Заголовки',
+        default='{}',
+        help_text='JSON с дополнительными заголовками'
+    )
+    attachments = models.TextField(
+        'Вложения',
+        default='[]',
+        help_text='JSON: имя файла, содержимое в base64, тип'
+    )
+    created = models.DateTimeField(
+        'Создано',
+        auto_now_add=True
+    )
+    next_attempt = models.DateTimeField(
+        'Следующая попытка',
+        db_index=True
+    )
+    attempts = models.PositiveSmallIntegerField(
+        'Попыток',
+        default=0
+    )
+    sent = models.DateTimeField(
+        'Отправлено',
+        blank=True,
+        null=True
+    )
+    last_error = models.TextField(
+        'Последняя ошибка',
+        blank=True
+    )
+    claim = models.CharField(
+        'Метка отправителя',
+        max_length=32,
+        blank=True,
+        db_index=True
+    )
+    claimed_at = models.DateTimeField(
+        'Взято в отправку',
+        blank=True,
+        null=True
+    )
+
+    class Meta:
+        verbose_name = 'Письмо в очереди'
+        verbose_name_plural = 'Очередь писем'
+        ordering = ('pk',)
+
+    def __str__(self):
+        return f'{self.subject[:30]}'
@@ -0,0 +1,322 @@
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from http import HTTPStatus
+from io import StringIO
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.sessions.models import Session
+from django.core import mail
+from django.core.mail import EmailMessage
+from django.core.cache import cache
+from django.core.mail.backends.base import BaseEmailBackend
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from .mail import claim, send_batch
+from .models import OutboxMessage
+
+User = get_user_model()
+
+
+@override_settings(PBKDF2_ITERATIONS=1000)
+class LoginTests(TestCase):
+    PASSWORD = 'Str0ng-pass'
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(
+            username='test_user', password=cls.PASSWORD
+        )
+
+    def setUp(self):
+        cache.clear()
+
+    def login(self, password, ip='127.0.0.1'):
+        return self.client.post(
+            reverse('users:login'),
+            {'username': self.user.username, 'password': password},
+            REMOTE_ADDR=ip,
+        )
+
+    def test_password_rehashed_on_login(self):
+        """При смене параметров хешера пароль перехешируется при входе."""
+        with self.settings(PBKDF2_ITERATIONS=2000):
+            response = self.login(self.PASSWORD)
+        self.assertEqual(response.status_code, HTTPStatus.FOUND)
+        self.user.refresh_from_db()
+        self.assertTrue(self.user.password.startswith('pbkdf2_sha256$2000$'))
+
+    @override_settings(LOGIN_ATTEMPTS_PER_USERNAME=3)
+    def test_login_throttled_by_username(self):
+        """После исчерпания лимита вход блокируется даже с верным паролем."""
+        for _ in range(3):
+            self.assertEqual(self.login('wrong').status_code, HTTPStatus.OK)
+        response = self.login(self.PASSWORD)
+        self.assertEqual(
+            response.status_code, HTTPStatus.TOO_MANY_REQUESTS
+        )
+        self.assertNotIn('_auth_user_id', self.client.session)
+
+    @override_settings(LOGIN_ATTEMPTS_PER_USERNAME=3)
+    def test_username_lockout_does_not_block_owner(self):
+        """Чужие неудачные попытки не блокируют владельца с его IP."""
+        for _ in range(5):
+            self.login('wrong', ip='10.0.0.66')
+        self.assertEqual(
+            self.login('wrong', ip='10.0.0.66').status_code,
+            HTTPStatus.TOO_MANY_REQUESTS,
+        )
+        response = self.login(self.PASSWORD, ip='10.0.0.1')
+        self.assertEqual(response.status_code, HTTPStatus.FOUND)
+
+    @override_settings(LOGIN_ATTEMPTS_PER_IP=2)
+    def test_login_throttled_by_ip(self):
+        """Лимит по IP учитывает и успешные попытки."""
+        self.login(self.PASSWORD)
+        self.login(self.PASSWORD)
+        response = self.login(self.PASSWORD)
+        self.assertEqual(
+            response.status_code, HTTPStatus.TOO_MANY_REQUESTS
+        )
+
+    def test_success_resets_username_counter(self):
+        """Успешный вход сбрасывает счётчик неудач пользователя."""
+        with self.settings(LOGIN_ATTEMPTS_PER_USERNAME=2):
+            self.login('wrong')
+            self.login(self.PASSWORD)
+            self.client.logout()
+            self.login('wrong')
+            response = self.login(self.PASSWORD)
+        self.assertEqual(response.status_code, HTTPStatus.FOUND)
+
+
+class SessionTests(TestCase):
+
+    @override_settings(
+        SESSION_ENGINE='django.contrib.sessions.backends.cached_db'
+    )
+    def test_cached_session_skips_db(self):
+        """С cached_db просмотр страницы не читает django_session."""
+        user = User.objects.create_user(username='test_user')
+        self.client.force_login(user)
+        self.client.get(reverse('posts:follow_index'))
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(reverse('posts:follow_index'))
+        self.assertFalse(
+            [q for q in queries if 'django_session' in q['sql']]
+        )
+
+    def test_purge_sessions_removes_only_expired(self):
+        """purge_sessions удаляет пачками только истёкшие сессии."""
+        now = timezone.now()
+        for num in range(5):
+            Session.objects.create(
+                session_key=f'expired{num}',
+                session_data='',
+                expire_date=now - timedelta(days=1),
+            )
+        Session.objects.create(
+            session_key='alive',
+            session_data='',
+            expire_date=now + timedelta(days=1),
+        )
+        out = StringIO()
+        call_command('purge_sessions', batch_size=2, stdout=out)
+        self.assertIn('5', out.getvalue())
+        self.assertEqual(
+            list(Session.objects.values_list('pk', flat=True)), ['alive']
+        )
+
+
+class CachedUserTests(TestCase):
+    PASSWORD = 'Str0ng-pass'
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(
+            username='test_user', password=self.PASSWORD
+        )
+        self.client.force_login(self.user)
+
+    def auth_user_queries(self, url):
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(url)
+        return [q for q in queries if 'FROM "auth_user"' in q['sql']]
+
+    def test_user_loaded_from_cache(self):
+        """Повторный запрос не читает auth_user."""
+        url = reverse('posts:follow_index')
+        self.client.get(url)
+        self.assertFalse(self.auth_user_queries(url))
+
+    def test_profile_change_invalidates_cache(self):
+        """Сохранение пользователя сбрасывает кэш."""
+        url = reverse('posts:follow_index')
+        self.client.get(url)
+        self.user.first_name = 'Новое имя'
+        self.user.save()
+        self.assertTrue(self.auth_user_queries(url))
+        response = self.client.get(url)
+        self.assertEqual(response.context['user'].first_name, 'Новое имя')
+
+    def test_password_change_logs_out_other_sessions(self):
+        """После смены пароля старые сессии разлогиниваются."""
+        other_client = self.client_class()
+        other_client.force_login(self.user)
+        other_client.get(reverse('posts:follow_index'))
+        self.client.post(reverse('users:password_change'), {
+            'old_password': self.PASSWORD,
+            'new_password1': 'An0ther-pass',
+            'new_password2': 'An0ther-pass',
+        })
+        response = other_client.get(reverse('posts:follow_index'))
+        self.assertEqual(response.status_code, HTTPStatus.FOUND)
+        response = self.client.get(reverse('posts:follow_index'))
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+
+
+class FailingEmailBackend(BaseEmailBackend):
+    def send_messages(self, email_messages):
+        raise ConnectionRefusedError('SMTP недоступен')
+
+
+class UnreachableEmailBackend(BaseEmailBackend):
+    def open(self):
+        raise ConnectionRefusedError('SMTP недоступен')
+
+    def send_messages(self, email_messages):
+        raise AssertionError('Соединение не открыто')
+
+
+@override_settings(
+    EMAIL_BACKEND='users.mail.OutboxEmailBackend',
+    OUTBOX_DELIVERY_BACKEND='django.core.mail.backends.locmem.EmailBackend',
+)
+class OutboxTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        User.objects.create_user(
+            username='test_user', email='user@test.ru', password='pass'
+        )
+
+    def request_reset(self):
+        return self.client.post(
+            reverse('users:password_reset_form'), {'email': 'user@test.ru'}
+        )
+
+    def test_password_reset_enqueues_mail(self):
+        """Сброс пароля кладёт письмо в очередь и не отправляет его сразу."""
+        response = self.request_reset()
+        self.assertRedirects(response, reverse('users:password_reset_done'))
+        self.assertEqual(len(mail.outbox), 0)
+        message = OutboxMessage.objects.get()
+        self.assertEqual(message.recipients, 'user@test.ru')
+        self.assertIsNone(message.sent)
+
+    def test_send_outbox_delivers_mail(self):
+        """send_outbox доставляет письма и помечает их отправленными."""
+        self.request_reset()
+        self.request_reset()
+        call_command('send_outbox', once=True, batch_size=1,
+                     stdout=StringIO())
+        self.assertEqual(len(mail.outbox), 2)
+        self.assertEqual(mail.outbox[0].to, ['user@test.ru'])
+        self.assertFalse(OutboxMessage.objects.filter(sent__isnull=True))
+
+    @override_settings(
+        OUTBOX_DELIVERY_BACKEND='users.tests.FailingEmailBackend'
+    )
+    def test_failed_mail_is_retried_later(self):
+        """Неудачная отправка откладывается с растущей задержкой."""
+        self.request_reset()
+        call_command('send_outbox', once=True, stdout=StringIO())
+        message = OutboxMessage.objects.get()
+        self.assertEqual(message.attempts, 1)
+        self.assertIn('SMTP', message.last_error)
+        self.assertGreater(message.next_attempt, timezone.now())
+        self.assertIsNone(message.sent)
+
+    @override_settings(
+        OUTBOX_DELIVERY_BACKEND='users.tests.UnreachableEmailBackend'
+    )
+    def test_unreachable_server_postpones_batch(self):
+        """Если соединение не открылось, пачка откладывается целиком."""
+        self.request_reset()
+        self.request_reset()
+        out = StringIO()
+        call_command('send_outbox', once=True, stdout=out)
+        self.assertIn('отложено: 2', out.getvalue())
+        for message in OutboxMessage.objects.all():
+            self.assertEqual(message.attempts, 1)
+            self.assertIn('SMTP', message.last_error)
+
+    def test_message_rebuilt_exactly(self):
+        """Копии, скрытые копии, Reply-To, заголовки и вложения сохраняются."""
+        EmailMessage(
+            'Тема', 'Текст', 'from@test.ru', ['to@test.ru'],
+            cc=['cc@test.ru'], bcc=['bcc@test.ru'],
+            reply_to=['reply@test.ru'], headers={'X-Tag': 'outbox'},
+            attachments=[('note.txt', 'вложение', 'text/plain')],
+        ).send()
+        call_command('send_outbox', once=True, stdout=StringIO())
+        message = mail.outbox[0]
+        self.assertEqual(message.to, ['to@test.ru'])
+        self.assertEqual(message.cc, ['cc@test.ru'])
+        self.assertEqual(message.bcc, ['bcc@test.ru'])
+        self.assertEqual(message.reply_to, ['reply@test.ru'])
+        self.assertEqual(message.extra_headers, {'X-Tag': 'outbox'})
+        self.assertEqual(
+            message.attachments,
+            [('note.txt', 'вложение', 'text/plain')],
+        )
+        mime = message.message()
+        self.assertEqual(mime['To'], 'to@test.ru')
+        self.assertNotIn('bcc@test.ru', mime.as_string())
+
+    def test_claimed_mail_is_not_taken_twice(self):
+        """Письма, взятые одним отправителем, не видны другому."""
+        for _ in range(3):
+            self.request_reset()
+        now = timezone.now()
+        first = {message.pk for message in claim(2, now)}
+        second = {message.pk for message in claim(2, now)}
+        self.assertEqual(len(first), 2)
+        self.assertEqual(len(second), 1)
+        self.assertFalse(first & second)
+        self.assertEqual(claim(2, now), [])
+        later = now + timedelta(seconds=settings.OUTBOX_CLAIM_TIMEOUT + 1)
+        self.assertEqual(len(claim(10, later)), 3)
+
+
+@override_settings(
+    EMAIL_BACKEND='users.mail.OutboxEmailBackend',
+    OUTBOX_DELIVERY_BACKEND='django.core.mail.backends.locmem.EmailBackend',
+)
+class ConcurrentOutboxTests(TransactionTestCase):
+
+    def test_parallel_senders_deliver_each_mail_once(self):
+        """Параллельные send_batch не отправляют письмо дважды."""
+        for num in range(12):
+            EmailMessage(
+                f'Письмо {num}', 'Текст', 'from@test.ru', ['to@test.ru']
+            ).send()
+
+        def sender():
+            try:
+                while send_batch(2) != (0, 0):
+                    pass
+            finally:
+                connection.close()
+
+        with ThreadPoolExecutor(4) as pool:
+            for future in [pool.submit(sender) for _ in range(4)]:
+                future.result()
+        subjects = [message.subject for message in mail.outbox]
+        self.assertEqual(len(subjects), 12)
+        self.assertEqual(len(set(subjects)), 12)
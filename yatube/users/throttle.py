@@ -0,0 +1,42 @@
+from django.conf import settings
+from django.core.cache import cache
+
+from core.ratelimit import client_ip, hit
+
+KEY_PREFIX = 'login-throttle'
+
+
+def ip_key(request):
+    return f'{KEY_PREFIX}:ip:{client_ip(request)}'
+
+
+def username_key(request, username):
+    # Счётчик неудач - на пару (имя, IP): иначе любой мог бы заблокировать
+    # чужую учётную запись, перебирая неверные пароли со своего адреса.
+    return f'{KEY_PREFIX}:user:{client_ip(request)}:{username.lower()}'
+
+
+def is_blocked(request, username):
+    """Исчерпан ли лимит попыток для IP или для имени с этого IP."""
+    keys = {ip_key(request): settings.LOGIN_ATTEMPTS_PER_IP}
+    if username:
+        keys[username_key(request, username)] = (
+            settings.LOGIN_ATTEMPTS_PER_USERNAME
+        )
+    attempts = cache.get_many(keys)
+    return any(
+        attempts.get(key, 0) >= limit for key, limit in keys.items()
+    )
+
+
+def register_attempt(request):
+    # Каждая попытка с IP стоит одного хеширования пароля.
+    hit(ip_key(request), settings.LOGIN_THROTTLE_WINDOW)
+
+
+def register_failure(request, username):
+    hit(username_key(request, username), settings.LOGIN_THROTTLE_WINDOW)
+
+
+def reset(request, username):
+    cache.delete(username_key(request, username))
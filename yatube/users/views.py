@@ -1,10 +1,29 @@
+from http import HTTPStatus
+
+from django.contrib.auth.views import LoginView
+from django.forms.forms import NON_FIELD_ERRORS
 from django.urls import reverse_lazy
+from django.utils.decorators import method_decorator
 from django.views.generic import CreateView
 
-from .forms import CreationForm
+from core.ratelimit import ratelimit
+
+from .forms import CreationForm, LoginForm
 
 
+@method_decorator(ratelimit('signup', by='ip'), name='dispatch')
 class SignUp(CreateView):
     form_class = CreationForm
     success_url = reverse_lazy('posts:index')
     template_name = 'users/signup.html'
+
+
+class ThrottledLoginView(LoginView):
+    authentication_form = LoginForm
+    template_name = 'users/login.html'
+
+    def form_invalid(self, form):
+        response = super().form_invalid(form)
+        if form.has_error(NON_FIELD_ERRORS, 'throttled'):
+            response.status_code = HTTPStatus.TOO_MANY_REQUESTS
+        return response
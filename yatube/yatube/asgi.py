@@ -0,0 +1,22 @@
+"""
+ASGI config for yatube project.
+
+Django 2.2 has no native ASGI support, so the WSGI handler is wrapped in
+core.asgi.WsgiToAsgi, which runs requests in a bounded thread pool.
+Run with any ASGI server, e.g. ``uvicorn yatube.asgi:application``.
+"""
+
+import os
+
+from django.core.wsgi import get_wsgi_application
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'yatube.settings')
+
+wsgi_application = get_wsgi_application()
+
+from core.asgi import WsgiToAsgi  # noqa: E402
+from core.warmup import warm_up  # noqa: E402
+
+warm_up()
+
+application = WsgiToAsgi(wsgi_application)
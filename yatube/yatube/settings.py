@@ -1,4 +1,5 @@
 import os
+from importlib.util import find_spec
 
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 
@@ -33,10 +34,13 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    'core.static.StaticFilesMiddleware',
+    'core.compression.CompressionMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
-    'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'users.middleware.CachedAuthenticationMiddleware',
+    'core.middleware.ReplicaRoutingMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -44,12 +48,31 @@ MIDDLEWARE = [
 ROOT_URLCONF = 'yatube.urls'
 
 TEMPLATES_DIR = os.path.join(BASE_DIR, 'templates')
+TEMPLATE_LOADERS = [
+    'django.template.loaders.filesystem.Loader',
+    'django.template.loaders.app_directories.Loader',
+]
+# В продакшене шаблоны проекта компилируются один раз на процесс и уже
+# без лишних пробелов (core.loaders.MinifyingLoader).
+if not DEBUG:
+    TEMPLATE_LOADERS = [
+        ('django.template.loaders.cached.Loader', [
+            'core.loaders.MinifyingLoader',
+            'django.template.loaders.app_directories.Loader',
+        ]),
+    ]
+# Прогрев кэша шаблонов при старте воркера (см. core.warmup.warm_up).
+TEMPLATES_WARMUP = not DEBUG
+# Функции, которые веб-процесс вызывает при старте.
+WARMUP_HOOKS = (
+    ['core.warmup.warm_template_cache'] if TEMPLATES_WARMUP else []
+) + ['posts.follow_index.warm_follow_index']
 TEMPLATES = [
     {
         'BACKEND': 'django.template.backends.django.DjangoTemplates',
         'DIRS': [TEMPLATES_DIR],
-        'APP_DIRS': True,
         'OPTIONS': {
+            'loaders': TEMPLATE_LOADERS,
             'context_processors': [
                 'django.template.context_processors.debug',
                 'django.template.context_processors.request',
@@ -62,14 +85,39 @@ TEMPLATES = [
 ]
 
 WSGI_APPLICATION = 'yatube.wsgi.application'
+# Размер пула потоков, в котором yatube.asgi выполняет запросы.
+ASGI_THREADS = int(os.getenv('ASGI_THREADS', 16))
 
 DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': os.path.join(BASE_DIR, 'db.sqlite3'),
+        # Тестовая база - тоже файл: в общей базе в памяти параллельные
+        # потоки (run_jobs, отправка писем) сразу получают «table is
+        # locked», а не ждут блокировку, как в файловой.
+        'TEST': {'NAME': os.path.join(BASE_DIR, 'test_db.sqlite3')},
     }
 }
 
+# Реплики только для чтения: пути к файлам SQLite через запятую. Локально
+# их наполняет команда replicate_sqlite.
+REPLICA_DATABASES = []
+for num, name in enumerate(
+    filter(None, os.getenv('DATABASE_REPLICAS', '').split(',')), start=1
+):
+    alias = f'replica{num}'
+    DATABASES[alias] = {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': name,
+        'TEST': {'MIRROR': 'default'},
+    }
+    REPLICA_DATABASES.append(alias)
+
+DATABASE_ROUTERS = ['core.db_router.ReplicaRouter']
+# После записи пользователь читает с основной базы столько секунд.
+REPLICA_PIN_SECONDS = 5
+REPLICA_PIN_COOKIE = 'pin_primary'
+
 
 AUTH_PASSWORD_VALIDATORS = [
     {
@@ -86,6 +134,55 @@ AUTH_PASSWORD_VALIDATORS = [
     },
 ]
 
+# Первый хешер в списке — предпочтительный: пароли, сохранённые остальными
+# или с другими параметрами, перехешируются при ближайшем успешном входе.
+PASSWORD_HASHERS = [
+    'users.hashers.TunedPBKDF2PasswordHasher',
+    'django.contrib.auth.hashers.PBKDF2SHA1PasswordHasher',
+]
+# bcrypt и argon2 предпочтительнее PBKDF2, если установлены их библиотеки.
+for library, hasher in (
+    ('bcrypt', 'users.hashers.TunedBCryptSHA256PasswordHasher'),
+    ('argon2', 'users.hashers.TunedArgon2PasswordHasher'),
+):
+    if find_spec(library):
+        PASSWORD_HASHERS.insert(0, hasher)
+    else:
+        PASSWORD_HASHERS.append(hasher)
+
+PBKDF2_ITERATIONS = int(os.getenv('PBKDF2_ITERATIONS', 150000))
+ARGON2_TIME_COST = int(os.getenv('ARGON2_TIME_COST', 2))
+ARGON2_MEMORY_COST = int(os.getenv('ARGON2_MEMORY_COST', 512))
+ARGON2_PARALLELISM = int(os.getenv('ARGON2_PARALLELISM', 2))
+BCRYPT_ROUNDS = int(os.getenv('BCRYPT_ROUNDS', 12))
+
+# Ограничение попыток входа, счётчики хранятся в кэше.
+LOGIN_THROTTLE_WINDOW = 300
+LOGIN_ATTEMPTS_PER_IP = 30
+# Неудачи считаются на пару (имя пользователя, IP).
+LOGIN_ATTEMPTS_PER_USERNAME = 5
+
+# Лимиты частоты записи (core.ratelimit): число запросов за секунду,
+# минуту, час или день на пользователя, а для анонимов - на IP.
+RATE_LIMITS = {
+    'post_create': '10/m',
+    'add_comment': '20/m',
+    'profile_follow': '30/m',
+    'signup': '5/h',
+}
+
+# cached_db читает сессию из кэша и идёт в БД только при промахе,
+# signed_cookies хранит сессию в подписанной cookie и не трогает БД вовсе.
+SESSION_ENGINE = os.getenv(
+    'SESSION_ENGINE', 'django.contrib.sessions.backends.cached_db'
+)
+
+# Сколько живёт закэшированный request.user. save() и delete() сбрасывают
+# кэш, но только в общем кэше (CACHE_LOCATION) это видят все воркеры;
+# с локальным кэшем и после QuerySet.update() другие воркеры видят старого
+# пользователя (хеш пароля, is_active) не дольше этого срока.
+USER_CACHE_TIMEOUT = 30
+
 LOGIN_URL = 'users:login'
 LOGIN_REDIRECT_URL = 'posts:index'
 
@@ -101,10 +198,108 @@ USE_TZ = False
 
 
 STATIC_URL = '/static/'
+STATIC_ROOT = os.path.join(BASE_DIR, 'staticfiles')
+# collectstatic даёт файлам имена с хешем содержимого и кладёт рядом
+# сжатые .gz (и .br, если установлен brotli). В DEBUG манифест не нужен:
+# статику отдаёт runserver прямо из STATICFILES_DIRS.
+if not DEBUG:
+    STATICFILES_STORAGE = 'core.storage.CompressedManifestStaticFilesStorage'
+# Раздача статики самим приложением (core.static.StaticFilesMiddleware)
+# для установки без nginx. Файлы с хешем в имени кэшируются на год,
+# остальные - на STATIC_MAX_AGE секунд.
+STATIC_SERVE = os.getenv('STATIC_SERVE', str(not DEBUG)) == 'True'
+STATIC_MAX_AGE = 60 * 60
+
+# Сжатие ответов (core.compression): brotli, если установлен, иначе gzip.
+# Ответы короче COMPRESS_MIN_SIZE байт не сжимаются.
+COMPRESS_MIN_SIZE = 512
+COMPRESS_GZIP_LEVEL = 6
+COMPRESS_BROTLI_QUALITY = 5
+# Сжатые страницы для анонимов живут в кэше дольше фрагментов ленты:
+# ключ - хеш содержимого, устаревшее тело выдано не будет. Кэш отдельный
+# (CACHES['compressed']), чтобы тела не вытесняли счётчики лимитов.
+COMPRESS_CACHE_TIMEOUT = 60
+COMPRESS_CACHE_ENTRIES = 200
 
 POSTS_PER_PAGE = 10
 
-EMAIL_BACKEND = 'django.core.mail.backends.filebased.EmailBackend'
+# Начиная с этого числа строк пагинатор админки (EstimatedCountPaginator)
+# берёт оценку из статистики СУБД вместо COUNT(*) по всей таблице.
+ESTIMATED_COUNT_THRESHOLD = 100000
+
+# Почти одинаковые посты (posts.duplicates): новый пост отклоняется, если
+# оценка сходства его текста с уже опубликованным постом того же автора не
+# ниже порога. Тексты короче DUPLICATE_MIN_LENGTH символов не проверяются.
+DUPLICATE_THRESHOLD = 0.85
+DUPLICATE_MIN_LENGTH = 50
+
+# Массовые действия модерации (posts.moderation) пишут в БД пачками.
+MODERATION_BATCH_SIZE = 1000
+
+# Архив (команда archive_posts): посты старше ARCHIVE_AFTER_DAYS дней
+# переносятся в ArchivedPost пачками по ARCHIVE_BATCH_SIZE. Ленты читают
+# архив, только когда страница до него доходит; число архивных постов
+# для пагинации берётся из кэша.
+ARCHIVE_AFTER_DAYS = 180
+ARCHIVE_BATCH_SIZE = 500
+ARCHIVE_COUNT_TIMEOUT = 60 * 60
+
+# Метаданные групп (число постов, последняя активность) живут в кэше и
+# обновляются при записи постов; таймаут ограничивает их расхождение с БД.
+GROUP_CACHE_TIMEOUT = 60 * 60
+
+# Рейтинг популярного (posts.ranking): вклад события затухает в e раз за
+# RANKING_DECAY_SECONDS, комментарии и подписчики автора добавляют веса.
+RANKING_DECAY_SECONDS = 60 * 60 * 24
+# При нулевом весе комментарии на рейтинг не влияют.
+RANKING_COMMENT_WEIGHT = 0.5
+RANKING_FOLLOWER_WEIGHT = 1.0
+
+# Рекомендации подписок (команда recommend_follows): сколько хранить на
+# пользователя и вес соподписок относительно друзей друзей.
+FOLLOW_SUGGESTIONS = 5
+
+# Индекс подписок в памяти процесса (posts.follow_index) перестраивается в
+# фоне раз в столько секунд: так он догоняет записи в обход сигналов.
+# Столько же хранятся записи журнала изменений в кэше.
+FOLLOW_INDEX_TIMEOUT = 10 * 60
+# Процесс, отставший от журнала больше чем на столько изменений, строит
+# индекс заново, а не применяет их по одному.
+FOLLOW_INDEX_MAX_REPLAY = 1000
+FOLLOW_SUGGESTIONS_COFOLLOW_WEIGHT = 0.5
+
+# Отложенная запись комментариев: add_comment кладёт комментарий в очередь,
+# фоновый поток сохраняет очередь пачками раз в COMMENTS_FLUSH_INTERVAL
+# секунд. Автор видит свои ещё не записанные комментарии через кэш.
+COMMENTS_WRITE_BEHIND = False
+COMMENTS_FLUSH_INTERVAL = 0.5
+COMMENTS_FLUSH_BATCH = 500
+COMMENTS_PENDING_TIMEOUT = 60
+
+# Фоновые задачи (core.jobs, команда run_jobs): упавшая задача
+# повторяется через JOB_RETRY_DELAY * 2**(попытка - 1) секунд, задача,
+# взятая воркером дольше JOB_LOCK_TIMEOUT секунд назад, считается
+# брошенной и снова попадает в очередь; это тоже тратит попытку.
+JOB_MAX_ATTEMPTS = 5
+JOB_RETRY_DELAY = 30
+JOB_LOCK_TIMEOUT = 10 * 60
+JOB_WORKERS = 4
+JOB_BATCH_SIZE = 20
+
+# Письма попадают в очередь OutboxMessage, а send_outbox доставляет их через
+# OUTBOX_DELIVERY_BACKEND: локально это файлы, в продакшене — SMTP.
+EMAIL_BACKEND = 'users.mail.OutboxEmailBackend'
+OUTBOX_DELIVERY_BACKEND = os.getenv(
+    'OUTBOX_DELIVERY_BACKEND',
+    'django.core.mail.backends.filebased.EmailBackend'
+)
+OUTBOX_BATCH_SIZE = 50
+OUTBOX_MAX_ATTEMPTS = 5
+# Задержка перед повтором удваивается после каждой неудачи, секунды.
+OUTBOX_RETRY_DELAY = 60
+# Письма, взятые в отправку дольше этого назад (отправитель упал),
+# снова доступны другим, секунды.
+OUTBOX_CLAIM_TIMEOUT = 10 * 60
 
 EMAIL_FILE_PATH = os.path.join(BASE_DIR, 'sent_emails')
 
@@ -112,9 +307,35 @@ CSRF_FAILURE_VIEW = 'core.views.csrf_failure'
 
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
+# Каталоги MEDIA_ROOT, которые отдаются всем: картинки постов и миниатюры.
+MEDIA_PUBLIC_DIRS = ('posts/', 'cache/')
+MEDIA_MAX_AGE = 60 * 60 * 24
+# Передача отправки файла веб-серверу: '' (отдаёт приложение),
+# 'x-accel-redirect' (nginx, internal location MEDIA_ACCEL_PREFIX,
+# смотрящая в MEDIA_ROOT) или 'x-sendfile' (Apache mod_xsendfile).
+MEDIA_SENDFILE = os.getenv('MEDIA_SENDFILE', '')
+MEDIA_ACCEL_PREFIX = '/protected-media/'
 
+# Кэш пользователей, индекс подписок, счётчики лимитов и версии фрагментов
+# должны быть общими для всех воркеров: при нескольких процессах задайте
+# CACHE_LOCATION (адрес memcached, нужен пакет python-memcached).
+# LocMemCache годится для разработки и установки с одним процессом.
+CACHE_LOCATION = os.getenv('CACHE_LOCATION')
 CACHES = {
     'default': {
         'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
     }
+}
+if CACHE_LOCATION:
+    CACHES['default'] = {
+        'BACKEND': 'django.core.cache.backends.memcached.MemcachedCache',
+        'LOCATION': CACHE_LOCATION.split(','),
+    }
+# Сжатые тела ищутся по хешу содержимого, поэтому им хватает кэша в
+# памяти процесса.
+CACHES['compressed'] = {
+    'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    'LOCATION': 'compressed',
+    'TIMEOUT': COMPRESS_CACHE_TIMEOUT,
+    'OPTIONS': {'MAX_ENTRIES': COMPRESS_CACHE_ENTRIES},
 }
\ No newline at end of file